@@ -0,0 +1,85 @@
+"""
+Per-prediction overhead: JSON /api/predict/crop vs the binary stream
+
+Drives the stubbed app from load_test.py in-process and reports the time
+per prediction of sequential JSON requests and of /api/binary/crop with
+different numbers of rows per request. Both go through the same model, so
+the gap is what HTTP framing, JSON validation and serialization, and the
+history write cost per prediction. The stub skips JWT verification and the
+MongoDB user lookup, which the JSON route pays per request and the binary
+stream once, so real-world savings are larger.
+
+Usage (from backend/):
+    python benchmarks/bench_binary.py
+    python benchmarks/bench_binary.py --predictions 20000 --rows 1 64 4096
+"""
+import argparse
+import asyncio
+import time
+
+import httpx
+import numpy as np
+
+from common import load_crop_features, print_table, save_results, summarize
+from load_test import CROP_PAYLOAD, build_stubbed_app
+
+# Binary answers do not compress well; skip the compression middleware like a real client would
+BINARY_HEADERS = {"Content-Type": "application/octet-stream", "Accept-Encoding": "identity"}
+
+
+async def timed_posts(client: httpx.AsyncClient, requests: int, items: int, **kwargs) -> dict:
+    """Send the same POST sequentially and summarize, adding the time per prediction"""
+    url = kwargs.pop("url")
+    samples = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        response = await client.post(url, **kwargs)
+        samples.append(time.perf_counter() - start)
+        response.raise_for_status()
+    stats = summarize(samples, items)
+    stats["rows_per_request"] = items
+    stats["us_per_prediction"] = 1e6 / stats["items_per_sec"]
+    return stats
+
+
+async def main_async(args) -> dict:
+    app, _ = build_stubbed_app()
+    rng = np.random.default_rng(0)
+    baseline = load_crop_features()
+
+    results = {}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+        await timed_posts(client, 20, 1, url="/api/predict/crop", json=CROP_PAYLOAD)
+        results["json/predict_crop"] = await timed_posts(
+            client, args.json_requests, 1, url="/api/predict/crop", json=CROP_PAYLOAD
+        )
+        for rows in args.rows:
+            body = baseline[rng.integers(0, len(baseline), rows)].astype("<f4").tobytes()
+            await timed_posts(client, 5, rows, url="/api/binary/crop", content=body, headers=BINARY_HEADERS)
+            requests = max(10, args.predictions // rows)
+            results[f"binary/crop[rows={rows}]"] = await timed_posts(
+                client, requests, rows, url="/api/binary/crop", content=body, headers=BINARY_HEADERS
+            )
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="JSON vs binary crop prediction overhead")
+    parser.add_argument("--predictions", type=int, default=20_000, help="Rows sent per binary batch size")
+    parser.add_argument("--json-requests", type=int, default=1_000, help="Sequential JSON requests")
+    parser.add_argument("--rows", type=int, nargs="+", default=[1, 64, 4096], help="Rows per binary request")
+    parser.add_argument("--output", help="Results file (default: benchmarks/results/binary-<ts>.json)")
+    args = parser.parse_args()
+
+    results = asyncio.run(main_async(args))
+    print_table(results)
+    print(f"\n{'case':<40} {'us/prediction':>14}")
+    for case, stats in results.items():
+        print(f"{case:<40} {stats['us_per_prediction']:>14.1f}")
+    path = save_results("binary", results, args.output)
+    print(f"\nResults saved to {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+"""
+Dashboard load: three /history calls vs GET /api/dashboard vs a 304 revalidation
+
+Seeds the stubbed app's in-memory collections with a user's history and
+matching stats counters, then times what one dashboard load costs:
+
+    history x3     the crop, fertilizer and disease /history endpoints,
+                   fetched concurrently, as the dashboard used to
+    dashboard      one GET /api/dashboard
+    dashboard 304  the same with If-None-Match, as on every reload
+                   while nothing new was predicted
+
+and reports the latency of a whole load and the response bytes received
+(compressed, as sent) and decoded.
+The database is in memory here, so the latency gap mostly reflects
+serialization and request overhead; against MongoDB each avoided query
+also saves a network round trip.
+
+Usage (from backend/):
+    python benchmarks/bench_dashboard.py
+    python benchmarks/bench_dashboard.py --records 1000 --loads 500
+"""
+import argparse
+import asyncio
+import random
+import time
+from datetime import datetime, timedelta
+
+import httpx
+from bson import ObjectId
+
+from common import print_table, save_results, summarize
+from load_test import BENCH_USER, build_stubbed_app
+
+CROPS = ["Rice", "Maize", "Chickpea", "Banana", "Mango", "Coffee", "Cotton", "Jute"]
+FERTILIZERS = ["Urea", "DAP", "14-35-14", "28-28", "17-17-17", "20-20", "10-26-26"]
+DISEASES = [("Tomato", "Early blight"), ("Tomato", "healthy"), ("Potato", "Late blight"), ("Apple", "Apple scab")]
+INPUT = {"N": 90, "P": 42, "K": 43, "temperature": 20.87, "humidity": 82.0, "ph": 6.5, "rainfall": 202.93}
+
+
+def seed(records: int, days: int = 60):
+    """Fill the stubbed collections with one user's history and the counters stats_service would hold"""
+    from routes import dashboard
+    from services.stats import get_stats_collection, user_scope, day_id, counter_key, disease_label
+
+    rng = random.Random(0)
+    user_id = BENCH_USER["id"]
+    now = datetime.utcnow()
+    scope = user_scope(user_id)
+    summary = {"_id": scope, "totals": {}, "crop": {}, "fertilizer": {}, "disease": {}, "healthy": 0, "updated_at": now}
+    buckets = {}
+
+    def count(kind: str, label: str, created_at: datetime, healthy: bool = False):
+        day = created_at.strftime("%Y-%m-%d")
+        bucket = buckets.setdefault(day, {"_id": day_id(scope, day), "day": day, "totals": {}})
+        for doc in (summary, bucket):
+            doc["totals"][kind] = doc["totals"].get(kind, 0) + 1
+        summary[kind][counter_key(label)] = summary[kind].get(counter_key(label), 0) + 1
+        summary["healthy"] += healthy
+
+    for i in range(records):
+        created_at = now - timedelta(minutes=rng.randint(0, days * 24 * 60))
+        crop = rng.choice(CROPS)
+        dashboard.get_crop_predictions_collection().documents.append({
+            "_id": ObjectId(), "user_id": user_id, "user_email": BENCH_USER["email"], "input_data": INPUT,
+            "prediction": {"crop": crop, "crop_id": CROPS.index(crop)}, "created_at": created_at,
+        })
+        count("crop", crop, created_at)
+
+        fertilizer = rng.choice(FERTILIZERS)
+        dashboard.get_fertilizer_predictions_collection().documents.append({
+            "_id": ObjectId(), "user_id": user_id, "user_email": BENCH_USER["email"],
+            "input_data": dict(INPUT, crop_type=crop.lower()),
+            "prediction": {
+                "fertilizer": fertilizer, "fertilizer_id": FERTILIZERS.index(fertilizer),
+                "explanation": "Nitrogen is 30 below the target for this crop. " * 3,
+                "deficits": {"N": 30.0, "P": 0.0, "K": 5.0},
+            },
+            "created_at": created_at,
+        })
+        count("fertilizer", fertilizer, created_at)
+
+        plant, disease = rng.choice(DISEASES)
+        dashboard.get_disease_detections_collection().documents.append({
+            "_id": ObjectId(), "user_id": user_id, "user_email": BENCH_USER["email"],
+            "filename": "leaf.jpg", "content_type": "image/jpeg", "image_sha256": "0" * 64,
+            "tta": False, "plant_hint": None,
+            "detection": {
+                "plant": plant, "disease": disease, "confidence": 0.93, "is_healthy": disease == "healthy",
+                "top_predictions": [{"plant": plant, "disease": d, "confidence": 0.01} for _, d in DISEASES * 2],
+            },
+            "recommendation": "Remove affected leaves and apply a copper-based fungicide. " * 4,
+            "model_version": "b393dce72a79", "created_at": created_at,
+        })
+        count("disease", disease_label(plant, disease), created_at, disease == "healthy")
+
+    get_stats_collection().documents.extend([summary, *buckets.values()])
+
+
+async def time_loads(load, loads: int) -> dict:
+    for _ in range(10):
+        await load()
+    samples, received, decoded = [], 0, 0
+    for _ in range(loads):
+        start = time.perf_counter()
+        responses = await load()
+        samples.append(time.perf_counter() - start)
+        for response in responses:
+            if response.status_code >= 400:
+                raise RuntimeError(f"{response.request.url} returned {response.status_code}")
+            received += response.num_bytes_downloaded
+            decoded += len(response.content)
+    stats = summarize(samples)
+    stats["requests_per_load"] = len(responses)
+    stats["bytes_per_load"] = received / loads
+    stats["decoded_bytes_per_load"] = decoded / loads
+    return stats
+
+
+async def main_async(args) -> dict:
+    app, _ = build_stubbed_app()
+    seed(args.records)
+
+    results = {}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+        async def histories():
+            return await asyncio.gather(
+                client.get("/api/predict/crop/history"),
+                client.get("/api/predict/fertilizer/history"),
+                client.get("/api/disease/history"),
+            )
+
+        async def dashboard():
+            return [await client.get("/api/dashboard")]
+
+        etag = (await client.get("/api/dashboard")).headers["etag"]
+
+        async def revalidate():
+            response = await client.get("/api/dashboard", headers={"If-None-Match": etag})
+            assert response.status_code == 304
+            return [response]
+
+        results["history x3"] = await time_loads(histories, args.loads)
+        results["dashboard"] = await time_loads(dashboard, args.loads)
+        results["dashboard 304"] = await time_loads(revalidate, args.loads)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Dashboard load cost, before and after /api/dashboard")
+    parser.add_argument("--records", type=int, default=300, help="History records per prediction type")
+    parser.add_argument("--loads", type=int, default=300, help="Timed dashboard loads per case")
+    parser.add_argument("--output", help="Results file (default: benchmarks/results/dashboard-<ts>.json)")
+    args = parser.parse_args()
+
+    results = asyncio.run(main_async(args))
+    print_table(results)
+    print(f"\n{'case':<40} {'requests':>9} {'bytes':>10} {'decoded':>10}")
+    for case, stats in results.items():
+        print(f"{case:<40} {stats['requests_per_load']:>9} {stats['bytes_per_load']:>10.0f} "
+              f"{stats['decoded_bytes_per_load']:>10.0f}")
+    path = save_results("dashboard", results, args.output)
+    print(f"\nResults saved to {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+CSV parsing vs memory-mapped columnar loading
+
+Tiles crop_recommendation.csv up to --rows rows in a scratch directory,
+converts it with utils.columnar.write_table, and times getting the (n, 7)
+feature matrix plus label codes out of each format. The mapped load is
+timed both cold (just mapping) and with a full pass over the data.
+
+Usage (from backend/):
+    python benchmarks/bench_data_loading.py --rows 1000000
+"""
+import argparse
+import csv
+import shutil
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+from common import CROP_CSV, FEATURE_COLUMNS, print_table, save_results, summarize, time_call
+from utils.columnar import load_table, write_table
+
+
+def make_dataset(rows: int, directory: Path) -> Path:
+    """Write a tiled copy of crop_recommendation.csv with `rows` data rows"""
+    with open(CROP_CSV, newline="") as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        source_rows = list(reader)
+
+    path = directory / "crop_recommendation_large.csv"
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        for i in range(rows):
+            writer.writerow(source_rows[i % len(source_rows)])
+    return path
+
+
+def parse_csv_module(path: Path):
+    with open(path, newline="") as f:
+        reader = csv.DictReader(f)
+        rows = [[float(row[c]) for c in FEATURE_COLUMNS] + [row["label"]] for row in reader]
+    X = np.asarray([row[:-1] for row in rows])
+    labels, y = np.unique([row[-1] for row in rows], return_inverse=True)
+    return X, y
+
+
+def parse_pandas(path: Path):
+    import pandas as pd
+    df = pd.read_csv(path)
+    return df[FEATURE_COLUMNS].to_numpy(), df["label"].astype("category").cat.codes.to_numpy()
+
+
+def load_mapped(path: Path, touch: bool):
+    table = load_table(path)
+    X, y = table.matrix(FEATURE_COLUMNS), table.codes("label")
+    if touch:
+        X.sum(), y.sum()
+    return X, y
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CSV vs columnar dataset loading")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", help="Results file (default: benchmarks/results/data_loading-<ts>.json)")
+    args = parser.parse_args()
+
+    scratch = Path(tempfile.mkdtemp(prefix="agri-bench-"))
+    try:
+        csv_path = make_dataset(args.rows, scratch)
+        csv_bytes = csv_path.stat().st_size
+
+        results = {}
+        if args.rows <= 2_000_000:
+            results["csv/stdlib"] = summarize(time_call(lambda: parse_csv_module(csv_path), args.repeat, 1), args.rows)
+        try:
+            results["csv/pandas"] = summarize(time_call(lambda: parse_pandas(csv_path), args.repeat, 1), args.rows)
+        except ImportError:
+            results["csv/pandas"] = {"skipped": "pandas not installed"}
+
+        write_table(csv_path)
+        assert load_table(csv_path).mapped, "columnar copy was not picked up"
+        results["columnar/mmap_open"] = summarize(time_call(lambda: load_mapped(csv_path, False), args.repeat, 1), args.rows)
+        results["columnar/mmap_full_pass"] = summarize(time_call(lambda: load_mapped(csv_path, True), args.repeat, 1), args.rows)
+
+        print(f"{args.rows:,} rows, CSV {csv_bytes / 1e6:.1f} MB\n")
+        print_table(results)
+        path = save_results("data_loading", results, args.output)
+        print(f"\nResults saved to {path}")
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Drift monitor: per-request overhead and what the scores look like
+
+Times DriftMonitor.observe (the only part on the request path) and a full
+report, then replays two synthetic streams through a fresh monitor: rows
+resampled from crop_recommendation.csv itself, which should score as
+stable, and the same rows with a shifted climate (+4 C, 30% less
+rainfall, more acidic soil), which should not.
+
+Usage (from backend/):
+    python benchmarks/bench_drift.py
+    python benchmarks/bench_drift.py --requests 50000
+"""
+import argparse
+import itertools
+
+import numpy as np
+
+from common import load_crop_features, print_table, save_results, summarize, time_call
+from services.drift import DRIFT_BASELINE_CSV, DRIFT_BINS, FEATURES, DriftMonitor
+
+
+def replay(rows: np.ndarray) -> dict:
+    """Per-feature scores after streaming every row through a fresh monitor"""
+    monitor = DriftMonitor(DRIFT_BASELINE_CSV, DRIFT_BINS, window_seconds=1e9)
+    monitor.load()
+    for row in rows.tolist():
+        monitor.observe("replay", row)
+    return monitor.report()["replay"]["current"]["features"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Drift monitor overhead and scores")
+    parser.add_argument("--requests", type=int, default=20_000, help="Rows per replayed stream")
+    parser.add_argument("--output", help="Results file (default: benchmarks/results/drift-<ts>.json)")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    baseline = load_crop_features()
+    stable = baseline[rng.integers(0, len(baseline), args.requests)]
+    shifted = stable.copy()
+    shifted[:, FEATURES.index("temperature")] += 4
+    shifted[:, FEATURES.index("rainfall")] *= 0.7
+    shifted[:, FEATURES.index("ph")] -= 0.6
+
+    monitor = DriftMonitor(DRIFT_BASELINE_CSV, DRIFT_BINS, window_seconds=1e9)
+    monitor.load()
+    rows = itertools.cycle(stable.tolist())
+    results = {
+        "observe": summarize(time_call(lambda: monitor.observe("crop", next(rows)), 20_000, 1_000)),
+        "report": summarize(time_call(monitor.report, 200, 10)),
+    }
+    print_table(results)
+
+    streams = {"stable": replay(stable), "shifted": replay(shifted)}
+    print(f"\n{'feature':<12} {'stable PSI':>11} {'stable KS':>10} {'shifted PSI':>12} {'shifted KS':>11}  status")
+    for name in FEATURES:
+        a, b = streams["stable"][name], streams["shifted"][name]
+        print(f"{name:<12} {a['psi']:>11.4f} {a['ks']:>10.4f} {b['psi']:>12.4f} {b['ks']:>11.4f}  {b['status']}")
+    results["scores"] = {
+        stream: {name: {"psi": scores[name]["psi"], "ks": scores[name]["ks"]} for name in FEATURES}
+        for stream, scores in streams.items()
+    }
+
+    path = save_results("drift", results, args.output)
+    print(f"\nResults saved to {path}")
+
+
+if __name__ == "__main__":
+    main()
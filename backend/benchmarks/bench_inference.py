@@ -0,0 +1,180 @@
+"""
+Microbenchmarks for the inference services
+
+Measures MLModelService.predict_crop, the fertilizer engine against the
+legacy classifier path, image preprocessing, disease postprocessing and
+DiseaseDetectionService.predict_disease at several batch sizes.
+
+Usage (from backend/):
+    python benchmarks/bench_inference.py
+    python benchmarks/bench_inference.py --only crop --batch-sizes 1 32 512
+    python benchmarks/bench_inference.py --only fertilizer
+"""
+import argparse
+
+import numpy as np
+
+from common import (
+    load_crop_features,
+    print_table,
+    save_results,
+    summarize,
+    synthetic_image_bytes,
+    time_call,
+)
+from services.ml_model import ml_service
+from services.fertilizer import fertilizer_service
+from services.disease_detection import disease_service
+from models.disease import get_recommendation
+
+DEFAULT_BATCH_SIZES = [1, 8, 32, 128]
+
+
+def bench_crop(batch_sizes: list, repeat: int, warmup: int) -> dict:
+    results = {}
+    ml_service.load_model()
+    features = load_crop_features()
+
+    row = features[0].tolist()
+    results["crop/predict_crop[single]"] = summarize(
+        time_call(lambda: ml_service.predict_crop(row), repeat, warmup)
+    )
+    for batch_size in batch_sizes:
+        batch = features[:batch_size]
+        results[f"crop/predict_crop_batch[{batch_size}]"] = summarize(
+            time_call(lambda: ml_service.predict_crop_batch(batch), repeat, warmup),
+            items_per_call=len(batch),
+        )
+    return results
+
+
+def bench_fertilizer(batch_sizes: list, repeat: int, warmup: int) -> dict:
+    results = {}
+    if ml_service.model is None:
+        ml_service.load_model()
+    fertilizer_service.load()
+    features = load_crop_features()
+    crops = fertilizer_service.crops
+
+    row = features[0].tolist()
+    soil = [row[0], row[1], row[2], row[5]]
+    results["fertilizer/legacy_model[single]"] = summarize(
+        time_call(lambda: ml_service.predict_fertilizer(row), repeat, warmup)
+    )
+    results["fertilizer/engine[single]"] = summarize(
+        time_call(lambda: fertilizer_service.recommend(*soil, crops[0]), repeat, warmup)
+    )
+    for batch_size in batch_sizes:
+        batch = features[:batch_size]
+        soil_batch = batch[:, [0, 1, 2, 5]]
+        crop_batch = [crops[i % len(crops)] for i in range(len(batch))]
+        results[f"fertilizer/legacy_model_batch[{batch_size}]"] = summarize(
+            time_call(lambda: ml_service.predict_crop_batch(batch), repeat, warmup),
+            items_per_call=len(batch),
+        )
+        results[f"fertilizer/engine_batch[{batch_size}]"] = summarize(
+            time_call(lambda: fertilizer_service.recommend_batch(soil_batch, crop_batch), repeat, warmup),
+            items_per_call=len(batch),
+        )
+    return results
+
+
+def bench_preprocess(repeat: int, warmup: int) -> dict:
+    results = {}
+    for size in [(256, 256), (1024, 768), (4000, 3000)]:
+        image_bytes = synthetic_image_bytes(size=size)
+        results[f"preprocess/{size[0]}x{size[1]}"] = summarize(
+            time_call(lambda: disease_service.preprocess_image(image_bytes), repeat, warmup)
+        )
+    return results
+
+
+def legacy_postprocess(predictions):
+    """Per-row argsort and string parsing, as predict_disease did before metadata was precomputed"""
+    classes = disease_service.classes
+    results = []
+    for scores in predictions:
+        top_indices = np.argsort(scores)[::-1][:5]
+        parts = classes[top_indices[0]].split('___')
+        disease_name = parts[1].replace('_', ' ')
+        results.append({
+            'plant': parts[0].replace('_', ' '),
+            'disease': disease_name,
+            'confidence': float(scores[top_indices[0]]),
+            'recommendation': get_recommendation.__wrapped__(disease_name),
+            'top_predictions': [
+                {
+                    'disease': classes[idx].split('___')[1].replace('_', ' '),
+                    'plant': classes[idx].split('___')[0].replace('_', ' '),
+                    'confidence': float(scores[idx])
+                }
+                for idx in top_indices
+            ]
+        })
+    return results
+
+
+def bench_postprocess(batch_sizes: list, repeat: int, warmup: int) -> dict:
+    results = {}
+    rng = np.random.default_rng(0)
+    for batch_size in batch_sizes:
+        predictions = rng.dirichlet(np.ones(len(disease_service.classes)), size=batch_size).astype(np.float32)
+        results[f"postprocess/legacy[{batch_size}]"] = summarize(
+            time_call(lambda: legacy_postprocess(predictions), repeat, warmup),
+            items_per_call=batch_size,
+        )
+        results[f"postprocess/current[{batch_size}]"] = summarize(
+            time_call(lambda: disease_service.postprocess(predictions), repeat, warmup),
+            items_per_call=batch_size,
+        )
+    return results
+
+
+def bench_disease(batch_sizes: list, repeat: int, warmup: int) -> dict:
+    if disease_service.model is None and not disease_service.load_model():
+        return {"disease/predict_disease": {"skipped": "trained_model.keras not found"}}
+
+    results = {}
+    images = [synthetic_image_bytes(seed=i) for i in range(max(batch_sizes))]
+    results["disease/predict_disease[single]"] = summarize(
+        time_call(lambda: disease_service.predict_disease(images[0]), repeat, warmup)
+    )
+    for batch_size in batch_sizes:
+        batch = images[:batch_size]
+        results[f"disease/predict_disease_batch[{batch_size}]"] = summarize(
+            time_call(lambda: disease_service.predict_disease_batch(batch), repeat, warmup),
+            items_per_call=len(batch),
+        )
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="AgriDoctor inference microbenchmarks")
+    parser.add_argument("--only", choices=["crop", "fertilizer", "preprocess", "postprocess", "disease"], action="append",
+                        help="Run only the given group (repeatable)")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=DEFAULT_BATCH_SIZES)
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--output", help="Results file (default: benchmarks/results/inference-<ts>.json)")
+    args = parser.parse_args()
+
+    groups = args.only or ["crop", "fertilizer", "preprocess", "postprocess", "disease"]
+    results = {}
+    if "crop" in groups:
+        results.update(bench_crop(args.batch_sizes, args.repeat, args.warmup))
+    if "fertilizer" in groups:
+        results.update(bench_fertilizer(args.batch_sizes, args.repeat, args.warmup))
+    if "preprocess" in groups:
+        results.update(bench_preprocess(args.repeat, args.warmup))
+    if "postprocess" in groups:
+        results.update(bench_postprocess(args.batch_sizes, args.repeat, args.warmup))
+    if "disease" in groups:
+        results.update(bench_disease(args.batch_sizes, args.repeat, args.warmup))
+
+    print_table(results)
+    path = save_results("inference", results, args.output)
+    print(f"\nResults saved to {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+"""
+Leaf pre-filter: compute saved on mixed traffic
+
+Builds a stream of uploads where a share (--junk-fraction) are not leaves:
+selfies, bare soil and screenshots. Synthetic stand-ins are generated for
+each category; pass --data-dir (one sub-folder per class, PlantVillage
+style) and --junk-dir (any images that are not leaves) to use real photos.
+
+Reports, per category, how many uploads the colour check lets through,
+the cost of the check itself, end-to-end predict_disease time for the
+stream with the filter on and off, and the normalized entropy of the
+model's predictions on leaves vs junk, to pick OOD_MAX_ENTROPY.
+
+Usage (from backend/):
+    python benchmarks/bench_leaf_filter.py
+    python benchmarks/bench_leaf_filter.py --junk-fraction 0.5 --data-dir ~/datasets/PlantVillage/valid --junk-dir ~/datasets/not_leaves
+"""
+import argparse
+import io
+import time
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+from common import print_table, save_results, summarize, synthetic_image_bytes, time_call
+from services.disease_detection import disease_service
+from services.leaf_filter import leaf_filter, normalized_entropy, plant_pixel_ratio
+
+IMAGE_SUFFIXES = {".jpg", ".jpeg", ".png", ".bmp"}
+
+
+def encode(pixels: np.ndarray) -> bytes:
+    buffer = io.BytesIO()
+    Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8)).save(buffer, format="JPEG")
+    return buffer.getvalue()
+
+
+def synthetic_junk(kind: str, seed: int, size: tuple = (640, 480)) -> bytes:
+    """A noisy stand-in for one kind of non-leaf upload"""
+    rng = np.random.default_rng(seed)
+    width, height = size
+    noise = rng.normal(0, 12, (height, width, 3))
+    if kind == "selfie":
+        pixels = np.array([215, 165, 135]) + noise                      # skin
+        pixels[: height // 4] = np.array([45, 30, 25]) + noise[: height // 4]   # hair
+        pixels[:, : width // 5] = np.array([90, 110, 150]) + noise[:, : width // 5]  # background wall
+    elif kind == "soil":
+        pixels = np.array([115, 80, 50]) + 2 * noise
+    else:  # screenshot: white page, dark text rows, a coloured header bar
+        pixels = np.full((height, width, 3), 245.0)
+        for row in range(60, height, 24):
+            pixels[row:row + 8, 20:rng.integers(width // 3, width - 20)] = 40
+        pixels[:40] = np.array([30, 100, 200])
+    return encode(pixels)
+
+
+def directory_images(directory: Path, limit: int) -> list:
+    files = sorted(p for p in directory.rglob("*") if p.suffix.lower() in IMAGE_SUFFIXES)
+    return [p.read_bytes() for p in files[:limit]]
+
+
+def traffic(args) -> list:
+    """(category, image_bytes) pairs, junk mixed in at --junk-fraction"""
+    rng = np.random.default_rng(0)
+    junk_count = int(args.uploads * args.junk_fraction)
+    leaf_count = args.uploads - junk_count
+
+    if args.data_dir:
+        leaves = [("leaf", image) for image in directory_images(args.data_dir, leaf_count)]
+    else:
+        leaves = [("leaf", synthetic_image_bytes(seed, size=(640, 480))) for seed in range(leaf_count)]
+    if args.junk_dir:
+        junk = [("junk", image) for image in directory_images(args.junk_dir, junk_count)]
+    else:
+        kinds = ["selfie", "soil", "screenshot"]
+        junk = [(kinds[i % 3], synthetic_junk(kinds[i % 3], i)) for i in range(junk_count)]
+
+    uploads = leaves + junk
+    rng.shuffle(uploads)
+    return uploads
+
+
+def run_stream(uploads: list, enabled: bool) -> float:
+    """Seconds to answer every upload one request at a time, as the API does"""
+    leaf_filter.enabled = enabled
+    started = time.perf_counter()
+    for _, image in uploads:
+        disease_service.predict_disease(image)
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Leaf pre-filter: compute saved on mixed traffic")
+    parser.add_argument("--uploads", type=int, default=300)
+    parser.add_argument("--junk-fraction", type=float, default=0.3)
+    parser.add_argument("--data-dir", type=Path, help="Leaf photos (searched recursively)")
+    parser.add_argument("--junk-dir", type=Path, help="Photos that are not leaves (searched recursively)")
+    parser.add_argument("--model", type=Path, help="Model to benchmark (default: trained_model.keras)")
+    parser.add_argument("--output", help="Results file (default: benchmarks/results/leaf_filter-<ts>.json)")
+    args = parser.parse_args()
+
+    if args.model:
+        disease_service.model_path = args.model
+    if not disease_service.load_model():
+        print("trained_model.keras not found - nothing to benchmark")
+        return
+
+    uploads = traffic(args)
+    arrays = np.stack([disease_service.preprocess_image(image) for _, image in uploads])
+    categories = np.array([category for category, _ in uploads])
+    ratios = plant_pixel_ratio(arrays)
+    scores = disease_service.predict_scores(arrays)
+    entropy = normalized_entropy(scores)
+
+    results = {"categories": {}}
+    print(f"{len(uploads)} uploads, min plant ratio {leaf_filter.min_plant_ratio}\n")
+    print(f"{'category':<12} {'count':>6} {'accepted':>9} {'ratio p50':>10} {'entropy p50/p90':>17}")
+    for category in sorted(set(categories)):
+        mask = categories == category
+        accepted = float((ratios[mask] >= leaf_filter.min_plant_ratio).mean())
+        stats = {
+            "count": int(mask.sum()),
+            "accepted": accepted,
+            "plant_ratio_p50": float(np.median(ratios[mask])),
+            "entropy_p50": float(np.percentile(entropy[mask], 50)),
+            "entropy_p90": float(np.percentile(entropy[mask], 90)),
+        }
+        results["categories"][category] = stats
+        print(f"{category:<12} {stats['count']:>6} {accepted:>9.1%} {stats['plant_ratio_p50']:>10.3f} "
+              f"{stats['entropy_p50']:>8.3f}/{stats['entropy_p90']:.3f}")
+    leaf_entropy = entropy[categories == "leaf"]
+    if len(leaf_entropy):
+        # Rejects about 1% of real leaves: a conservative starting point for OOD_MAX_ENTROPY
+        results["suggested_max_entropy"] = float(np.percentile(leaf_entropy, 99))
+        print(f"\n99th percentile entropy on leaves: {results['suggested_max_entropy']:.3f}")
+
+    timings = {
+        "colour_check[1 image]": summarize(time_call(lambda: leaf_filter.check_colour(arrays[:1]), 200, 20)),
+        "predict_scores[1 image]": summarize(time_call(lambda: disease_service.predict_scores(arrays[:1]), 50, 5)),
+    }
+    print()
+    print_table(timings)
+    results.update(timings)
+
+    enabled = leaf_filter.enabled
+    run_stream(uploads[:10], False)  # warm up
+    try:
+        without = run_stream(uploads, False)
+        with_filter = run_stream(uploads, True)
+    finally:
+        leaf_filter.enabled = enabled
+    results["stream"] = {
+        "uploads": len(uploads),
+        "without_filter_s": without,
+        "with_filter_s": with_filter,
+        "saved": 1 - with_filter / without,
+    }
+    print(f"\nStream of {len(uploads)} uploads: {without:.2f}s without the filter, {with_filter:.2f}s with it "
+          f"({results['stream']['saved']:.1%} saved)")
+
+    path = save_results("leaf_filter", results, args.output)
+    print(f"\nResults saved to {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""
+Per-request logging cost: eager f-strings and printed tracebacks vs the queue-based layer
+
+Replays the log statements of one predict_disease call (38-class scores on a
+128x128x3 image) and one failing crop prediction, with the level at INFO:
+
+- legacy: f-string debug messages and mean/std/min/max computed on every
+  call, tracebacks formatted and printed synchronously
+- current: lazy %-formatting, isEnabledFor guards and utils.logging_config's
+  DeferredQueueHandler, so formatting happens on the listener thread
+
+thread_cpu_us is the CPU spent on the calling (event loop) thread;
+process_cpu_us also includes the listener thread.
+
+Usage (from backend/):
+    python benchmarks/bench_logging.py --iterations 20000
+"""
+import argparse
+import logging
+import os
+import queue
+import time
+import traceback
+from logging.handlers import QueueListener
+
+import numpy as np
+
+from common import save_results
+from utils.logging_config import DeferredQueueHandler, TEXT_FORMAT
+
+DEVNULL = open(os.devnull, "w")
+
+
+def make_legacy_logger() -> logging.Logger:
+    logger = logging.getLogger("bench.legacy")
+    handler = logging.StreamHandler(DEVNULL)
+    handler.setFormatter(logging.Formatter(TEXT_FORMAT))
+    logger.handlers = [handler]
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    return logger
+
+
+def make_queued_logger():
+    logger = logging.getLogger("bench.queued")
+    handler = logging.StreamHandler(DEVNULL)
+    handler.setFormatter(logging.Formatter(TEXT_FORMAT))
+    log_queue = queue.SimpleQueue()
+    logger.handlers = [DeferredQueueHandler(log_queue)]
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    listener = QueueListener(log_queue, handler)
+    listener.start()
+    return logger, listener
+
+
+def legacy_success(logger, image_array, predictions):
+    logger.debug(f"Image array shape: {image_array.shape}")
+    logger.debug(f"Image array mean: {image_array.mean():.4f}, std: {image_array.std():.4f}")
+    logger.debug(f"Prediction probabilities - min: {predictions.min():.4f}, max: {predictions.max():.4f}")
+    idx = int(np.argmax(predictions[0]))
+    confidence = float(predictions[0][idx])
+    logger.debug(f"Predicted class: {idx}, Confidence: {confidence:.4f}")
+    logger.info(f"Prediction: Tomato - Early blight ({confidence:.2%})")
+
+
+def queued_success(logger, image_array, predictions):
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Image array shape: %s, mean: %.4f, std: %.4f",
+                     image_array.shape, image_array.mean(), image_array.std())
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Prediction probabilities - min: %.4f, max: %.4f", predictions.min(), predictions.max())
+    idx = int(np.argmax(predictions[0]))
+    confidence = float(predictions[0][idx])
+    logger.debug("Predicted class: %d, Confidence: %.4f", idx, confidence)
+    logger.info("Prediction: %s - %s (%.2f%%)", "Tomato", "Early blight", confidence * 100)
+
+
+def _fail():
+    raise ValueError("feature shape mismatch, expected: 7, got 8")
+
+
+def legacy_error(logger):
+    try:
+        _fail()
+    except Exception:
+        print("ERROR in crop prediction:", file=DEVNULL)
+        print(traceback.format_exc(), file=DEVNULL)
+
+
+def queued_error(logger):
+    try:
+        _fail()
+    except Exception as e:
+        logger.exception("Crop prediction failed: %s", e)
+
+
+def measure(fn, iterations: int) -> dict:
+    for _ in range(min(iterations, 100)):
+        fn()
+    thread_start, process_start = time.thread_time(), time.process_time()
+    for _ in range(iterations):
+        fn()
+    return {
+        "thread_cpu_us": (time.thread_time() - thread_start) / iterations * 1e6,
+        "process_cpu_us": (time.process_time() - process_start) / iterations * 1e6,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Logging overhead per request")
+    parser.add_argument("--iterations", type=int, default=20000)
+    parser.add_argument("--output", help="Results file (default: benchmarks/results/logging-<ts>.json)")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    image_array = rng.uniform(0, 255, (1, 128, 128, 3)).astype(np.float32)
+    predictions = rng.dirichlet(np.ones(38), size=1).astype(np.float32)
+
+    legacy = make_legacy_logger()
+    queued, listener = make_queued_logger()
+
+    results = {
+        "success/legacy": measure(lambda: legacy_success(legacy, image_array, predictions), args.iterations),
+        "success/queued": measure(lambda: queued_success(queued, image_array, predictions), args.iterations),
+        "error/legacy": measure(lambda: legacy_error(legacy), args.iterations),
+        "error/queued": measure(lambda: queued_error(queued), args.iterations),
+    }
+    listener.stop()
+
+    print(f"{'case':<20} {'thread CPU us':>14} {'process CPU us':>15}")
+    for case, stats in results.items():
+        print(f"{case:<20} {stats['thread_cpu_us']:>14.2f} {stats['process_cpu_us']:>15.2f}")
+    for path in ("success", "error"):
+        saved = results[f"{path}/legacy"]["thread_cpu_us"] - results[f"{path}/queued"]["thread_cpu_us"]
+        print(f"{path}: {saved:.2f} us of request-thread CPU saved per request")
+
+    path = save_results("logging", results, args.output)
+    print(f"\nResults saved to {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""
+Plant hint routing: global model vs restricted postprocessing vs specialists
+
+Latency is measured on synthetic uploads for three paths through
+DiseaseDetectionService.predict_disease_batch:
+
+    global       no hint, all 38 classes
+    restricted   hint given, global model, only that plant's classes ranked
+    specialist   hint given, the plant's model from the routing table
+
+Accuracy needs labelled images: pass --data-dir pointing at a
+PlantVillage-style tree (one sub-folder per class, named as in
+PLANT_DISEASES). Every image is scored on each path with its folder's plant
+as the hint; "plant errors" counts global predictions naming the wrong
+plant, which a hint rules out entirely.
+
+Usage (from backend/):
+    python benchmarks/bench_plant_routing.py
+    python benchmarks/bench_plant_routing.py --routes ../models/disease_specialists.json --data-dir ~/datasets/PlantVillage/valid
+"""
+import argparse
+from contextlib import contextmanager
+from pathlib import Path
+
+from common import print_table, save_results, summarize, synthetic_image_bytes, time_call
+from services.disease_detection import disease_service
+
+IMAGE_SUFFIXES = {".jpg", ".jpeg", ".png", ".bmp"}
+
+
+def labelled_images(data_dir: Path, per_class: int) -> dict:
+    """plant -> [(image_bytes, class_index)] for class folders known to the service"""
+    samples = {}
+    for class_index, class_name in enumerate(disease_service.classes):
+        class_dir = data_dir / class_name
+        if not class_dir.is_dir():
+            continue
+        files = sorted(p for p in class_dir.iterdir() if p.suffix.lower() in IMAGE_SUFFIXES)[:per_class]
+        plant = disease_service.class_plants[class_index]
+        samples.setdefault(plant, []).extend((p.read_bytes(), class_index) for p in files)
+    return samples
+
+
+@contextmanager
+def routed(path: str):
+    """Hide the specialists unless the path is "specialist", so hints fall back to the global model"""
+    specialists = disease_service.specialists
+    if path != "specialist":
+        disease_service.specialists = {}
+    try:
+        yield
+    finally:
+        disease_service.specialists = specialists
+
+
+def paths_for(plant: str) -> dict:
+    """Path name -> plant hint; specialist only when one is loaded"""
+    paths = {"global": None, "restricted": plant}
+    if plant in disease_service.specialists:
+        paths["specialist"] = plant
+    return paths
+
+
+def accuracy(samples: list, path: str, plant: str, batch_size: int = 32) -> tuple:
+    """(top-1 accuracy, share of predictions naming the wrong plant)"""
+    correct = wrong_plant = 0
+    for start in range(0, len(samples), batch_size):
+        chunk = samples[start:start + batch_size]
+        with routed(path):
+            results = disease_service.predict_disease_batch([image for image, _ in chunk], plant=plant)
+        for result, (_, class_index) in zip(results, chunk):
+            correct += (result['plant'], result['disease']) == (
+                disease_service.class_plants[class_index], disease_service.class_diseases[class_index]
+            )
+            wrong_plant += result['plant'] != disease_service.class_plants[class_index]
+    return correct / len(samples), wrong_plant / len(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Plant hint routing latency and accuracy")
+    parser.add_argument("--model", type=Path, help="Global model (default: trained_model.keras)")
+    parser.add_argument("--routes", type=Path, help="Specialist routing table (default: DISEASE_SPECIALISTS_FILE)")
+    parser.add_argument("--plants", nargs="+", help="Plants to time (default: those with a specialist, else Tomato)")
+    parser.add_argument("--data-dir", type=Path, help="PlantVillage-style directory for the accuracy comparison")
+    parser.add_argument("--per-class", type=int, default=20)
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--repeat", type=int, default=30)
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("--output", help="Results file (default: benchmarks/results/plant_routing-<ts>.json)")
+    args = parser.parse_args()
+
+    if args.model:
+        disease_service.model_path = args.model
+    if not disease_service.load_model():
+        print("trained_model.keras not found - nothing to benchmark")
+        return
+    if args.routes:
+        disease_service.load_specialists(args.routes)
+    print(f"Specialists loaded: {', '.join(disease_service.specialists) or 'none'}\n")
+
+    plants = [disease_service.resolve_plant(p) for p in args.plants] if args.plants else (
+        list(disease_service.specialists) or ["Tomato"]
+    )
+    single = [synthetic_image_bytes(size=(640, 480))]
+    batch = [synthetic_image_bytes(seed, size=(640, 480)) for seed in range(args.batch_size)]
+
+    results = {}
+    for plant in plants:
+        for name, hint in paths_for(plant).items():
+            label = "global" if name == "global" else f"{name}[{plant}]"
+            if f"{label}/single" in results:
+                continue
+            with routed(name):
+                results[f"{label}/single"] = summarize(time_call(
+                    lambda: disease_service.predict_disease_batch(single, plant=hint), args.repeat, args.warmup
+                ))
+                results[f"{label}/batch{args.batch_size}"] = summarize(time_call(
+                    lambda: disease_service.predict_disease_batch(batch, plant=hint), args.repeat, args.warmup
+                ), items_per_call=len(batch))
+    print_table(results)
+    for plant in plants:
+        if f"specialist[{plant}]/single" in results:
+            speedup = results["global/single"]["p50_ms"] / results[f"specialist[{plant}]/single"]["p50_ms"]
+            print(f"\n{plant} specialist: {speedup:.2f}x faster than the global model (p50, single image)")
+
+    if args.data_dir:
+        samples = labelled_images(args.data_dir, args.per_class)
+        if not samples:
+            print(f"No class folders matching PLANT_DISEASES found under {args.data_dir}")
+        print(f"\n{'plant':<26} {'images':>6} {'path':<11} {'accuracy':>9} {'plant errors':>13}")
+        for plant, plant_samples in samples.items():
+            for name, hint in paths_for(plant).items():
+                top1, wrong_plant = accuracy(plant_samples, name, hint)
+                results[f"accuracy/{name}[{plant}]"] = {
+                    "images": len(plant_samples), "accuracy": top1, "wrong_plant": wrong_plant
+                }
+                print(f"{plant:<26} {len(plant_samples):>6} {name:<11} {top1:>9.2%} {wrong_plant:>13.2%}")
+
+    path = save_results("plant_routing", results, args.output)
+    print(f"\nResults saved to {path}")
+
+
+if __name__ == "__main__":
+    main()
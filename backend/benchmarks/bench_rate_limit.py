@@ -0,0 +1,92 @@
+"""
+Per-request cost of the rate limiter, and a check that its headers reach every route
+
+Drives the stubbed app from load_test.py in-process with the limiter
+switched on (memory store, a bucket too large to ever throttle). Before
+timing, it checks that X-RateLimit-* headers come back both from a route
+whose dependency headers FastAPI merges into the response
+(POST /api/predict/crop) and from routes that return their own Response
+(GET /api/predict/crop/history, GET /api/dashboard and its 304). Then it
+times each route sequentially with the limiter off and on.
+
+Usage (from backend/):
+    python benchmarks/bench_rate_limit.py
+    python benchmarks/bench_rate_limit.py --requests 2000
+"""
+import argparse
+import asyncio
+import time
+
+import httpx
+
+from common import print_table, save_results, summarize
+from load_test import CROP_PAYLOAD, build_stubbed_app
+
+RATE_LIMIT_HEADERS = ("x-ratelimit-limit", "x-ratelimit-remaining", "x-ratelimit-cost")
+
+
+def check_headers(name: str, response: httpx.Response):
+    missing = [header for header in RATE_LIMIT_HEADERS if header not in response.headers]
+    if missing:
+        raise RuntimeError(f"{name} ({response.status_code}) is missing {', '.join(missing)}")
+    print(f"{name:<28} {response.status_code}  remaining {response.headers['x-ratelimit-remaining']}, "
+          f"cost {response.headers['x-ratelimit-cost']}")
+
+
+async def timed(send, requests: int) -> dict:
+    for _ in range(10):
+        await send()
+    samples = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        response = await send()
+        samples.append(time.perf_counter() - start)
+        if response.status_code >= 400:
+            raise RuntimeError(f"{response.request.url} returned {response.status_code}")
+    return summarize(samples)
+
+
+async def main_async(args) -> dict:
+    from utils.rate_limit import MemoryBucketStore, rate_limiter
+
+    app, _ = build_stubbed_app()
+    rate_limiter.store = MemoryBucketStore()
+    rate_limiter.capacity = 1e12
+
+    results = {}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+        routes = {
+            "predict_crop": lambda: client.post("/api/predict/crop", json=CROP_PAYLOAD),
+            "crop_history": lambda: client.get("/api/predict/crop/history"),
+            "dashboard": lambda: client.get("/api/dashboard"),
+        }
+
+        rate_limiter.enabled = True
+        for name, send in routes.items():
+            check_headers(name, await send())
+        etag = (await client.get("/api/dashboard")).headers["etag"]
+        check_headers("dashboard 304", await client.get("/api/dashboard", headers={"If-None-Match": etag}))
+        print()
+
+        for enabled in (False, True):
+            rate_limiter.enabled = enabled
+            for name, send in routes.items():
+                results[f"{name}[limiter {'on' if enabled else 'off'}]"] = await timed(send, args.requests)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rate limiter overhead and header check")
+    parser.add_argument("--requests", type=int, default=500, help="Timed requests per route and setting")
+    parser.add_argument("--output", help="Results file (default: benchmarks/results/rate_limit-<ts>.json)")
+    args = parser.parse_args()
+
+    results = asyncio.run(main_async(args))
+    print_table(results)
+    path = save_results("rate_limit", results, args.output)
+    print(f"\nResults saved to {path}")
+
+
+if __name__ == "__main__":
+    main()
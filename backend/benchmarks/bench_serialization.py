@@ -0,0 +1,155 @@
+"""
+Response serialization cost and payload size
+
+Renders synthetic history pages (raw MongoDB documents with ObjectIds and
+datetimes) and a disease detection response the way the API used to
+(jsonable_encoder + json.dumps, `List[dict]` top predictions) and the way it
+does now (FastJSONResponse / orjson, typed TopPrediction models), and reports
+the bytes on the wire uncompressed, gzipped and Brotli-compressed, with and
+without a `fields=` projection.
+
+Usage (from backend/):
+    python benchmarks/bench_serialization.py
+    python benchmarks/bench_serialization.py --pages 10 100 1000
+"""
+import argparse
+import gzip
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from bson import ObjectId
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+from common import print_table, save_results, summarize, time_call
+from models.disease import DiseaseDetectionResponse
+from utils.responses import FastJSONResponse
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+MOBILE_FIELDS = ["created_at", "prediction.crop"]
+
+
+class LegacyDiseaseDetectionResponse(BaseModel):
+    """The response model before top_predictions was typed"""
+    success: bool
+    plant: str
+    disease: str
+    confidence: float
+    is_healthy: bool
+    top_predictions: List[dict]
+    message: str
+    recommendation: Optional[str] = None
+
+
+def crop_history(n: int) -> list:
+    now = datetime.utcnow()
+    return [
+        {
+            "_id": ObjectId(),
+            "user_id": "65f0c0ffee0000000000beef",
+            "user_email": "farmer@example.com",
+            "input_data": {"N": 90.0, "P": 42.0, "K": 43.0, "temperature": 20.87,
+                           "humidity": 82.0, "ph": 6.5, "rainfall": 202.93},
+            "prediction": {"crop": "Rice", "crop_id": 20},
+            "created_at": now - timedelta(hours=i),
+        }
+        for i in range(n)
+    ]
+
+
+def project(documents: list, fields: list) -> list:
+    """What MongoDB returns for a projection on these field paths"""
+    projected = []
+    for doc in documents:
+        out = {"_id": doc["_id"]}
+        for path in fields:
+            head, _, rest = path.partition(".")
+            if rest:
+                out.setdefault(head, {})[rest] = doc[head][rest]
+            else:
+                out[head] = doc[head]
+        projected.append(out)
+    return projected
+
+
+def legacy_history(documents: list) -> bytes:
+    """str() every _id, then FastAPI's default jsonable_encoder + JSONResponse"""
+    documents = [dict(doc, _id=str(doc["_id"])) for doc in documents]
+    content = {"success": True, "count": len(documents), "predictions": documents}
+    return JSONResponse(jsonable_encoder(content)).body
+
+
+def fast_history(documents: list) -> bytes:
+    return FastJSONResponse({"success": True, "count": len(documents), "predictions": documents}).body
+
+
+def sizes(body: bytes) -> dict:
+    result = {"bytes": len(body), "gzip_bytes": len(gzip.compress(body, compresslevel=9))}
+    if brotli is not None:
+        result["brotli_bytes"] = len(brotli.compress(body, quality=4))
+    return result
+
+
+def detection_result() -> dict:
+    return {
+        "success": True,
+        "plant": "Tomato",
+        "disease": "Early blight",
+        "confidence": 0.9512,
+        "is_healthy": False,
+        "top_predictions": [
+            {"disease": name, "plant": "Tomato", "confidence": score}
+            for name, score in [("Early blight", 0.9512), ("Late blight", 0.031), ("Septoria leaf spot", 0.008),
+                                ("Target Spot", 0.004), ("healthy", 0.002)]
+        ],
+        "message": "Disease detected: Early blight in Tomato plant (Confidence: 95.1%)",
+        "recommendation": "Remove infected leaves. Apply fungicides containing chlorothalonil.",
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Response serialization cost and payload bytes")
+    parser.add_argument("--pages", type=int, nargs="+", default=[10, 100, 1000], help="History page sizes")
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--output", help="Results file (default: benchmarks/results/serialization-<ts>.json)")
+    args = parser.parse_args()
+
+    results = {}
+    for n in args.pages:
+        documents = crop_history(n)
+        projected = project(documents, MOBILE_FIELDS)
+        cases = {
+            f"history[{n}]/legacy": lambda: legacy_history(documents),
+            f"history[{n}]/orjson": lambda: fast_history(documents),
+            f"history[{n}]/orjson+fields": lambda: fast_history(projected),
+        }
+        for case, render in cases.items():
+            results[case] = {**summarize(time_call(render, args.repeat, args.warmup), n), **sizes(render())}
+
+    result = detection_result()
+    results["detect/legacy"] = summarize(time_call(
+        lambda: JSONResponse(jsonable_encoder(LegacyDiseaseDetectionResponse(**result))).body,
+        args.repeat * 10, args.warmup
+    ))
+    results["detect/typed+orjson"] = summarize(time_call(
+        lambda: FastJSONResponse(DiseaseDetectionResponse(**result).model_dump()).body,
+        args.repeat * 10, args.warmup
+    ))
+
+    print_table(results)
+    print(f"\n{'payload':<40} {'raw':>10} {'gzip':>10} {'brotli':>10}")
+    for case, stats in results.items():
+        if "bytes" in stats:
+            print(f"{case:<40} {stats['bytes']:>10,} {stats['gzip_bytes']:>10,} {stats.get('brotli_bytes', 0):>10,}")
+    path = save_results("serialization", results, args.output)
+    print(f"\nResults saved to {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Similar-case search latency and recall at scale
+
+Builds an IVF index (services/similarity_index.py) over synthetic clustered
+embeddings, then times SimilarityIndex.search for several nprobe values
+against an exact scan of the same memory-mapped vectors, and reports
+recall@k of the approximate results. Queries are full-size embeddings, so
+the PCA projection is part of the measured cost.
+
+Usage (from backend/):
+    python benchmarks/bench_similarity.py
+    python benchmarks/bench_similarity.py --vectors 1000000 --nprobe 8 16 32
+"""
+import argparse
+import itertools
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from common import print_table, save_results, summarize, time_call
+from services.similarity_index import SimilarityIndex, build_ivf, project
+
+
+def synthetic_vectors(n: int, dim: int, clusters: int, rng) -> np.ndarray:
+    """Unit vectors scattered around random cluster centres, like embeddings of many look-alike leaves"""
+    centres = rng.standard_normal((clusters, dim)).astype(np.float32)
+    vectors = np.empty((n, dim), dtype=np.float32)
+    chunk = 100_000
+    for start in range(0, n, chunk):
+        size = min(chunk, n - start)
+        members = centres[rng.integers(0, clusters, size)]
+        vectors[start:start + size] = members + 0.6 * rng.standard_normal((size, dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Similar-case search latency and recall")
+    parser.add_argument("--vectors", type=int, default=200_000)
+    parser.add_argument("--dim", type=int, default=128, help="Projected dimensions stored in the index")
+    parser.add_argument("--embedding-dim", type=int, default=1500, help="Size of the model's penultimate layer")
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[4, 16, 64])
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--output", help="Results file (default: benchmarks/results/similarity-<ts>.json)")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    vectors = synthetic_vectors(args.vectors, args.dim, clusters=max(38, args.vectors // 500), rng=rng)
+    ids = rng.integers(0, 256, (args.vectors, 12), dtype=np.uint8)
+    # A random orthonormal PCA, so full-size queries project back onto the stored space
+    components, _ = np.linalg.qr(rng.standard_normal((args.embedding_dim, args.dim)).astype(np.float32))
+    mean = np.zeros(args.embedding_dim, dtype=np.float32)
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        directory = Path(tmp) / "index"
+        started = time.perf_counter()
+        info = build_ivf(vectors, ids, mean, components, directory, model_version="bench")
+        results["build"] = {"vectors": args.vectors, "lists": info["lists"],
+                            "build_s": time.perf_counter() - started}
+        print(f"Built {info['lists']} lists over {args.vectors:,} vectors in {results['build']['build_s']:.1f}s")
+
+        index = SimilarityIndex(directory)
+        index.load("bench")
+        # Queries: perturbed copies of stored vectors, lifted back to embedding size
+        picks = rng.choice(args.vectors, args.queries, replace=False)
+        queries = vectors[picks] + 0.3 * rng.standard_normal((args.queries, args.dim)).astype(np.float32)
+        queries = queries @ components.T
+
+        def exact(query):
+            scores = index.vectors.astype(np.float32) @ project(query, index.mean, index.components)[0]
+            top = np.argpartition(-scores, args.k - 1)[:args.k]
+            return {index.ids[i].tobytes().hex() for i in top}
+
+        truth = [exact(query) for query in queries]
+        cycle = itertools.cycle(queries)
+        results["exact"] = summarize(time_call(lambda: exact(next(cycle)), 10, 1))
+
+        for nprobe in args.nprobe:
+            found = [{i for i, _ in index.search(query, args.k, nprobe)} for query in queries]
+            recall = float(np.mean([len(f & t) / args.k for f, t in zip(found, truth)]))
+            stats = summarize(time_call(lambda: index.search(next(cycle), args.k, nprobe), args.queries, 10))
+            results[f"ivf[nprobe={nprobe}]"] = {**stats, f"recall@{args.k}": recall}
+
+    print_table({case: stats for case, stats in results.items() if "p50_ms" in stats})
+    print()
+    for case, stats in results.items():
+        if f"recall@{args.k}" in stats:
+            print(f"{case:<40} recall@{args.k} {stats[f'recall@{args.k}']:.3f}")
+    path = save_results("similarity", results, args.output)
+    print(f"\nResults saved to {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Test-time augmentation: latency cost vs accuracy gain
+
+Latency is measured on synthetic uploads for plain inference and for TTA
+(all views in one batch). Accuracy needs labelled images: pass --data-dir
+pointing at a PlantVillage-style tree (one sub-folder per class, named as
+in PLANT_DISEASES) and up to --per-class images are scored both ways.
+
+Usage (from backend/):
+    python benchmarks/bench_tta.py
+    python benchmarks/bench_tta.py --data-dir ~/datasets/PlantVillage/valid --per-class 20
+"""
+import argparse
+from pathlib import Path
+
+from common import print_table, save_results, summarize, synthetic_image_bytes, time_call
+from services.disease_detection import disease_service, TTA_VIEWS
+
+IMAGE_SUFFIXES = {".jpg", ".jpeg", ".png", ".bmp"}
+
+
+def labelled_images(data_dir: Path, per_class: int) -> list:
+    """(image_bytes, class_index) pairs for class folders known to the service"""
+    samples = []
+    for class_index, class_name in enumerate(disease_service.classes):
+        class_dir = data_dir / class_name
+        if not class_dir.is_dir():
+            continue
+        files = sorted(p for p in class_dir.iterdir() if p.suffix.lower() in IMAGE_SUFFIXES)[:per_class]
+        samples.extend((p.read_bytes(), class_index) for p in files)
+    return samples
+
+
+def accuracy(samples: list, tta: bool, batch_size: int = 32) -> float:
+    correct = 0
+    for start in range(0, len(samples), batch_size):
+        chunk = samples[start:start + batch_size]
+        results = disease_service.predict_disease_batch([image for image, _ in chunk], tta=tta)
+        for result, (_, class_index) in zip(results, chunk):
+            correct += (result['plant'], result['disease']) == (
+                disease_service.class_plants[class_index], disease_service.class_diseases[class_index]
+            )
+    return correct / len(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="TTA latency vs accuracy")
+    parser.add_argument("--data-dir", type=Path, help="PlantVillage-style directory for the accuracy comparison")
+    parser.add_argument("--per-class", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=30)
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("--output", help="Results file (default: benchmarks/results/tta-<ts>.json)")
+    args = parser.parse_args()
+
+    if not disease_service.load_model():
+        print("trained_model.keras not found - nothing to benchmark")
+        return
+
+    image_bytes = synthetic_image_bytes(size=(1024, 768))
+    results = {
+        "latency/plain": summarize(time_call(lambda: disease_service.predict_disease(image_bytes), args.repeat, args.warmup)),
+        "latency/tta": summarize(time_call(lambda: disease_service.predict_disease(image_bytes, tta=True), args.repeat, args.warmup)),
+        "latency/tta_views_only": summarize(time_call(lambda: disease_service.tta_views(image_bytes), args.repeat, args.warmup)),
+    }
+    print_table(results)
+    overhead = results["latency/tta"]["p50_ms"] / results["latency/plain"]["p50_ms"]
+    print(f"\nTTA with {len(TTA_VIEWS)} views costs {overhead:.2f}x plain p50 latency")
+
+    if args.data_dir:
+        samples = labelled_images(args.data_dir, args.per_class)
+        if samples:
+            plain, tta = accuracy(samples, tta=False), accuracy(samples, tta=True)
+            results["accuracy"] = {"images": len(samples), "plain": plain, "tta": tta, "gain": tta - plain}
+            print(f"Accuracy on {len(samples)} images: plain {plain:.2%}, TTA {tta:.2%} ({tta - plain:+.2%})")
+        else:
+            print(f"No class folders matching PLANT_DISEASES found under {args.data_dir}")
+
+    path = save_results("tta", results, args.output)
+    print(f"\nResults saved to {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""
+Throughput curve of serve.py's worker plans: how many processes, how many threads each
+
+For every worker count, starts that many processes the way serve.py does
+(thread budget from plan_workers, optionally pinned) and has each one call
+the model in a loop for --seconds, then reports the combined predictions
+per second and the per-call latency. The same worker counts are also run
+with the libraries' default thread pools ("default threads"), which is
+what `uvicorn --workers N` gives: every process sizes its pools to all
+cores.
+
+Workloads:
+    crop        one row per call, like POST /api/predict/crop
+    crop-batch  4096 rows per call, like POST /api/binary/crop
+    disease     8 images per call through predict_disease_batch
+
+Usage (from backend/):
+    python benchmarks/bench_workers.py --workload crop
+    python benchmarks/bench_workers.py --workload disease --workers 1 2 4 8 --affinity
+"""
+# Nothing that starts a thread pool (numpy, XGBoost, TensorFlow) may be imported
+# here: worker processes re-import this module before their budget is applied
+import argparse
+import multiprocessing
+import os
+import sys
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+from utils.cpu_budget import apply_thread_budget, available_cpus, plan_workers
+
+CROP_BATCH_ROWS = 4096
+DISEASE_BATCH_IMAGES = 8
+
+
+def make_workload(workload: str, disease_model: str = None):
+    """(call, predictions per call) for a workload, with its model loaded"""
+    from common import load_crop_features, synthetic_image_bytes
+
+    if workload.startswith("crop"):
+        from services.ml_model import ml_service
+
+        ml_service.load_model()
+        rows = load_crop_features()
+        if workload == "crop-batch":
+            batch = rows[:CROP_BATCH_ROWS]
+            return lambda: ml_service.predict_crop_batch(batch), len(batch)
+        row = rows[0].tolist()
+        return lambda: ml_service.predict_crop(row), 1
+
+    from services.disease_detection import disease_service
+
+    if disease_model:
+        disease_service.model_path = Path(disease_model)
+    if not disease_service.load_model():
+        raise RuntimeError(f"Disease model not found at {disease_service.model_path}")
+    images = [synthetic_image_bytes(seed) for seed in range(DISEASE_BATCH_IMAGES)]
+    return lambda: disease_service.predict_disease_batch(images), len(images)
+
+
+def run_worker(threads: int, cpu_set: list, workload: str, disease_model: str, seconds: float,
+               barrier, results):
+    if threads:
+        apply_thread_budget(threads, cpu_set)
+    elif cpu_set:
+        os.sched_setaffinity(0, cpu_set)
+    call, items = make_workload(workload, disease_model)
+    for _ in range(3):
+        call()
+
+    barrier.wait()
+    latencies = []
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        call()
+        latencies.append(time.perf_counter() - start)
+    results.put((latencies, items))
+
+
+def run_plan(plan: dict, tuned: bool, affinity: bool, workload: str, disease_model: str, seconds: float) -> dict:
+    """Run one worker plan and combine the workers' samples"""
+    from common import summarize
+
+    context = multiprocessing.get_context("spawn")
+    barrier = context.Barrier(plan["workers"])
+    results = context.Queue()
+    processes = [
+        context.Process(target=run_worker, args=(
+            plan["threads_per_worker"] if tuned else 0,
+            plan["cpu_sets"][index] if affinity else None,
+            workload, disease_model, seconds, barrier, results,
+        ))
+        for index in range(plan["workers"])
+    ]
+    for process in processes:
+        process.start()
+    samples, predictions = [], 0
+    for _ in processes:
+        latencies, items = results.get()
+        samples.extend(latencies)
+        predictions += len(latencies) * items
+    for process in processes:
+        process.join()
+
+    stats = summarize(samples)
+    stats.update({
+        "items_per_sec": predictions / seconds,
+        "workers": plan["workers"],
+        "threads_per_worker": plan["threads_per_worker"] if tuned else "default",
+        "oversubscribed": plan["oversubscribed"] if tuned else None,
+    })
+    return stats
+
+
+def main():
+    cpus = available_cpus()
+    parser = argparse.ArgumentParser(description="Throughput of serve.py worker plans")
+    parser.add_argument("--workload", choices=["crop", "crop-batch", "disease"], default="crop")
+    parser.add_argument("--workers", type=int, nargs="+",
+                        help="Worker counts to run (default: powers of two up to twice the CPUs)")
+    parser.add_argument("--seconds", type=float, default=5.0, help="Measured time per configuration")
+    parser.add_argument("--affinity", action="store_true", help="Pin workers as serve.py --affinity does")
+    parser.add_argument("--skip-default", action="store_true", help="Only run the budgeted plans")
+    parser.add_argument("--disease-model", help="Keras model for the disease workload (default: trained_model.keras)")
+    parser.add_argument("--output", help="Results file (default: benchmarks/results/workers-<ts>.json)")
+    args = parser.parse_args()
+
+    from common import print_table, save_results
+
+    worker_counts = args.workers or sorted({2 ** i for i in range(len(cpus).bit_length() + 1)} | {len(cpus)})
+    results = {}
+    for workers in worker_counts:
+        plan = plan_workers(cpus, workers=workers)
+        modes = [True] if args.skip_default else [True, False]
+        for tuned in modes:
+            label = f"{plan['threads_per_worker']} threads" if tuned else "default threads"
+            case = f"{args.workload}[w={workers}, {label}]"
+            results[case] = run_plan(plan, tuned, args.affinity, args.workload, args.disease_model, args.seconds)
+            print(f"{case:<40} {results[case]['items_per_sec']:>12.1f} predictions/s", flush=True)
+
+    print()
+    print_table(results)
+    path = save_results("workers", results, args.output)
+    print(f"\nResults saved to {path}")
+
+
+if __name__ == "__main__":
+    main()
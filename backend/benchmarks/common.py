@@ -0,0 +1,136 @@
+"""
+Shared helpers for the AgriDoctor benchmark suite
+
+Every benchmark writes a JSON file to benchmarks/results/ with the same
+layout so that any two runs can be diffed with benchmarks/compare.py:
+
+    {
+        "benchmark": "inference",
+        "created_at": "...",
+        "environment": {...},
+        "results": {
+            "<case>": {"p50_ms": ..., "p95_ms": ..., "p99_ms": ..., "items_per_sec": ...}
+        }
+    }
+"""
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+CROP_CSV = BACKEND_DIR.parent / "Data-processed" / "crop_recommendation.csv"
+FEATURE_COLUMNS = ["N", "P", "K", "temperature", "humidity", "ph", "rainfall"]
+
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+
+def summarize(samples_s: list, items_per_call: int = 1) -> dict:
+    """Summarize per-call wall times (seconds) into latency percentiles and throughput"""
+    samples_ms = np.asarray(samples_s, dtype=np.float64) * 1000.0
+    total_s = float(np.sum(samples_s))
+    return {
+        "calls": int(samples_ms.size),
+        "mean_ms": float(samples_ms.mean()),
+        "min_ms": float(samples_ms.min()),
+        "p50_ms": float(np.percentile(samples_ms, 50)),
+        "p95_ms": float(np.percentile(samples_ms, 95)),
+        "p99_ms": float(np.percentile(samples_ms, 99)),
+        "max_ms": float(samples_ms.max()),
+        "items_per_sec": (samples_ms.size * items_per_call / total_s) if total_s > 0 else 0.0,
+    }
+
+
+def time_call(fn, repeat: int = 50, warmup: int = 5) -> list:
+    """Run fn() warmup + repeat times and return the timed durations in seconds"""
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def environment() -> dict:
+    """Describe the machine and code revision a result was produced on"""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+        "git_commit": commit,
+    }
+
+
+def save_results(name: str, results: dict, output: str = None) -> Path:
+    """Write results to benchmarks/results/<name>-<timestamp>.json (or an explicit path)"""
+    created_at = datetime.utcnow()
+    if output:
+        path = Path(output)
+    else:
+        path = RESULTS_DIR / f"{name}-{created_at.strftime('%Y%m%dT%H%M%S')}.json"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    payload = {
+        "benchmark": name,
+        "created_at": created_at.isoformat(),
+        "environment": environment(),
+        "results": results,
+    }
+    path.write_text(json.dumps(payload, indent=2))
+    return path
+
+
+def load_results(path) -> dict:
+    """Read a results file written by save_results"""
+    return json.loads(Path(path).read_text())
+
+
+def print_table(results: dict):
+    """Print one line per case with the headline numbers"""
+    print(f"{'case':<40} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10} {'items/s':>12}")
+    for case, stats in results.items():
+        if "skipped" in stats:
+            print(f"{case:<40} skipped: {stats['skipped']}")
+            continue
+        print(
+            f"{case:<40} {stats['p50_ms']:>10.3f} {stats['p95_ms']:>10.3f} "
+            f"{stats['p99_ms']:>10.3f} {stats.get('items_per_sec', stats.get('rps', 0.0)):>12.1f}"
+        )
+
+
+def load_crop_features(limit: int = None) -> np.ndarray:
+    """Real feature rows from crop_recommendation.csv as an (n, 7) float array"""
+    from utils.columnar import load_table
+
+    features = load_table(CROP_CSV).matrix(FEATURE_COLUMNS)
+    return np.ascontiguousarray(features[:limit] if limit else features)
+
+
+def synthetic_image_bytes(seed: int = 0, size: tuple = (256, 256), fmt: str = "JPEG") -> bytes:
+    """Encode a deterministic leaf-coloured noise image, shaped like a typical upload"""
+    rng = np.random.default_rng(seed)
+    pixels = rng.integers(0, 255, (size[1], size[0], 3), dtype=np.uint8)
+    pixels[..., 1] = np.maximum(pixels[..., 1], 120)
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).save(buffer, format=fmt)
+    return buffer.getvalue()
@@ -0,0 +1,58 @@
+"""
+Compare two benchmark result files and flag regressions
+
+Latency metrics (p50/p95/p99) regress when they grow, throughput metrics
+(items_per_sec, rps) regress when they shrink. Exits with status 1 when any
+case regresses by more than --threshold, so it can gate CI.
+
+Usage (from backend/):
+    python benchmarks/compare.py results/baseline.json results/candidate.json --threshold 0.10
+"""
+import argparse
+import sys
+
+from common import load_results
+
+LATENCY_METRICS = ["p50_ms", "p95_ms", "p99_ms"]
+THROUGHPUT_METRICS = ["items_per_sec", "rps"]
+
+
+def compare(baseline: dict, candidate: dict, threshold: float) -> list:
+    """Return (case, metric, baseline, candidate, change, regressed) rows for shared cases"""
+    rows = []
+    for case, base_stats in baseline["results"].items():
+        cand_stats = candidate["results"].get(case)
+        if cand_stats is None or "skipped" in base_stats or "skipped" in cand_stats:
+            continue
+        for metric in LATENCY_METRICS + THROUGHPUT_METRICS:
+            if metric not in base_stats or metric not in cand_stats or not base_stats[metric]:
+                continue
+            change = (cand_stats[metric] - base_stats[metric]) / base_stats[metric]
+            if metric in LATENCY_METRICS:
+                regressed = change > threshold
+            else:
+                regressed = change < -threshold
+            rows.append((case, metric, base_stats[metric], cand_stats[metric], change, regressed))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files")
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Allowed relative change (default 10%%)")
+    args = parser.parse_args()
+
+    rows = compare(load_results(args.baseline), load_results(args.candidate), args.threshold)
+    print(f"{'case':<40} {'metric':<14} {'baseline':>12} {'candidate':>12} {'change':>9}")
+    for case, metric, base, cand, change, regressed in rows:
+        flag = "  REGRESSION" if regressed else ""
+        print(f"{case:<40} {metric:<14} {base:>12.3f} {cand:>12.3f} {change:>+8.1%}{flag}")
+
+    regressions = [row for row in rows if row[-1]]
+    print(f"\n{len(regressions)} regression(s) over {args.threshold:.0%}")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,276 @@
+"""
+HTTP load generator for the AgriDoctor API
+
+By default the FastAPI app is driven in-process through httpx's ASGI
+transport with authentication and MongoDB replaced by in-memory stubs, so
+the numbers reflect routing, validation, serialization and inference only.
+Pass --url (and --token) to load a running server instead.
+
+Usage (from backend/):
+    python benchmarks/load_test.py --scenario crop --requests 2000 --concurrency 32
+    python benchmarks/load_test.py --url http://localhost:8000 --token <jwt> --scenario disease
+
+Every request of a scenario carries the same input, so concurrent requests
+are coalesced by the services' single-flight layer (the stubbed run reports
+how many were). Pass --distinct to make each request unique instead.
+"""
+import argparse
+import asyncio
+import itertools
+import logging
+import time
+
+import httpx
+from bson import ObjectId
+
+from common import print_table, save_results, summarize, synthetic_image_bytes
+
+CROP_PAYLOAD = {
+    "N": 90, "P": 42, "K": 43, "temperature": 20.87,
+    "humidity": 82.0, "ph": 6.5, "rainfall": 202.93,
+}
+FERTILIZER_PAYLOAD = dict(CROP_PAYLOAD, crop_type="rice")
+
+BENCH_USER = {
+    "_id": "000000000000000000000000",
+    "id": "000000000000000000000000",
+    "email": "bench@agridoctor.local",
+    "username": "bench",
+    "is_admin": False,
+}
+
+
+class InsertResult:
+    def __init__(self, inserted_id):
+        self.inserted_id = inserted_id
+
+
+class FakeCursor:
+    """Just enough of motor's cursor API for the history endpoints"""
+
+    def __init__(self, documents: list, fields: set = None):
+        self.documents = documents
+        # Projected when read, so sorting can use fields the projection leaves out (as in MongoDB)
+        self.fields = fields
+
+    def sort(self, key, direction=None):
+        # One key and a direction, or a list of (key, direction) pairs
+        keys = key if isinstance(key, list) else [(key, direction)]
+        for name, order in reversed(keys):
+            self.documents = sorted(self.documents, key=lambda d: d.get(name), reverse=order < 0)
+        return self
+
+    def limit(self, n):
+        self.documents = self.documents[:n]
+        return self
+
+    async def to_list(self, length=None):
+        if self.fields is None:
+            return [dict(d) for d in self.documents[:length]]
+        return [{k: v for k, v in d.items() if k == "_id" or k in self.fields} for d in self.documents[:length]]
+
+
+class FakeCollection:
+    """In-memory stand-in for a motor collection"""
+
+    def __init__(self):
+        self.documents = []
+        # bulk_write operations are kept, not applied: nothing here reads their effect
+        self.operations = []
+
+    async def insert_one(self, document):
+        document["_id"] = ObjectId()
+        self.documents.append(document)
+        return InsertResult(document["_id"])
+
+    async def bulk_write(self, operations, ordered=True):
+        self.operations.extend(operations)
+
+    @staticmethod
+    def matches(document: dict, query: dict) -> bool:
+        """Equality, or a {"$gte"/"$lte"/"$lt": ..} range, per top-level field; "$or" of such queries"""
+        for key, condition in query.items():
+            if key == "$or":
+                if not any(FakeCollection.matches(document, branch) for branch in condition):
+                    return False
+                continue
+            value = document.get(key)
+            if isinstance(condition, dict):
+                if "$gte" in condition and not (value is not None and value >= condition["$gte"]):
+                    return False
+                if "$lte" in condition and not (value is not None and value <= condition["$lte"]):
+                    return False
+                if "$lt" in condition and not (value is not None and value < condition["$lt"]):
+                    return False
+            elif value != condition:
+                return False
+        return True
+
+    async def find_one(self, query=None):
+        for document in self.find(query).documents:
+            return document
+        return None
+
+    def find(self, query=None, projection=None):
+        query = query or {}
+        documents = [d for d in self.documents if self.matches(d, query)]
+        # Top-level fields, or the parent of a dotted path (its siblings come along)
+        fields = {name.split(".")[0] for name in projection} if projection else None
+        return FakeCursor(documents, fields)
+
+
+def build_stubbed_app():
+    """Import the app with auth and database dependencies replaced by stubs"""
+    import main
+    import routes.predictions as predictions_routes
+    import routes.disease as disease_routes
+    import routes.dashboard as dashboard_routes
+    import services.stats as stats_service_module
+    from utils.auth import get_current_user
+    from services.ml_model import ml_service
+    from services.fertilizer import fertilizer_service
+    from services.disease_detection import disease_service
+    from utils.rate_limit import rate_limiter
+
+    async def bench_user():
+        return BENCH_USER
+
+    main.app.dependency_overrides[get_current_user] = bench_user
+    # Every simulated request comes from the same user
+    rate_limiter.enabled = False
+
+    collections = {name: FakeCollection() for name in ("crop", "fertilizer", "disease", "stats")}
+    predictions_routes.get_crop_predictions_collection = lambda: collections["crop"]
+    predictions_routes.get_fertilizer_predictions_collection = lambda: collections["fertilizer"]
+    disease_routes.get_disease_detections_collection = lambda: collections["disease"]
+    dashboard_routes.get_crop_predictions_collection = lambda: collections["crop"]
+    dashboard_routes.get_fertilizer_predictions_collection = lambda: collections["fertilizer"]
+    dashboard_routes.get_disease_detections_collection = lambda: collections["disease"]
+    stats_service_module.get_stats_collection = lambda: collections["stats"]
+
+    ml_service.load_model()
+    fertilizer_service.load()
+    disease_service.load_model()
+
+    # httpx logs every request at INFO, which would dominate the measurement
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    return main.app, disease_service.model is not None
+
+
+def make_request_factory(scenario: str, distinct: bool = False):
+    """
+    Return a coroutine function issuing one request for the scenario
+
+    With distinct=True every request gets a unique input (a rainfall offset,
+    or bytes appended after the JPEG end marker) so none can be coalesced.
+    """
+    counter = itertools.count()
+
+    def payload(base: dict) -> dict:
+        return dict(base, rainfall=base["rainfall"] + next(counter) * 1e-6) if distinct else base
+
+    if scenario == "crop":
+        return lambda client: client.post("/api/predict/crop", json=payload(CROP_PAYLOAD))
+    if scenario == "fertilizer":
+        return lambda client: client.post("/api/predict/fertilizer", json=payload(FERTILIZER_PAYLOAD))
+    if scenario == "crop-history":
+        return lambda client: client.get("/api/predict/crop/history", params={"limit": 10})
+    if scenario == "disease":
+        image_bytes = synthetic_image_bytes()
+
+        def upload(client):
+            data = image_bytes + str(next(counter)).encode() if distinct else image_bytes
+            return client.post("/api/disease/detect", files={"file": ("leaf.jpg", data, "image/jpeg")})
+        return upload
+    raise ValueError(f"Unknown scenario: {scenario}")
+
+
+async def run_load(client: httpx.AsyncClient, scenario: str, total: int, concurrency: int, warmup: int,
+                   distinct: bool = False) -> dict:
+    send = make_request_factory(scenario, distinct)
+    for _ in range(warmup):
+        await send(client)
+
+    latencies = []
+    errors = 0
+    remaining = total
+
+    async def worker():
+        nonlocal remaining, errors
+        while remaining > 0:
+            remaining -= 1
+            start = time.perf_counter()
+            response = await send(client)
+            latencies.append(time.perf_counter() - start)
+            if response.status_code >= 400:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    stats = summarize(latencies)
+    stats.pop("items_per_sec")
+    stats.update({
+        "rps": len(latencies) / elapsed if elapsed > 0 else 0.0,
+        "errors": errors,
+        "concurrency": concurrency,
+        "elapsed_s": elapsed,
+    })
+    return stats
+
+
+async def main_async(args):
+    results = {}
+    if args.url:
+        headers = {"Authorization": f"Bearer {args.token}"} if args.token else {}
+        client = httpx.AsyncClient(base_url=args.url, headers=headers, timeout=60)
+        disease_ready = True
+    else:
+        from services.ml_model import ml_service
+        from services.disease_detection import disease_service
+
+        app, disease_ready = build_stubbed_app()
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=60)
+        flights = {"crop": ml_service.crop_flight, "disease": disease_service.disease_flight}
+
+    async with client:
+        for scenario in args.scenario:
+            if scenario == "disease" and not disease_ready:
+                results[f"http/{scenario}"] = {"skipped": "trained_model.keras not found"}
+                continue
+            for concurrency in args.concurrency:
+                flight = None if args.url else flights.get(scenario)
+                before = flight.metrics() if flight else None
+                stats = await run_load(client, scenario, args.requests, concurrency, args.warmup, args.distinct)
+                if flight:
+                    after = flight.metrics()
+                    stats["model_calls"] = after["executed"] - before["executed"]
+                    stats["coalesced"] = after["coalesced"] - before["coalesced"]
+                results[f"http/{scenario}[c={concurrency}]"] = stats
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="AgriDoctor HTTP load generator")
+    parser.add_argument("--scenario", action="append",
+                        choices=["crop", "fertilizer", "crop-history", "disease"],
+                        help="Scenario to run (repeatable, default: crop)")
+    parser.add_argument("--requests", type=int, default=1000, help="Requests per scenario and concurrency level")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--distinct", action="store_true", help="Give every request a unique input (no coalescing)")
+    parser.add_argument("--url", help="Load a running server instead of the in-process stubbed app")
+    parser.add_argument("--token", help="Bearer token used with --url")
+    parser.add_argument("--output", help="Results file (default: benchmarks/results/load-<ts>.json)")
+    args = parser.parse_args()
+    args.scenario = args.scenario or ["crop"]
+
+    results = asyncio.run(main_async(args))
+    print_table(results)
+    path = save_results("load", results, args.output)
+    print(f"\nResults saved to {path}")
+
+
+if __name__ == "__main__":
+    main()
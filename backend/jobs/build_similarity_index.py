@@ -0,0 +1,208 @@
+"""
+Build the similar-case index behind /api/disease/similar
+
+Streams every detection whose upload is in the image store (see
+services/image_store.py), embeds the stored 128x128 arrays in batches with
+the serving model's penultimate layer, and writes an IVF index (see
+services/similarity_index.py) to SIMILARITY_INDEX_DIR:
+
+    index.json        build id, model version, counts, last_id (highest _id scanned)
+    mean.npy, components.npy     PCA from embedding size (1500) down to --dim
+    centroids.npy, offsets.npy   one centroid and one slice per inverted list
+    vectors.npy       (N, dim) float16, grouped by list, memory-mapped by the API
+    ids.npy           (N, 12) detection ObjectIds, same order
+
+The PCA is fitted on the first --pca-sample embeddings; everything after is
+projected as it streams, so memory holds N x dim float16 rather than the full
+embeddings. Detections whose image is no longer stored are skipped.
+
+Detections made while the build runs land in the old build's delta file,
+which the swap discards. So once the new index is in place, the job embeds
+every detection newer than last_id into the new build's delta file
+("catch-up"). The API keeps serving the old build, and adding to its delta,
+until it is restarted; run the job with --catch-up after the restart to
+fold in the detections made in between. Catch-up skips detections already
+in the delta file, so it can be run any number of times.
+
+Rebuild after promoting a new disease model (embeddings change with the
+weights) and from time to time as detections accumulate.
+
+Usage (from backend/):
+    python jobs/build_similarity_index.py
+    python jobs/build_similarity_index.py --dim 128 --lists 1000 --batch-size 128 --workers 8
+    python jobs/build_similarity_index.py --catch-up      # after restarting the API
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import numpy as np
+from bson import ObjectId
+from pymongo import MongoClient
+
+from services.disease_detection import DiseaseDetectionService
+from services.image_store import image_store
+from services.similarity_index import SIMILARITY_INDEX_DIR, SimilarityIndex, build_ivf, fit_pca, project
+from utils.database import MONGODB_URL, DATABASE_NAME
+
+
+def embed_detections(service: DiseaseDetectionService, collection, dim: int, pca_sample: int,
+                     batch_size: int, workers: int) -> tuple:
+    """
+    Embed and project every detection with a stored image
+
+    Returns:
+        tuple: (projected float16 (N, dim), ids uint8 (N, 12), mean, components, skipped count,
+                last _id scanned as a hex string or None)
+    """
+    query = {"image_sha256": {"$exists": True}}
+    total = collection.count_documents(query)
+    cursor = collection.find(query, {"image_sha256": 1}).sort("_id", 1)
+    print(f"{total} detections with an image_sha256", file=sys.stderr)
+
+    raw_ids, raw_vectors = [], []   # embeddings held back until the PCA is fitted
+    chunks, ids = [], []
+    pca = None
+    skipped = processed = 0
+    last_id = None
+
+    def flush(final: bool = False):
+        nonlocal pca
+        if pca is None and raw_vectors and (final or len(raw_vectors) >= pca_sample):
+            pca = fit_pca(np.stack(raw_vectors), dim)
+        if pca is not None and raw_vectors:
+            chunks.append(project(np.stack(raw_vectors), *pca).astype(np.float16))
+            ids.extend(raw_ids)
+            raw_vectors.clear()
+            raw_ids.clear()
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        while True:
+            page = list(islice(cursor, batch_size))
+            if not page:
+                break
+            last_id = str(page[-1]["_id"])
+            # Images uploaded more than once within the batch are embedded once
+            digests = list(dict.fromkeys(record["image_sha256"] for record in page))
+            arrays = dict(zip(digests, pool.map(image_store.load_array, digests)))
+            loaded = [digest for digest in digests if arrays[digest] is not None]
+            vectors = {}
+            if loaded:
+                _, embedded = service.predict_scores(np.stack([arrays[d] for d in loaded]), embeddings=True)
+                vectors = dict(zip(loaded, embedded))
+
+            for record in page:
+                vector = vectors.get(record["image_sha256"])
+                if vector is None:
+                    skipped += 1
+                    continue
+                raw_ids.append(np.frombuffer(record["_id"].binary, dtype=np.uint8))
+                raw_vectors.append(vector)
+            flush()
+
+            processed += len(page)
+            elapsed = time.perf_counter() - started
+            rate = processed / elapsed if elapsed > 0 else 0.0
+            eta = (total - processed) / rate if rate > 0 else 0.0
+            print(f"\r{processed}/{total} detections, {rate:.1f}/sec, ETA {int(eta // 60)}m{int(eta % 60):02d}s",
+                  end="", file=sys.stderr)
+    flush(final=True)
+    print(file=sys.stderr)
+
+    if not chunks:
+        return np.zeros((0, dim), dtype=np.float16), np.zeros((0, 12), dtype=np.uint8), None, None, skipped, last_id
+    return np.concatenate(chunks), np.stack(ids), pca[0], pca[1], skipped, last_id
+
+
+def catch_up(service: DiseaseDetectionService, collection, index: SimilarityIndex, batch_size: int,
+             workers: int) -> int:
+    """
+    Embed detections newer than the build's last_id into its delta file
+
+    Detections already in the delta file (added by the API) are skipped.
+
+    Returns:
+        int: Detections added
+    """
+    query = {"image_sha256": {"$exists": True}}
+    if index.info.get("last_id"):
+        query["_id"] = {"$gt": ObjectId(index.info["last_id"])}
+    present = {record.tobytes() for record in index._delta_records()["id"]}
+    cursor = collection.find(query, {"image_sha256": 1}).sort("_id", 1)
+    added = 0
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        while True:
+            page = list(islice(cursor, batch_size))
+            if not page:
+                break
+            page = [record for record in page if record["_id"].binary not in present]
+            digests = list(dict.fromkeys(record["image_sha256"] for record in page))
+            arrays = dict(zip(digests, pool.map(image_store.load_array, digests)))
+            page = [record for record in page if arrays[record["image_sha256"]] is not None]
+            if not page:
+                continue
+            loaded = list(dict.fromkeys(record["image_sha256"] for record in page))
+            _, embedded = service.predict_scores(np.stack([arrays[d] for d in loaded]), embeddings=True)
+            vectors = dict(zip(loaded, embedded))
+            index.add_batch([str(record["_id"]) for record in page],
+                            np.stack([vectors[record["image_sha256"]] for record in page]))
+            added += len(page)
+    return added
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the similar-case index for /api/disease/similar")
+    parser.add_argument("--model", type=Path, help="Model to embed with (default: the service's trained_model.keras)")
+    parser.add_argument("--output", type=Path, default=SIMILARITY_INDEX_DIR, help="Index directory")
+    parser.add_argument("--dim", type=int, default=128, help="Dimensions kept by the PCA")
+    parser.add_argument("--pca-sample", type=int, default=20_000, help="Embeddings the PCA is fitted on")
+    parser.add_argument("--lists", type=int, help="Inverted lists (default: sqrt of the number of vectors)")
+    parser.add_argument("--batch-size", type=int, default=64, help="Images per model call")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Image loading threads")
+    parser.add_argument("--catch-up", action="store_true",
+                        help="Only add detections newer than the existing index to its delta file")
+    args = parser.parse_args()
+
+    service = DiseaseDetectionService()
+    if args.model:
+        service.model_path = args.model
+    if not service.load_model():
+        sys.exit(f"Could not load model from {service.model_path}")
+    if service.embedding_model is None:
+        sys.exit("This model does not expose embeddings")
+
+    index = SimilarityIndex(args.output)
+    client = MongoClient(MONGODB_URL)
+    try:
+        collection = client[DATABASE_NAME]["disease_detections"]
+        if not args.catch_up:
+            vectors, ids, mean, components, skipped, last_id = embed_detections(
+                service, collection, args.dim, args.pca_sample, args.batch_size, args.workers
+            )
+            if not len(vectors):
+                sys.exit("No stored images to index; enable IMAGE_STORE_ENABLED and collect some detections first")
+            started = time.perf_counter()
+            info = build_ivf(vectors, ids, mean, components, args.output, service.model_version,
+                             n_lists=args.lists, last_id=last_id)
+            print(f"Indexed {info['count']} detections ({skipped} without a stored image) in {info['lists']} lists "
+                  f"({time.perf_counter() - started:.1f}s to cluster and write) -> {args.output}")
+
+        if not index.load(service.model_version):
+            sys.exit(f"No index for model {service.model_version} in {args.output}")
+        added = catch_up(service, collection, index, args.batch_size, args.workers)
+        print(f"Caught up {added} detections newer than {index.info.get('last_id')}")
+        if not args.catch_up:
+            print("Restart the API to serve the new index, then run with --catch-up once more")
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    main()
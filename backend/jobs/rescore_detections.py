@@ -0,0 +1,393 @@
+"""
+Re-score stored disease detections with the current (or a candidate) model
+
+Every detection whose upload is in the image store (see
+services/image_store.py) and whose `model_version` differs from the model's
+is scored again, and its `detection` and `recommendation` are replaced in
+place with a bulk_write:
+
+    {..., detection: {...new...}, recommendation, model_version: <new>, rescored_at}
+
+Records are streamed in `_id` order, one page at a time. A thread pool loads
+the stored 128x128 arrays (or decodes the original when the array is missing,
+and always for records detected with ?tta=true, whose views need the full
+image) while the previous page is scored. Scoring runs in worker processes,
+each with its own copy of the model and a share of the CPUs (as serve.py
+plans them), one batch per call. After each page is written
+the last `_id` is saved to a checkpoint file; run the same command again to
+resume, or pass --restart to start over. Records already at the new version
+are skipped either way, so a re-run never scores anything twice.
+
+The new scores go through the same uncertainty check as the API
+(leaf_filter.check_uncertainty). A detection the new model would reject as
+not a leaf keeps its old result and is flagged for review instead:
+
+    {..., rescore_rejected: {model_version, reason, plant_ratio, entropy, at}}
+
+It is counted as rejected and not picked up again for the same model.
+Detections without a stored image (from before IMAGE_STORE_ENABLED, or
+evicted since) are counted and left untouched.
+
+When a detection's label or healthy flag changes, the /api/stats counters
+move with it: -1 on the old label and +1 on the new one, for the user, the
+global scope and both day buckets. They are written in one bulk_write per
+page, right after the page's detections. Each affected user's counter
+document also gets a `rescored_at`, which changes the /api/dashboard ETag so
+clients do not keep showing the old results.
+
+Usage (from backend/):
+    python jobs/rescore_detections.py
+    python jobs/rescore_detections.py --model /tmp/candidate.keras --batch-size 128 --workers 8
+    python jobs/rescore_detections.py --processes 2 --threads 4
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import numpy as np
+from bson import ObjectId
+from pymongo import MongoClient, UpdateOne
+
+from services.disease_detection import DiseaseDetectionService, TTA_VIEWS
+from services.image_store import image_store
+from services.leaf_filter import leaf_filter, plant_pixel_ratio
+from services.stats import GLOBAL_SCOPE, counter_key, day_id, disease_label, user_scope
+from utils.cpu_budget import SERVE_WORKER_MEMORY_MB, apply_thread_budget, available_cpus, plan_workers
+from utils.database import MONGODB_URL, DATABASE_NAME
+
+CHECKPOINT_DIR = Path(__file__).resolve().parent.parent / "rescore"
+PROJECTION = {
+    "user_id": 1, "image_sha256": 1, "tta": 1, "plant_hint": 1, "model_version": 1, "created_at": 1,
+    "detection.plant": 1, "detection.disease": 1, "detection.is_healthy": 1,
+}
+
+
+def _write_json(path: Path, payload: dict):
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps(payload, indent=2))
+    os.replace(tmp, path)
+
+
+# Per-process state of the scoring workers, set by _init_worker
+_worker = {}
+
+
+def _init_worker(model_path: str, threads: int):
+    # TensorFlow is imported but its runtime has not started yet, so the budget still applies
+    apply_thread_budget(threads)
+    service = DiseaseDetectionService()
+    service.model_path = Path(model_path)
+    if not service.load_model():
+        raise RuntimeError(f"Could not load model from {model_path}")
+    _worker["service"] = service
+
+
+def _score_batch(rows: np.ndarray, views: int, plant: str) -> np.ndarray:
+    return _worker["service"].predict_scores(rows, views=views, plant=plant)
+
+
+def stale_query(model_version: str, after: ObjectId = None) -> dict:
+    query = {
+        "image_sha256": {"$exists": True},
+        "model_version": {"$ne": model_version},
+        "rescore_rejected.model_version": {"$ne": model_version},
+    }
+    if after is not None:
+        query["_id"] = {"$gt": after}
+    return query
+
+
+def iter_pages(collection, model_version: str, after: ObjectId, page_size: int, limit: int = None):
+    """Yield lists of stale records in _id order; each page is one indexed range query"""
+    remaining = limit
+    while remaining is None or remaining > 0:
+        size = page_size if remaining is None else min(page_size, remaining)
+        page = list(
+            collection.find(stale_query(model_version, after), PROJECTION).sort("_id", 1).limit(size)
+        )
+        if not page:
+            return
+        yield page
+        after = page[-1]["_id"]
+        if remaining is not None:
+            remaining -= len(page)
+
+
+def load_inputs(service: DiseaseDetectionService, record: dict):
+    """Model input rows for one record, or None when its image is no longer stored"""
+    digest = record["image_sha256"]
+    if not record.get("tta"):
+        array = image_store.load_array(digest)
+        if array is not None:
+            return array[np.newaxis]
+    original = image_store.original_path(digest)
+    if original is None:
+        return None
+    image_bytes = original.read_bytes()
+    if record.get("tta"):
+        return service.tta_views(image_bytes)
+    return service.preprocess_image(image_bytes)[np.newaxis]
+
+
+def record_key(record: dict) -> tuple:
+    """Records with the same image, tta flag and plant hint get the same prediction"""
+    return record["image_sha256"], bool(record.get("tta")), record.get("plant_hint")
+
+
+def score_page(service: DiseaseDetectionService, pool: ProcessPoolExecutor, page: list, inputs: list,
+               batch_size: int) -> dict:
+    """
+    Predict every distinct (image, tta, plant hint) of a page once
+
+    Batches are spread over the scoring processes; the scores are turned
+    into prediction dicts here. Records detected with a plant hint are
+    restricted to that plant's classes (and scored by its specialist, if
+    one is installed), as in the API. Scores the API would reject as too
+    uncertain come back as leaf_filter.rejection dicts (is_leaf=False).
+
+    Returns:
+        dict: record_key -> prediction dict from service.postprocess, or a rejection
+    """
+    unique = {}
+    for record, rows in zip(page, inputs):
+        if rows is not None:
+            unique.setdefault(record_key(record), rows)
+
+    batches = []
+    for tta, plant in sorted({key[1:] for key in unique}, key=lambda group: (group[0], group[1] or "")):
+        keys = [key for key in unique if key[1:] == (tta, plant)]
+        views = len(TTA_VIEWS) if tta else 1
+        for start in range(0, len(keys), batch_size):
+            chunk = keys[start:start + batch_size]
+            rows = np.concatenate([unique[key] for key in chunk])
+            batches.append((chunk, plant, plant_pixel_ratio(rows[::views]),
+                            pool.submit(_score_batch, rows, views, plant)))
+
+    results = {}
+    for chunk, plant, ratios, future in batches:
+        scores = future.result()
+        certain, entropies = leaf_filter.check_uncertainty(scores)
+        for key, prediction, accepted, ratio, entropy in zip(
+                chunk, service.postprocess(scores, plant=plant), certain, ratios, entropies):
+            results[key] = prediction if accepted else leaf_filter.rejection('uncertain', ratio, entropy)
+    return results
+
+
+def update_operations(page: list, results: dict, model_version: str, now: datetime) -> list:
+    operations = []
+    for record in page:
+        result = results.get(record_key(record))
+        if result is None:
+            continue
+        if not result["is_leaf"]:
+            operations.append(UpdateOne({"_id": record["_id"]}, {"$set": {
+                "rescore_rejected": {"model_version": model_version, **result["rejection"], "at": now},
+            }}))
+            continue
+        operations.append(UpdateOne({"_id": record["_id"]}, {"$set": {
+            "detection": {
+                "plant": result["plant"],
+                "disease": result["disease"],
+                "confidence": result["confidence"],
+                "is_healthy": result["is_healthy"],
+                "top_predictions": result["top_predictions"],
+            },
+            "recommendation": result["recommendation"],
+            "model_version": model_version,
+            "rescored_at": now,
+        }}))
+    return operations
+
+
+def counter_operations(page: list, results: dict, now: datetime) -> list:
+    """
+    Stats updates for one page: move changed labels between counters, stamp the users
+
+    Every record whose label or healthy flag changed adds -1 to the old
+    label and +1 to the new one in the user's and the global counters and
+    in the day bucket of each; totals do not change. The increments of the
+    whole page are merged into one update per counter document.
+    """
+    incs, users = {}, set()
+    for record in page:
+        result = results.get(record_key(record))
+        if result is None or not result["is_leaf"]:
+            continue
+        if record.get("user_id") is not None:
+            users.add(record["user_id"])
+        old = record.get("detection") or {}
+        if "plant" not in old or "created_at" not in record:
+            continue
+        delta = {}
+        old_label = counter_key(disease_label(old["plant"], old["disease"]))
+        new_label = counter_key(disease_label(result["plant"], result["disease"]))
+        if old_label != new_label:
+            delta[f"disease.{old_label}"] = -1
+            delta[f"disease.{new_label}"] = 1
+        healthy = int(bool(result["is_healthy"])) - int(bool(old.get("is_healthy")))
+        if healthy:
+            delta["healthy"] = healthy
+        if not delta:
+            continue
+        day = record["created_at"].strftime("%Y-%m-%d")
+        scopes = [GLOBAL_SCOPE] if record.get("user_id") is None else [user_scope(record["user_id"]), GLOBAL_SCOPE]
+        for scope in scopes:
+            for doc_id in (scope, day_id(scope, day)):
+                inc = incs.setdefault(doc_id, {})
+                for field, n in delta.items():
+                    inc[field] = inc.get(field, 0) + n
+
+    operations = []
+    for user_id in users:
+        update = {"$set": {"rescored_at": now}}
+        inc = {field: n for field, n in incs.pop(user_scope(user_id), {}).items() if n}
+        if inc:
+            update["$inc"] = inc
+        operations.append(UpdateOne({"_id": user_scope(user_id)}, update))
+    for doc_id, inc in incs.items():
+        inc = {field: n for field, n in inc.items() if n}
+        if inc:
+            operations.append(UpdateOne({"_id": doc_id}, {"$inc": inc}))
+    return operations
+
+
+def rescore(service: DiseaseDetectionService, collection, stats_collection, checkpoint_path: Path,
+            page_size: int, batch_size: int, workers: int, plan: dict, limit: int = None) -> dict:
+    """Re-score stale detections page by page, checkpointing after each write"""
+    version = service.model_version
+    checkpoint = json.loads(checkpoint_path.read_text()) if checkpoint_path.exists() else {}
+    after = ObjectId(checkpoint["last_id"]) if checkpoint.get("last_id") else None
+    counts = {"scored": 0, "rejected": 0, "missing_image": 0, "failed": 0, **checkpoint.get("counts", {})}
+    checkpoint.setdefault("started_at", datetime.utcnow().isoformat())
+
+    total = collection.count_documents(stale_query(version, after))
+    if limit:
+        total = min(total, limit)
+    print(f"Model {version}: {total} detections to re-score"
+          + (f", resuming after {after}" if after else ""), file=sys.stderr)
+    print(f"Scoring in {plan['workers']} processes x {plan['threads_per_worker']} threads", file=sys.stderr)
+
+    processed = 0
+    started = time.perf_counter()
+    pages = iter_pages(collection, version, after, page_size, limit)
+    # Spawned, not forked: each worker sets its thread budget before TensorFlow starts
+    scoring = ProcessPoolExecutor(
+        max_workers=plan["workers"], mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker, initargs=(str(service.model_path), plan["threads_per_worker"]),
+    )
+    with scoring, ThreadPoolExecutor(max_workers=workers) as pool:
+        def submit(page):
+            return page, [pool.submit(load_inputs, service, record) for record in page]
+
+        # Load the next page while the current one is being scored
+        pending = next(pages, None)
+        pending = submit(pending) if pending else None
+        while pending is not None:
+            page, futures = pending
+            following = next(pages, None)
+            pending = submit(following) if following else None
+
+            inputs = []
+            for record, future in zip(page, futures):
+                try:
+                    rows = future.result()
+                except Exception as e:
+                    print(f"\nCould not load image for {record['_id']}: {e}", file=sys.stderr)
+                    rows = None
+                    counts["failed"] += 1
+                else:
+                    if rows is None:
+                        counts["missing_image"] += 1
+                inputs.append(rows)
+
+            results = score_page(service, scoring, page, inputs, batch_size)
+            now = datetime.utcnow()
+            operations = update_operations(page, results, version, now)
+            if operations:
+                collection.bulk_write(operations, ordered=False)
+                stats_operations = counter_operations(page, results, now)
+                if stats_operations:
+                    stats_collection.bulk_write(stats_operations, ordered=False)
+            outcomes = [results.get(record_key(record)) for record in page]
+            rejected = sum(1 for result in outcomes if result is not None and not result["is_leaf"])
+            counts["rejected"] += rejected
+            counts["scored"] += len(operations) - rejected
+            processed += len(page)
+
+            checkpoint.update({
+                "model_version": version,
+                "last_id": str(page[-1]["_id"]),
+                "counts": counts,
+                "updated_at": datetime.utcnow().isoformat(),
+            })
+            _write_json(checkpoint_path, checkpoint)
+
+            elapsed = time.perf_counter() - started
+            rate = processed / elapsed if elapsed > 0 else 0.0
+            eta = (total - processed) / rate if rate > 0 else 0.0
+            print(f"\r{processed}/{total} records, {rate:.1f} records/sec, "
+                  f"ETA {int(eta // 60)}m{int(eta % 60):02d}s", end="", file=sys.stderr)
+    print(file=sys.stderr)
+
+    elapsed = time.perf_counter() - started
+    return {
+        **counts,
+        "processed": processed,
+        "elapsed_s": elapsed,
+        "records_per_sec": processed / elapsed if elapsed > 0 else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-score stored disease detections with a new model")
+    parser.add_argument("--model", type=Path, help="Model to score with (default: the service's trained_model.keras)")
+    parser.add_argument("--page-size", type=int, default=1000, help="Records read and written per round trip")
+    parser.add_argument("--batch-size", type=int, default=64, help="Images per model call")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Image loading threads")
+    parser.add_argument("--processes", type=int, default=0,
+                        help="Scoring processes, each with its own model (0: derive from CPUs and memory)")
+    parser.add_argument("--threads", type=int, default=0, help="Model threads per scoring process (0: derive)")
+    parser.add_argument("--worker-memory-mb", type=int, default=SERVE_WORKER_MEMORY_MB,
+                        help="Memory per scoring process, caps the derived process count")
+    parser.add_argument("--limit", type=int, help="Stop after this many records")
+    parser.add_argument("--checkpoint", type=Path, help="Progress file (default: rescore/<model_version>.json)")
+    parser.add_argument("--restart", action="store_true", help="Ignore an existing checkpoint")
+    args = parser.parse_args()
+
+    # The model itself is only loaded in the scoring processes
+    service = DiseaseDetectionService()
+    if args.model:
+        service.model_path = args.model
+    if not service.model_path.exists():
+        sys.exit(f"Model not found at {service.model_path}")
+    service.model_version = service._file_version(service.model_path)
+    plan = plan_workers(available_cpus(), args.processes, args.threads, args.worker_memory_mb)
+
+    checkpoint_path = args.checkpoint or CHECKPOINT_DIR / f"{service.model_version}.json"
+    checkpoint_path.parent.mkdir(parents=True, exist_ok=True)
+    if args.restart:
+        checkpoint_path.unlink(missing_ok=True)
+
+    client = MongoClient(MONGODB_URL)
+    try:
+        database = client[DATABASE_NAME]
+        summary = rescore(service, database["disease_detections"], database["prediction_stats"], checkpoint_path,
+                          args.page_size, args.batch_size, args.workers, plan, args.limit)
+    finally:
+        client.close()
+
+    print(f"Re-scored {summary['scored']} detections ({summary['rejected']} rejected as uncertain and flagged, "
+          f"{summary['missing_image']} without a stored image, {summary['failed']} unreadable) "
+          f"at {summary['records_per_sec']:.1f} records/sec")
+
+
+if __name__ == "__main__":
+    main()
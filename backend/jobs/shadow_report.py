@@ -0,0 +1,86 @@
+"""
+Summarize shadow traffic: does the candidate agree with the serving model?
+
+Reads the comparison store written by services/shadow.py (SHADOW_DB_PATH,
+default backend/shadow/shadow.db) and prints, per route and candidate
+version: how many live requests were compared, the share where the
+candidate gave the same answer, the most frequent disagreements, and p50/p95
+latency of the live serving call and of the candidate in the shadow process.
+The two latencies are not a speed comparison: the shadow process runs niced
+with SHADOW_MODEL_THREADS threads and competes with live traffic. Benchmark
+a candidate's speed on its own (e.g. benchmarks/bench_inference.py).
+
+Exits with status 1 when a candidate's agreement is below --min-agreement,
+so the command can gate a promotion script.
+
+Usage (from backend/):
+    python jobs/shadow_report.py
+    python jobs/shadow_report.py --route disease --hours 48 --min-agreement 0.97
+    python jobs/shadow_report.py --json
+"""
+import argparse
+import json
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Optional
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from services.shadow import shadow_traffic
+
+
+def verdict(entry: dict, min_agreement: float) -> Optional[bool]:
+    """Whether a candidate agrees often enough; None when nothing was compared"""
+    if not entry["compared"]:
+        return None
+    return entry["agreement"] >= min_agreement
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarize shadow traffic comparisons")
+    parser.add_argument("--route", choices=["crop", "fertilizer", "disease"], help="Only this route")
+    parser.add_argument("--hours", type=float, help="Only comparisons from the last N hours (default: all)")
+    parser.add_argument("--candidate", help="Only this candidate version")
+    parser.add_argument("--min-agreement", type=float, default=0.98, help="Agreement a candidate needs to pass")
+    parser.add_argument("--top", type=int, default=5, help="Most frequent disagreements to list")
+    parser.add_argument("--db", type=Path, help="Comparison store (default: SHADOW_DB_PATH)")
+    parser.add_argument("--json", action="store_true", help="Print the summary as JSON")
+    args = parser.parse_args()
+
+    if args.db:
+        shadow_traffic.db_path = args.db
+    since = datetime.utcnow() - timedelta(hours=args.hours) if args.hours else None
+    report = shadow_traffic.report(args.route, since, args.candidate, args.top)
+    if not report:
+        sys.exit(f"No shadow comparisons in {shadow_traffic.db_path}; set SHADOW_SAMPLE_RATE and a SHADOW_* candidate")
+
+    failed = False
+    for entries in report.values():
+        for entry in entries.values():
+            entry["agrees"] = verdict(entry, args.min_agreement)
+            failed |= entry["agrees"] is False
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        sys.exit(1 if failed else 0)
+
+    for route, entries in report.items():
+        for version, entry in entries.items():
+            primary = ", ".join(entry["primary_versions"]) or "?"
+            print(f"\n{route}: candidate {version} vs serving {primary}")
+            print(f"  compared      {entry['compared']} requests ({entry['errors']} errors)")
+            if not entry["compared"]:
+                continue
+            print(f"  agreement     {entry['agreement']:.2%}  "
+                  f"({'PASS' if entry['agrees'] else 'FAIL'}, needs {args.min_agreement:.0%})")
+            print(f"  live request  p50 {entry['primary_p50_ms']:.2f} ms, p95 {entry['primary_p95_ms']:.2f} ms")
+            print(f"  shadow proc.  p50 {entry['candidate_p50_ms']:.2f} ms, p95 {entry['candidate_p95_ms']:.2f} ms "
+                  "(niced, not comparable with the live request)")
+            for row in entry["disagreements"]:
+                print(f"    {row['count']:>6}x  {row['primary']}  ->  {row['candidate']}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
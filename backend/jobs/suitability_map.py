@@ -0,0 +1,380 @@
+"""
+Region-wide crop suitability maps ("map mode")
+
+Runs the crop model over every cell of a grid of soil and climate values and
+writes the predicted crop index per cell, tile by tile:
+
+    <output>/
+        grid.json                       grid shape, origin, tile size, labels, model version
+        staging/features.npy            (gridded CSV input only) the CSV as an (H, W, 7) float32 raster
+        tiles/r0003_c0007.npy           int16 class index per cell, -1 where any input is missing
+        tiles/r0003_c0007.json          per-tile summary: valid cells, counts per crop, dominant crop
+        summary.json                    counts over the whole grid
+        classes.npy                     (--mosaic) the full class-index raster
+
+Inputs, in the feature order N, P, K, temperature, humidity, ph, rainfall:
+
+    .npy   a float array shaped (H, W, 7) or (7, H, W), read memory-mapped
+    .tif   a 7-band raster, read window by window (needs rasterio)
+    .csv   one row per cell with the 7 feature columns plus either row/col
+           indices or x/y coordinates (with --cell-size). A row/col grid
+           starts at the smallest index present (grid.json "origin"); rows
+           with an unusable position are dropped and counted
+
+Tiles are independent tasks for a process pool; each worker loads the model
+once, reads only its own window and runs one vectorized predict per tile, so
+memory is bounded by tile size x workers. A tile's summary is written after
+its class array, atomically, and marks the tile done: an interrupted run
+picks up where it stopped when started again with the same arguments.
+
+Usage (from backend/):
+    python jobs/suitability_map.py district.npy --output maps/district
+    python jobs/suitability_map.py district.csv --output maps/district --cell-size 250 --workers 8 --mosaic
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import numpy as np
+from numpy.lib.format import open_memmap
+
+FEATURE_COLUMNS = ["N", "P", "K", "temperature", "humidity", "ph", "rainfall"]
+NODATA = -1
+
+
+def _write_atomic(path: Path, write):
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "wb") as f:
+        write(f)
+    os.replace(tmp, path)
+
+
+def _write_json(path: Path, payload: dict):
+    _write_atomic(path, lambda f: f.write(json.dumps(payload, indent=2).encode()))
+
+
+# ---------------------------------------------------------------------------
+# Grid sources
+
+class NpyGrid:
+    """A memory-mapped (H, W, 7) or (7, H, W) array"""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.array = np.load(path, mmap_mode="r")
+        if self.array.ndim != 3 or len(FEATURE_COLUMNS) not in (self.array.shape[0], self.array.shape[2]):
+            raise ValueError(f"{path} must be shaped (H, W, 7) or (7, H, W), got {self.array.shape}")
+        self.bands_first = self.array.shape[2] != len(FEATURE_COLUMNS)
+        self.shape = self.array.shape[1:] if self.bands_first else self.array.shape[:2]
+        self.transform = None
+
+    def read(self, row: int, col: int, height: int, width: int) -> np.ndarray:
+        if self.bands_first:
+            block = self.array[:, row:row + height, col:col + width].transpose(1, 2, 0)
+        else:
+            block = self.array[row:row + height, col:col + width]
+        return np.asarray(block, dtype=np.float32)
+
+
+class RasterioGrid:
+    """A 7-band GeoTIFF (or any raster GDAL reads), read by window"""
+
+    def __init__(self, path: Path):
+        import rasterio
+
+        self.path = path
+        self.dataset = rasterio.open(path)
+        if self.dataset.count != len(FEATURE_COLUMNS):
+            raise ValueError(f"{path} has {self.dataset.count} bands, expected {len(FEATURE_COLUMNS)}")
+        self.shape = (self.dataset.height, self.dataset.width)
+        self.transform = list(self.dataset.transform)[:6]
+
+    def read(self, row: int, col: int, height: int, width: int) -> np.ndarray:
+        from rasterio.windows import Window
+
+        block = self.dataset.read(window=Window(col, row, width, height), masked=True).astype(np.float32)
+        return block.filled(np.nan).transpose(1, 2, 0)
+
+
+def open_grid(path: Path):
+    if path.suffix.lower() == ".npy":
+        return NpyGrid(path)
+    return RasterioGrid(path)
+
+
+def _iter_csv_chunks(path: Path, columns: list, chunk_rows: int):
+    """Yield {column: float64 array} for chunk_rows rows at a time"""
+    try:
+        import pandas as pd
+    except ImportError:
+        pd = None
+
+    if pd is not None:
+        for chunk in pd.read_csv(path, usecols=columns, chunksize=chunk_rows):
+            yield {name: chunk[name].to_numpy(dtype=np.float64) for name in columns}
+        return
+
+    with open(path, newline="") as f:
+        reader = csv.DictReader(f)
+        rows = []
+        for row in reader:
+            rows.append([float(row[name]) if row[name] != "" else np.nan for name in columns])
+            if len(rows) == chunk_rows:
+                block = np.asarray(rows)
+                yield {name: block[:, i] for i, name in enumerate(columns)}
+                rows = []
+        if rows:
+            block = np.asarray(rows)
+            yield {name: block[:, i] for i, name in enumerate(columns)}
+
+
+def _valid_positions(chunk: dict, position: list, by_index: bool) -> np.ndarray:
+    """Rows whose position is usable: finite, and non-negative for row/col indices"""
+    valid = np.ones(len(chunk[position[0]]), dtype=bool)
+    for name in position:
+        valid &= np.isfinite(chunk[name])
+        if by_index:
+            valid &= chunk[name] >= 0
+    return valid
+
+
+def stage_csv(path: Path, staging_dir: Path, chunk_rows: int, cell_size: float = None) -> dict:
+    """
+    Stream a gridded CSV into an (H, W, 7) float32 .npy raster, cells without a row stay NaN
+
+    Only chunk_rows rows are held at a time. Skipped when a staged copy of
+    the same source file already exists. Rows whose position is missing,
+    non-finite or (for row/col indices) negative are dropped and counted.
+    Row/col grids start at the smallest index present; "origin" records it.
+
+    Returns:
+        dict: path, shape, transform (or None), origin and dropped_rows
+    """
+    target = staging_dir / "features.npy"
+    marker = staging_dir / "staged.json"
+    stat = path.stat()
+    source = {"source": str(path.resolve()), "size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "cell_size": cell_size}
+    if marker.exists() and target.exists():
+        staged = json.loads(marker.read_text())
+        if staged["source"] == source:
+            return {**staged, "path": target}
+
+    with open(path, newline="") as f:
+        header = next(csv.reader(f))
+    by_index = "row" in header and "col" in header
+    if not by_index and not ("x" in header and "y" in header and cell_size):
+        raise ValueError("Gridded CSV needs row/col columns, or x/y columns together with --cell-size")
+    position = ["row", "col"] if by_index else ["x", "y"]
+
+    # First pass: grid extent over the rows with a usable position
+    lo, hi = np.full(2, np.inf), np.full(2, -np.inf)
+    dropped = 0
+    for chunk in _iter_csv_chunks(path, position, chunk_rows):
+        valid = _valid_positions(chunk, position, by_index)
+        dropped += int((~valid).sum())
+        if not valid.any():
+            continue
+        for i, name in enumerate(position):
+            lo[i] = min(lo[i], chunk[name][valid].min())
+            hi[i] = max(hi[i], chunk[name][valid].max())
+    if not np.isfinite(lo).all():
+        raise ValueError(f"{path} has no rows with a usable {'/'.join(position)} position")
+    if by_index:
+        origin = [int(lo[0]), int(lo[1])]
+        shape = (int(hi[0]) - origin[0] + 1, int(hi[1]) - origin[1] + 1)
+        transform = None
+    else:
+        origin = [0, 0]
+        shape = (int(round((hi[1] - lo[1]) / cell_size)) + 1, int(round((hi[0] - lo[0]) / cell_size)) + 1)
+        # Affine (a, b, c, d, e, f) as in GDAL/rasterio; cell centres on the input coordinates
+        transform = [cell_size, 0.0, lo[0] - cell_size / 2, 0.0, -cell_size, hi[1] + cell_size / 2]
+
+    # Second pass: scatter the features into the raster
+    staging_dir.mkdir(parents=True, exist_ok=True)
+    tmp = staging_dir / "features.npy.tmp"
+    raster = open_memmap(tmp, mode="w+", dtype=np.float32, shape=(*shape, len(FEATURE_COLUMNS)))
+    raster[:] = np.nan
+    for chunk in _iter_csv_chunks(path, position + FEATURE_COLUMNS, chunk_rows):
+        valid = _valid_positions(chunk, position, by_index)
+        chunk = {name: values[valid] for name, values in chunk.items()}
+        if by_index:
+            rows = chunk["row"].astype(np.intp) - origin[0]
+            cols = chunk["col"].astype(np.intp) - origin[1]
+        else:
+            rows = np.rint((hi[1] - chunk["y"]) / cell_size).astype(np.intp)
+            cols = np.rint((chunk["x"] - lo[0]) / cell_size).astype(np.intp)
+        raster[rows, cols] = np.column_stack([chunk[name] for name in FEATURE_COLUMNS])
+    raster.flush()
+    del raster
+    os.replace(tmp, target)
+    staged = {"source": source, "shape": list(shape), "transform": transform, "origin": origin, "dropped_rows": dropped}
+    _write_json(marker, staged)
+    return {**staged, "path": target}
+
+
+# ---------------------------------------------------------------------------
+# Workers
+
+_worker = {}
+
+
+def _init_worker(grid_path: str, model_threads: int):
+    from services.ml_model import ml_service
+
+    ml_service.load_model()
+    model = ml_service.model
+    # One process per core already; keep the model from spawning its own thread pool
+    if hasattr(model, "get_params") and "n_jobs" in model.get_params():
+        model.set_params(n_jobs=model_threads)
+    _worker["grid"] = open_grid(Path(grid_path))
+    _worker["service"] = ml_service
+
+
+def predict_block(service, block: np.ndarray) -> np.ndarray:
+    """Class index per cell of an (h, w, 7) block, NODATA where any feature is missing"""
+    flat = block.reshape(-1, len(FEATURE_COLUMNS))
+    valid = np.isfinite(flat).all(axis=1)
+    classes = np.full(flat.shape[0], NODATA, dtype=np.int16)
+    if valid.any():
+        classes[valid] = service.predict_crop_batch(flat[valid])
+    return classes.reshape(block.shape[:2])
+
+
+def _run_tile(tile: tuple, tiles_dir: str, n_classes: int) -> dict:
+    ty, tx, row, col, height, width = tile
+    started = time.perf_counter()
+    classes = predict_block(_worker["service"], _worker["grid"].read(row, col, height, width))
+
+    counts = np.bincount(classes[classes != NODATA].astype(np.intp), minlength=n_classes)
+    name = f"r{ty:04d}_c{tx:04d}"
+    _write_atomic(Path(tiles_dir) / f"{name}.npy", lambda f: np.save(f, classes))
+    summary = {
+        "tile": [ty, tx],
+        "window": {"row": row, "col": col, "height": height, "width": width},
+        "valid_cells": int(counts.sum()),
+        "counts": counts.tolist(),
+        "dominant": int(counts.argmax()) if counts.sum() else None,
+        "seconds": time.perf_counter() - started,
+    }
+    # Written last: its presence marks the tile as done
+    _write_json(Path(tiles_dir) / f"{name}.json", summary)
+    return summary
+
+
+# ---------------------------------------------------------------------------
+# Driver
+
+def iter_tiles(shape: tuple, tile_size: int):
+    height, width = shape
+    for ty, row in enumerate(range(0, height, tile_size)):
+        for tx, col in enumerate(range(0, width, tile_size)):
+            yield ty, tx, row, col, min(tile_size, height - row), min(tile_size, width - col)
+
+
+def write_mosaic(output: Path, shape: tuple, tile_size: int):
+    """Assemble the per-tile arrays into one class-index raster, one tile in memory at a time"""
+    mosaic = open_memmap(output / "classes.npy.tmp", mode="w+", dtype=np.int16, shape=shape)
+    for ty, tx, row, col, height, width in iter_tiles(shape, tile_size):
+        mosaic[row:row + height, col:col + width] = np.load(output / "tiles" / f"r{ty:04d}_c{tx:04d}.npy")
+    mosaic.flush()
+    del mosaic
+    os.replace(output / "classes.npy.tmp", output / "classes.npy")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Crop suitability map over a feature grid")
+    parser.add_argument("input", type=Path, help=".npy, raster (.tif) or gridded .csv")
+    parser.add_argument("--output", type=Path, required=True, help="Output directory")
+    parser.add_argument("--tile-size", type=int, default=512, help="Cells per tile side")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--model-threads", type=int, default=1, help="Threads per worker for the model")
+    parser.add_argument("--chunk-rows", type=int, default=500_000, help="CSV rows read at a time")
+    parser.add_argument("--cell-size", type=float, help="Cell size for CSVs with x/y coordinates")
+    parser.add_argument("--mosaic", action="store_true", help="Also write the full class raster")
+    parser.add_argument("--force", action="store_true", help="Discard finished tiles and start over")
+    args = parser.parse_args()
+
+    from services.ml_model import ml_service
+
+    ml_service.load_model()
+    n_classes = len(ml_service.labels) if ml_service.labels else len(ml_service.model.classes_)
+    labels = [ml_service.crop_name(i) for i in range(n_classes)]
+
+    args.output.mkdir(parents=True, exist_ok=True)
+    grid_path, transform, origin = args.input, None, None
+    if args.input.suffix.lower() == ".csv":
+        print(f"Staging {args.input} ...")
+        staged = stage_csv(args.input, args.output / "staging", args.chunk_rows, args.cell_size)
+        grid_path, transform, origin = staged["path"], staged["transform"], staged["origin"]
+        if staged["dropped_rows"]:
+            print(f"Dropped {staged['dropped_rows']:,} rows with a missing, non-finite or negative position")
+    grid = open_grid(grid_path)
+
+    config = {
+        "source": str(args.input.resolve()),
+        "shape": list(grid.shape),
+        "tile_size": args.tile_size,
+        "model_version": ml_service.model_version,
+        "features": FEATURE_COLUMNS,
+        "labels": labels,
+        "nodata": NODATA,
+        "transform": grid.transform or transform,
+        "origin": origin,
+    }
+    config_path = args.output / "grid.json"
+    tiles_dir = args.output / "tiles"
+    if config_path.exists() and not args.force:
+        previous = json.loads(config_path.read_text())
+        if previous != config:
+            sys.exit(f"{args.output} holds a map made with different input, tiling or model; use --force to redo it")
+    elif args.force and tiles_dir.exists():
+        for path in tiles_dir.iterdir():
+            path.unlink()
+    tiles_dir.mkdir(exist_ok=True)
+    _write_json(config_path, config)
+
+    tiles = list(iter_tiles(grid.shape, args.tile_size))
+    pending = [t for t in tiles if not (tiles_dir / f"r{t[0]:04d}_c{t[1]:04d}.json").exists()]
+    print(f"Grid {grid.shape[0]}x{grid.shape[1]}: {len(tiles)} tiles, {len(tiles) - len(pending)} already done")
+
+    started = time.perf_counter()
+    cells = 0
+    if pending:
+        with ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker,
+                                 initargs=(str(grid_path), args.model_threads)) as pool:
+            futures = [pool.submit(_run_tile, tile, str(tiles_dir), n_classes) for tile in pending]
+            for done, future in enumerate(as_completed(futures), 1):
+                summary = future.result()
+                window = summary["window"]
+                cells += window["height"] * window["width"]
+                elapsed = time.perf_counter() - started
+                print(f"\r{done}/{len(pending)} tiles, {cells / elapsed:,.0f} cells/sec", end="", flush=True)
+        print()
+
+    totals = np.zeros(n_classes, dtype=np.int64)
+    for ty, tx, *_ in tiles:
+        totals += json.loads((tiles_dir / f"r{ty:04d}_c{tx:04d}.json").read_text())["counts"]
+    summary = {
+        "tiles": len(tiles),
+        "valid_cells": int(totals.sum()),
+        "counts": {label: int(n) for label, n in zip(labels, totals) if n},
+    }
+    _write_json(args.output / "summary.json", summary)
+
+    if args.mosaic:
+        write_mosaic(args.output, tuple(grid.shape), args.tile_size)
+
+    print(f"{summary['valid_cells']:,} cells mapped; results in {args.output}")
+    for label, n in sorted(summary["counts"].items(), key=lambda item: -item[1])[:5]:
+        print(f"  {label:<15} {n / max(summary['valid_cells'], 1):6.1%}")
+
+
+if __name__ == "__main__":
+    main()
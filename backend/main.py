@@ -3,16 +3,34 @@ from fastapi.middleware.cors import CORSMiddleware
 from routes.auth import router as auth_router
 from routes.predictions import router as predictions_router
 from routes.disease import router as disease_router
+from routes.admin import router as admin_router
+from routes.stats import router as stats_router
+from routes.binary import router as binary_router
+from routes.dashboard import router as dashboard_router
 from utils.database import connect_to_mongo, close_mongo_connection
+from utils.logging_config import setup_logging, shutdown_logging
+from utils.responses import FastJSONResponse, add_compression
+from utils.rate_limit import RateLimitHeadersMiddleware
 from services.ml_model import ml_service
+from services.fertilizer import fertilizer_service
 from services.disease_detection import disease_service
+from services.similarity_index import similarity_index
+from services.shadow import shadow_traffic
+from services.drift import drift_monitor
 from dotenv import load_dotenv
 import os
 
 # Load environment variables
 load_dotenv()
 
-app = FastAPI(title="AgriDoctor API", description="Smart Agriculture Prediction System")
+# Queue-based logging: handlers run on a background thread, off the event loop
+setup_logging()
+
+app = FastAPI(
+    title="AgriDoctor API",
+    description="Smart Agriculture Prediction System",
+    default_response_class=FastJSONResponse
+)
 
 # CORS middleware for frontend connection - MUST be added before routes
 app.add_middleware(
@@ -30,21 +48,37 @@ app.add_middleware(
     expose_headers=["*"],
 )
 
+# Brotli/gzip for large payloads such as prediction history
+add_compression(app)
+
+# X-RateLimit-* headers on every charged response, including routes that return a Response
+app.add_middleware(RateLimitHeadersMiddleware)
+
 @app.on_event("startup")
 async def startup_db_client():
     await connect_to_mongo()
     # Load ML models at startup
     ml_service.load_model()
+    fertilizer_service.load()
+    drift_monitor.load()
     disease_service.load_model()  # Will return False if model file not found, but won't crash
+    similarity_index.load(disease_service.model_version)
+    shadow_traffic.load()  # Candidate models, only when SHADOW_SAMPLE_RATE > 0
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
     await close_mongo_connection()
+    shadow_traffic.stop()
+    shutdown_logging()
 
 # Include routers
 app.include_router(auth_router, prefix="/api/auth", tags=["Authentication"])
 app.include_router(predictions_router, tags=["Predictions"])
 app.include_router(disease_router, tags=["Disease Detection"])
+app.include_router(admin_router, tags=["Admin"])
+app.include_router(stats_router, tags=["Statistics"])
+app.include_router(dashboard_router, tags=["Dashboard"])
+app.include_router(binary_router, tags=["Binary"])
 
 @app.get("/")
 async def root():
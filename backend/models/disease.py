@@ -1,5 +1,12 @@
 from pydantic import BaseModel
 from typing import List, Optional
+from functools import lru_cache
+
+class TopPrediction(BaseModel):
+    """One of the model's highest-scoring classes"""
+    disease: str
+    plant: str
+    confidence: float
 
 class DiseaseDetectionResponse(BaseModel):
     """Response schema for disease detection"""
@@ -8,9 +15,10 @@ class DiseaseDetectionResponse(BaseModel):
     disease: str
     confidence: float
     is_healthy: bool
-    top_predictions: List[dict]
+    top_predictions: List[TopPrediction]
     message: str
     recommendation: Optional[str] = None
+    is_leaf: bool = True
     
     class Config:
         json_schema_extra = {
@@ -54,15 +62,21 @@ DISEASE_RECOMMENDATIONS = {
     'Haunglongbing Citrus greening': 'Remove infected trees. Control Asian citrus psyllid.'
 }
 
+# Lower-cased once so lookups don't re-lower every key
+_RECOMMENDATION_KEYS = [(key.lower(), value) for key, value in DISEASE_RECOMMENDATIONS.items()]
+
+@lru_cache(maxsize=256)
 def get_recommendation(disease_name: str) -> str:
     """Get treatment recommendation for a disease"""
+    disease_lower = disease_name.lower()
+    
     # Check for exact match first
-    for key, value in DISEASE_RECOMMENDATIONS.items():
-        if key.lower() in disease_name.lower():
+    for key, value in _RECOMMENDATION_KEYS:
+        if key in disease_lower:
             return value
     
     # Return general advice if no specific recommendation
-    if 'healthy' in disease_name.lower():
+    if 'healthy' in disease_lower:
         return 'Your plant looks healthy! Continue regular care and monitoring.'
     else:
         return 'Consult with a local agricultural expert for specific treatment recommendations.'
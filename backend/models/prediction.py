@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field, validator
-from typing import Optional
+from typing import Dict, Optional
 
 class CropPredictionInput(BaseModel):
     """Input schema for crop recommendation prediction"""
@@ -62,7 +62,7 @@ class CropPredictionResponse(BaseModel):
             "example": {
                 "success": True,
                 "crop": "Rice",
-                "crop_id": 11,
+                "crop_id": 20,
                 "confidence": "Model provides categorical prediction",
                 "message": "Based on the provided soil and climate conditions, Rice is recommended."
             }
@@ -74,6 +74,7 @@ class FertilizerPredictionResponse(BaseModel):
     fertilizer: str
     fertilizer_id: int
     explanation: str
+    deficits: Optional[Dict[str, float]] = None
     message: str
     
     class Config:
@@ -82,20 +83,25 @@ class FertilizerPredictionResponse(BaseModel):
                 "success": True,
                 "fertilizer": "Urea",
                 "fertilizer_id": 0,
-                "explanation": "Urea is recommended for optimal nitrogen supply.",
+                "explanation": "Soil is short of N by 43 kg/ha for rice. High nitrogen content fertilizer, ideal for leafy growth and green crops.",
+                "deficits": {"N": 43.0, "P": 0.0, "K": 0.0},
                 "message": "Based on your soil analysis and crop type, Urea fertilizer is recommended."
             }
         }
 
-# Crop mapping (common crops in agriculture)
-CROP_MAPPING = {
-    0: "Rice", 1: "Maize", 2: "Chickpea", 3: "Kidney Beans", 4: "Pigeon Peas",
-    5: "Moth Beans", 6: "Mung Bean", 7: "Black Gram", 8: "Lentil", 9: "Pomegranate",
-    10: "Banana", 11: "Mango", 12: "Grapes", 13: "Watermelon", 14: "Muskmelon",
-    15: "Apple", 16: "Orange", 17: "Papaya", 18: "Coconut", 19: "Cotton",
-    20: "Jute", 21: "Coffee"
+# Display names for the dataset labels listed in models/manifest.json
+CROP_DISPLAY_NAMES = {
+    "rice": "Rice", "maize": "Maize", "chickpea": "Chickpea", "kidneybeans": "Kidney Beans",
+    "pigeonpeas": "Pigeon Peas", "mothbeans": "Moth Beans", "mungbean": "Mung Bean",
+    "blackgram": "Black Gram", "lentil": "Lentil", "pomegranate": "Pomegranate",
+    "banana": "Banana", "mango": "Mango", "grapes": "Grapes", "watermelon": "Watermelon",
+    "muskmelon": "Muskmelon", "apple": "Apple", "orange": "Orange", "papaya": "Papaya",
+    "coconut": "Coconut", "cotton": "Cotton", "jute": "Jute", "coffee": "Coffee"
 }
 
+# Crop mapping - the notebooks encode labels with LabelEncoder, i.e. in alphabetical order
+CROP_MAPPING = {i: CROP_DISPLAY_NAMES[label] for i, label in enumerate(sorted(CROP_DISPLAY_NAMES))}
+
 # Fertilizer mapping
 FERTILIZER_MAPPING = {
     0: "Urea", 1: "DAP", 2: "14-35-14", 3: "28-28", 4: "17-17-17",
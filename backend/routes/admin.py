@@ -0,0 +1,94 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import FileResponse
+from datetime import datetime, timedelta
+from utils.auth import get_current_admin
+from utils.profiling import request_profiler
+from services.stats import stats_service
+from utils.rate_limit import rate_limiter
+from services.ml_model import ml_service
+from services.disease_detection import disease_service
+from services.image_store import image_store
+from services.leaf_filter import leaf_filter
+from services.shadow import shadow_traffic
+from services.drift import drift_monitor
+from services.similarity_index import similarity_index
+
+router = APIRouter(prefix="/api/admin", tags=["Admin"])
+
+@router.get("/profiles")
+async def list_profiles(current_user: dict = Depends(get_current_admin)):
+    """List saved inference profiles (collapsed stacks), newest first"""
+    profiles = request_profiler.list_profiles()
+    return {
+        "success": True,
+        "count": len(profiles),
+        "profiles": profiles
+    }
+
+@router.get("/profiles/{filename}")
+async def download_profile(filename: str, current_user: dict = Depends(get_current_admin)):
+    """Download a saved profile for flamegraph.pl or speedscope"""
+    try:
+        path = request_profiler.get_profile_path(filename)
+    except FileNotFoundError:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Profile not found"
+        )
+    
+    return FileResponse(path, media_type="text/plain", filename=path.name)
+
+@router.post("/stats/rebuild")
+async def rebuild_stats(current_user: dict = Depends(get_current_admin)):
+    """Recompute the /api/stats counters from the raw prediction history"""
+    try:
+        result = await stats_service.rebuild()
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to rebuild stats: {str(e)}"
+        )
+    
+    return {"success": True, **result}
+
+@router.get("/rate-limits")
+async def rate_limit_metrics(current_user: dict = Depends(get_current_admin)):
+    """Rate limiter settings and allowed/throttled counts per route since startup"""
+    return {"success": True, **rate_limiter.metrics()}
+
+@router.get("/single-flight")
+async def single_flight_metrics(current_user: dict = Depends(get_current_admin)):
+    """How many inference calls were coalesced with an identical in-flight one since startup"""
+    return {
+        "success": True,
+        "crop": ml_service.crop_flight.metrics(),
+        "disease": disease_service.disease_flight.metrics(),
+    }
+
+@router.get("/image-store")
+def image_store_metrics(current_user: dict = Depends(get_current_admin)):
+    """Size of the uploaded image store and how many uploads were deduplicated"""
+    # Plain def: the first call scans the store on disk, so it runs in the threadpool
+    return {"success": True, **image_store.metrics()}
+
+@router.get("/leaf-filter")
+async def leaf_filter_metrics(current_user: dict = Depends(get_current_admin)):
+    """Uploads checked by the leaf pre-filter and how many were rejected before and after the model"""
+    return {"success": True, **leaf_filter.metrics()}
+
+@router.get("/shadow")
+def shadow_metrics(hours: float = 24, current_user: dict = Depends(get_current_admin)):
+    """Shadow traffic counters and each candidate's agreement and latency over the last `hours`"""
+    # Plain def: the report reads the SQLite comparison store, so it runs in the threadpool
+    since = datetime.utcnow() - timedelta(hours=hours)
+    return {"success": True, **shadow_traffic.metrics(), "report": shadow_traffic.report(since=since)}
+
+@router.get("/drift")
+async def drift_metrics(current_user: dict = Depends(get_current_admin)):
+    """PSI and KS drift of crop and fertilizer request features against the training data"""
+    return {"success": True, **drift_monitor.metrics()}
+
+@router.get("/similarity-index")
+async def similarity_index_metrics(current_user: dict = Depends(get_current_admin)):
+    """Similar-case index build info, vectors added since the build and searches served"""
+    return {"success": True, **similarity_index.metrics()}
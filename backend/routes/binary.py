@@ -0,0 +1,261 @@
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from typing import Optional
+import asyncio
+import struct
+import logging
+import numpy as np
+from models.prediction import CROP_MAPPING, CropPredictionInput
+from models.user import UserResponse
+from utils.auth import get_current_user
+from utils.rate_limit import rate_limiter, ROUTE_COSTS
+from utils.responses import DuplexStreamingResponse
+from services.ml_model import ml_service
+from services.disease_detection import disease_service
+from services.drift import drift_monitor, FEATURES
+from routes.disease import MAX_UPLOAD_BYTES
+
+logger = logging.getLogger(__name__)
+router = APIRouter(prefix="/api/binary", tags=["Binary"])
+
+# Crop requests are rows of little-endian float32 in FEATURES order; answers are one uint8 crop index per row
+CROP_ROW_BYTES = len(FEATURES) * 4
+CROP_MAX_ROWS = 4096
+# Answer for a row with a NaN, an infinity or a value outside CropPredictionInput's bounds
+INVALID_ROW = 0xFF
+# Disease requests are frames of a uint32 little-endian length followed by the encoded image;
+# answers are one record per image: status, class index, confidence
+FRAME_HEADER = struct.Struct("<I")
+DISEASE_RECORD = struct.Struct("<BxHf")
+DISEASE_MAX_IMAGES = 16
+STATUS_OK, STATUS_NOT_A_LEAF, STATUS_UNREADABLE = 0, 1, 2
+NO_CLASS = 0xFFFF
+
+
+def field_bounds(model, names: list, bound: str) -> np.ndarray:
+    """One Field constraint ("ge" or "le") of a pydantic model, per field name"""
+    return np.array([
+        next(getattr(rule, bound) for rule in model.model_fields[name].metadata if hasattr(rule, bound))
+        for name in names
+    ], dtype=np.float64)
+
+
+# Same per-feature bounds as the JSON route validates
+CROP_MIN = field_bounds(CropPredictionInput, FEATURES, "ge")
+CROP_MAX = field_bounds(CropPredictionInput, FEATURES, "le")
+
+
+async def charge(user_id: str, route: str, units: int):
+    """
+    Charge units calls of route against the user's bucket
+
+    A stream cannot be answered with 429 once it has started, so a throttled
+    stream waits for its bucket to refill instead: the client is slowed
+    down, not cut off. The bucket never holds more than its capacity, so a
+    larger cost is taken in capacity-sized pieces.
+    """
+    if not rate_limiter.enabled:
+        return
+    cost = units * ROUTE_COSTS[route]
+    while cost > 0:
+        piece = min(cost, rate_limiter.capacity)
+        allowed, _, retry_after = await rate_limiter.check(user_id, route, piece)
+        if allowed:
+            cost -= piece
+        else:
+            await asyncio.sleep(retry_after)
+
+
+@router.get("/crop/labels")
+async def crop_labels():
+    """Crop names in the order of the indices returned by /api/binary/crop, and the invalid-row marker"""
+    count = len(ml_service.labels) if ml_service.labels is not None else len(CROP_MAPPING)
+    return {
+        "success": True,
+        "model_version": ml_service.model_version,
+        "labels": [ml_service.crop_name(i) for i in range(count)],
+        "invalid_row": INVALID_ROW,
+    }
+
+
+@router.post("/crop")
+async def predict_crop_stream(
+    request: Request,
+    current_user: UserResponse = Depends(get_current_user)
+):
+    """
+    Predict crops for a stream of raw feature rows
+
+    The body is any number of 28-byte rows: N, P, K, temperature, humidity,
+    ph and rainfall as little-endian float32. The response streams back one
+    byte per row, the crop index (see /api/binary/crop/labels), in request
+    order. Rows are predicted as they arrive, up to 4096 per model call, so
+    a client can keep one request open and interleave writes and reads.
+    A row with a NaN, an infinity or a value outside the JSON route's
+    bounds is answered with 255 and is not predicted.
+
+    Same service and drift monitor as /api/predict/crop, but predictions
+    are not saved to the history or counted in the stats.
+    """
+    if ml_service.model is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="ML model not loaded"
+        )
+    length = request.headers.get("content-length")
+    if length is not None and not length.isdigit():
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid Content-Length '{length}'"
+        )
+    if length is not None and int(length) % CROP_ROW_BYTES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Body must be a whole number of {CROP_ROW_BYTES}-byte rows"
+        )
+    loop = asyncio.get_running_loop()
+
+    async def predict(rows: np.ndarray) -> bytes:
+        await charge(current_user["id"], "binary_crop_row", len(rows))
+        # NaN fails both comparisons, so it is caught along with out-of-range values
+        valid = ((rows >= CROP_MIN) & (rows <= CROP_MAX)).all(axis=1)
+        answers = np.full(len(rows), INVALID_ROW, dtype=np.uint8)
+        if valid.any():
+            rows = rows[valid]
+            drift_monitor.observe_batch("crop", rows)
+            # Same worker pool as the JSON route, so both share the inference thread budget
+            crop_ids = await loop.run_in_executor(
+                ml_service.crop_flight.executor, ml_service.predict_crop_batch, rows
+            )
+            answers[valid] = crop_ids
+        return answers.tobytes()
+
+    async def answers():
+        buffer = bytearray()
+        async for body in request.stream():
+            buffer += body
+            while len(buffer) >= CROP_ROW_BYTES:
+                size = min(len(buffer) // CROP_ROW_BYTES, CROP_MAX_ROWS) * CROP_ROW_BYTES
+                rows = np.frombuffer(bytes(buffer[:size]), dtype="<f4").reshape(-1, len(FEATURES))
+                del buffer[:size]
+                yield await predict(rows)
+        if buffer:
+            logger.warning("Binary crop stream ended mid-row (%d trailing bytes ignored)", len(buffer))
+
+    return DuplexStreamingResponse(
+        answers(), media_type="application/octet-stream",
+        headers={"X-Model-Version": ml_service.model_version or ""}
+    )
+
+
+@router.get("/disease/labels")
+async def disease_labels():
+    """Plant and disease names in the order of the class indices returned by /api/binary/disease"""
+    return {
+        "success": True,
+        "model_version": disease_service.model_version,
+        "labels": [
+            {"plant": plant, "disease": disease, "is_healthy": bool(healthy)}
+            for plant, disease, healthy in zip(
+                disease_service.class_plants, disease_service.class_diseases, disease_service.class_is_healthy
+            )
+        ],
+    }
+
+
+@router.post("/disease")
+async def detect_disease_stream(
+    request: Request,
+    tta: bool = False,
+    plant: Optional[str] = None,
+    current_user: UserResponse = Depends(get_current_user)
+):
+    """
+    Detect diseases for a stream of raw images
+
+    The body is any number of frames: the image size as a little-endian
+    uint32, then the JPEG/PNG bytes (10MB at most). The response streams
+    back one 8-byte record per image in request order: status (uint8,
+    0 = ok, 1 = not a leaf, 2 = unreadable image), one padding byte, the
+    class index (uint16, see /api/binary/disease/labels; 65535 unless ok)
+    and the confidence (float32), all little-endian. Images are batched as
+    they arrive, up to 16 per model call. A frame over the size limit is
+    answered with an unreadable record after the images before it, and
+    ends the stream: nothing after it can be framed.
+
+    `tta` and `plant` work as on /api/disease/detect and apply to the whole
+    stream. Detections are not saved, counted, indexed or mirrored to shadow
+    models.
+    """
+    if disease_service.model is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Disease model not loaded"
+        )
+    if plant is not None:
+        hint = plant
+        plant = disease_service.resolve_plant(hint)
+        if plant is None:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Unknown plant '{hint}'. Supported: {'; '.join(disease_service.plant_classes)}"
+            )
+    route = "binary_disease_image_tta" if tta else "binary_disease_image"
+    loop = asyncio.get_running_loop()
+
+    def detect_batch(images: list) -> list:
+        try:
+            return disease_service.predict_disease_batch(images, tta=tta, plant=plant)
+        except Exception:
+            # One undecodable image fails the whole batch; retry one at a time to isolate it
+            results = []
+            for image_bytes in images:
+                try:
+                    results.extend(disease_service.predict_disease_batch([image_bytes], tta=tta, plant=plant))
+                except Exception as e:
+                    logger.warning("Binary disease stream: unreadable image (%d bytes): %s", len(image_bytes), e)
+                    results.append(None)
+            return results
+
+    async def detect(images: list) -> bytes:
+        await charge(current_user["id"], route, len(images))
+        results = await loop.run_in_executor(disease_service.disease_flight.executor, detect_batch, images)
+        records = bytearray()
+        for result in results:
+            if result is None:
+                records += DISEASE_RECORD.pack(STATUS_UNREADABLE, NO_CLASS, 0.0)
+            elif not result['is_leaf']:
+                records += DISEASE_RECORD.pack(STATUS_NOT_A_LEAF, NO_CLASS, 0.0)
+            else:
+                records += DISEASE_RECORD.pack(STATUS_OK, result['class_id'], result['confidence'])
+        return bytes(records)
+
+    async def answers():
+        buffer = bytearray()
+        images = []
+        async for body in request.stream():
+            buffer += body
+            oversized = None
+            while len(buffer) >= FRAME_HEADER.size:
+                (size,) = FRAME_HEADER.unpack_from(buffer)
+                if size > MAX_UPLOAD_BYTES:
+                    oversized = size
+                    break
+                if len(buffer) < FRAME_HEADER.size + size:
+                    break
+                images.append(bytes(buffer[FRAME_HEADER.size:FRAME_HEADER.size + size]))
+                del buffer[:FRAME_HEADER.size + size]
+            while images:
+                batch, images = images[:DISEASE_MAX_IMAGES], images[DISEASE_MAX_IMAGES:]
+                yield await detect(batch)
+            if oversized is not None:
+                logger.warning("Binary disease stream closed: %d-byte frame is over the upload limit", oversized)
+                yield DISEASE_RECORD.pack(STATUS_UNREADABLE, NO_CLASS, 0.0)
+                return
+        if buffer:
+            logger.warning("Binary disease stream ended mid-frame (%d trailing bytes ignored)", len(buffer))
+
+    return DuplexStreamingResponse(
+        answers(), media_type="application/octet-stream",
+        headers={"X-Model-Version": (disease_service.specialist_versions.get(plant) if plant else None)
+                 or disease_service.model_version or ""}
+    )
@@ -0,0 +1,142 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from bson import ObjectId
+from datetime import datetime
+from typing import Optional
+import asyncio
+import logging
+from models.user import UserResponse
+from utils.auth import get_current_user
+from utils.database import (
+    get_crop_predictions_collection,
+    get_fertilizer_predictions_collection,
+    get_disease_detections_collection,
+)
+from utils.rate_limit import rate_limit
+from utils.responses import FastJSONResponse, make_etag, etag_matches
+from services.stats import stats_service, user_scope
+
+logger = logging.getLogger(__name__)
+router = APIRouter(prefix="/api/dashboard", tags=["Dashboard"])
+
+# Browsers keep the body but must check with If-None-Match before reusing it
+CACHE_CONTROL = "private, no-cache"
+# Only the fields the dashboard shows
+CROP_PROJECTION = {"created_at": 1, "prediction.crop": 1}
+FERTILIZER_PROJECTION = {"created_at": 1, "prediction.fertilizer": 1}
+DISEASE_FIELDS = ("plant", "disease", "confidence", "is_healthy")
+DISEASE_PROJECTION = {"created_at": 1, **{f"detection.{field}": 1 for field in DISEASE_FIELDS}}
+KINDS = ("crop", "fertilizer", "disease")
+
+
+# Newest first; _id breaks ties between records created in the same millisecond
+HISTORY_SORT = [("created_at", -1), ("_id", -1)]
+
+
+def history_query(user_id: str, before: Optional[datetime], before_id: Optional[ObjectId]) -> dict:
+    """Records of the user older than the (created_at, _id) cursor, if one is given"""
+    query = {"user_id": user_id}
+    if before is not None and before_id is not None:
+        query["$or"] = [{"created_at": {"$lt": before}}, {"created_at": before, "_id": {"$lt": before_id}}]
+    elif before is not None:
+        query["created_at"] = {"$lt": before}
+    return query
+
+
+async def latest(collection, query: dict, projection: dict, limit: int) -> list:
+    """The newest records matching query in a prediction collection, projected"""
+    return await collection.find(query, projection).sort(HISTORY_SORT).limit(limit).to_list(length=limit)
+
+
+def collections() -> dict:
+    return {
+        "crop": get_crop_predictions_collection(),
+        "fertilizer": get_fertilizer_predictions_collection(),
+        "disease": get_disease_detections_collection(),
+    }
+
+
+@router.get("")
+async def get_dashboard(
+    request: Request,
+    days: int = Query(30, ge=1, le=366),
+    limit: int = Query(5, ge=1, le=50),
+    before: Optional[datetime] = None,
+    before_id: Optional[str] = None,
+    current_user: UserResponse = Depends(get_current_user),
+    _: None = Depends(rate_limit("dashboard"))
+):
+    """
+    Everything the dashboard shows, in one request
+
+    The current user's counters and daily series from the pre-aggregated
+    stats (as /api/stats/me), plus the `limit` newest crop, fertilizer and
+    disease results with only the fields needed to list them. For older
+    results, pass a list's `next_before` back as `before` and `before_id`;
+    it is null once that list has no more.
+
+    Responses carry an ETag derived from the user's counters and the newest
+    record of each list. Send it back in If-None-Match: while nothing new
+    was recorded or re-scored the answer is 304 with no body, after the
+    counter lookup and three single-record reads.
+    """
+    if before_id is not None and not ObjectId.is_valid(before_id):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid before_id '{before_id}'"
+        )
+    user_id = current_user["id"]
+    scope = user_scope(user_id)
+    query = history_query(user_id, before, ObjectId(before_id) if before_id else None)
+    sources = collections()
+    try:
+        summary, *newest = await asyncio.gather(
+            stats_service.summary(scope),
+            *(latest(sources[kind], query, {"_id": 1}, 1) for kind in KINDS),
+        )
+        # Counters move with every recorded prediction and re-scoring run, the daily series at
+        # midnight UTC; the newest ids also catch records whose counter update failed
+        etag = make_etag(
+            scope, summary.get("updated_at"), summary.get("rescored_at"), summary.get("totals"),
+            [docs[0]["_id"] if docs else None for docs in newest],
+            days, limit, before, before_id, datetime.utcnow().date().isoformat()
+        )
+        headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+        if etag_matches(request, etag):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+        stats, crops, fertilizers, detections = await asyncio.gather(
+            stats_service.get(scope, days, summary=summary),
+            latest(sources["crop"], query, CROP_PROJECTION, limit),
+            latest(sources["fertilizer"], query, FERTILIZER_PROJECTION, limit),
+            latest(sources["disease"], query, DISEASE_PROJECTION, limit),
+        )
+        recent = {
+            "crop": [
+                {"_id": d["_id"], "created_at": d.get("created_at"), "crop": d.get("prediction", {}).get("crop")}
+                for d in crops
+            ],
+            "fertilizer": [
+                {"_id": d["_id"], "created_at": d.get("created_at"),
+                 "fertilizer": d.get("prediction", {}).get("fertilizer")}
+                for d in fertilizers
+            ],
+            "disease": [
+                {"_id": d["_id"], "created_at": d.get("created_at"),
+                 **{field: d.get("detection", {}).get(field) for field in DISEASE_FIELDS}}
+                for d in detections
+            ],
+        }
+        # A full page may have more behind it
+        next_before = {
+            kind: {"before": items[-1]["created_at"], "before_id": items[-1]["_id"]} if len(items) == limit else None
+            for kind, items in recent.items()
+        }
+        return FastJSONResponse(
+            {"success": True, "stats": stats, "recent": recent, "next_before": next_before}, headers=headers
+        )
+    except Exception as e:
+        logger.exception("Failed to load dashboard: %s", e)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to load dashboard: {str(e)}"
+        )
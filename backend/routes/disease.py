@@ -1,19 +1,63 @@
-from fastapi import APIRouter, Depends, HTTPException, status, File, UploadFile
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, status, File, UploadFile
+from bson import ObjectId
 from datetime import datetime
-from models.disease import DiseaseDetectionResponse, get_recommendation
+from typing import Optional
+from models.disease import DiseaseDetectionResponse
 from models.user import UserResponse
 from utils.auth import get_current_user
 from utils.database import get_disease_detections_collection
+from utils.profiling import profile_requested
+from utils.rate_limit import rate_limit
+from utils.responses import FastJSONResponse, parse_fields
 from services.disease_detection import disease_service
+from services.leaf_filter import NOT_A_LEAF_ADVICE
+from services.image_store import image_store
+from services.similarity_index import similarity_index
+from services.shadow import shadow_traffic
+from services.stats import stats_service, disease_label
+import asyncio
 import logging
+import time
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/api/disease", tags=["Disease Detection"])
 
+MAX_UPLOAD_BYTES = 10 * 1024 * 1024
+# Fields of past detections returned by /similar - nothing that identifies the farmer
+SIMILAR_PROJECTION = {
+    "detection.plant": 1,
+    "detection.disease": 1,
+    "detection.confidence": 1,
+    "detection.is_healthy": 1,
+    "recommendation": 1,
+    "created_at": 1,
+}
+
+async def read_upload(file: UploadFile) -> bytes:
+    """Read an uploaded image, rejecting non-images and files over 10MB"""
+    if not file.content_type.startswith('image/'):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="File must be an image (JPEG, PNG, etc.)"
+        )
+    
+    image_bytes = await file.read()
+    if len(image_bytes) > MAX_UPLOAD_BYTES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Image file too large. Maximum size is 10MB."
+        )
+    return image_bytes
+
 @router.post("/detect", response_model=DiseaseDetectionResponse)
 async def detect_disease(
+    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
-    current_user: UserResponse = Depends(get_current_user)
+    tta: bool = False,
+    plant: Optional[str] = None,
+    current_user: UserResponse = Depends(get_current_user),
+    _: None = Depends(rate_limit("detect_disease")),
+    profile: bool = Depends(profile_requested)
 ):
     """
     Detect plant disease from uploaded image
@@ -21,30 +65,58 @@ async def detect_disease(
     Requires authentication. Upload an image of a plant leaf to detect diseases.
     Supports: Apple, Blueberry, Cherry, Corn, Grape, Orange, Peach, Pepper, 
              Potato, Raspberry, Soybean, Squash, Strawberry, Tomato
+    
+    Pass `?tta=true` to average predictions over flipped, cropped and rotated
+    views of the image (more stable on low-quality photos, single batched call).
+    
+    Pass `?plant=tomato` (any supported plant) when the plant is already known:
+    only that plant's diseases are considered, and a smaller plant-specific
+    model is used if one is installed.
     """
-    # Validate file type
-    if not file.content_type.startswith('image/'):
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="File must be an image (JPEG, PNG, etc.)"
-        )
+    image_bytes = await read_upload(file)
+    if plant is not None:
+        hint = plant
+        plant = disease_service.resolve_plant(hint)
+        if plant is None:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Unknown plant '{hint}'. Supported: {'; '.join(disease_service.plant_classes)}"
+            )
     
     try:
-        # Read image bytes
-        image_bytes = await file.read()
+        image_hash = image_store.digest(image_bytes)
         
-        # Validate file size (max 10MB)
-        if len(image_bytes) > 10 * 1024 * 1024:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Image file too large. Maximum size is 10MB."
+        # Get prediction; identical concurrent uploads share one model call.
+        # Specialist models have no embeddings: those detections join the index at its next build
+        started = time.perf_counter()
+        result = await disease_service.predict_disease_shared(
+            image_bytes, tta=tta, profile=profile, image_hash=image_hash, plant=plant,
+            embeddings=similarity_index.ready and not disease_service.routes_to_specialist(plant)
+        )
+        model_ms = (time.perf_counter() - started) * 1000
+        
+        # Non-leaf uploads are answered but not stored, counted or indexed
+        if not result['is_leaf']:
+            return DiseaseDetectionResponse(
+                success=False,
+                is_leaf=False,
+                plant=result['plant'],
+                disease=result['disease'],
+                confidence=result['confidence'],
+                is_healthy=False,
+                top_predictions=[],
+                message="This doesn't look like a plant leaf. Please upload a photo of a single leaf.",
+                recommendation=NOT_A_LEAF_ADVICE
             )
         
-        # Get prediction
-        result = disease_service.predict_disease(image_bytes)
+        # Candidate models replace trained_model.keras, so specialist answers are not mirrored
+        if not disease_service.routes_to_specialist(plant):
+            shadow_traffic.submit(
+                "disease", (image_bytes, tta, plant), f"{result['plant']} - {result['disease']}", model_ms
+            )
         
-        # Add recommendation
-        recommendation = get_recommendation(result['disease'])
+        # Recommendation is precomputed per class by the service
+        recommendation = result['recommendation']
         
         # Build response message
         if result['is_healthy']:
@@ -59,6 +131,9 @@ async def detect_disease(
             "user_email": current_user["email"],
             "filename": file.filename,
             "content_type": file.content_type,
+            "image_sha256": image_hash,
+            "tta": tta,
+            "plant_hint": plant,
             "detection": {
                 "plant": result['plant'],
                 "disease": result['disease'],
@@ -67,9 +142,21 @@ async def detect_disease(
                 "top_predictions": result['top_predictions']
             },
             "recommendation": recommendation,
+            "model_version": disease_service.model_version,
             "created_at": datetime.utcnow()
         }
-        await disease_detections_collection.insert_one(detection_record)
+        insert_result = await disease_detections_collection.insert_one(detection_record)
+        await stats_service.record(
+            "disease", current_user["id"], disease_label(result['plant'], result['disease']),
+            detection_record["created_at"], healthy=result['is_healthy']
+        )
+        
+        # Keep the upload for re-scoring; written after the response is sent
+        if image_store.enabled:
+            background_tasks.add_task(image_store.put, image_bytes, image_hash)
+        # Searchable by /similar right away, until the next index build includes it
+        if 'embedding' in result:
+            background_tasks.add_task(similarity_index.add, str(insert_result.inserted_id), result['embedding'])
         
         return DiseaseDetectionResponse(
             success=result['success'],
@@ -83,12 +170,84 @@ async def detect_disease(
         )
         
     except Exception as e:
-        logger.error(f"Disease detection error: {str(e)}")
+        logger.exception("Disease detection error: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to process image: {str(e)}"
         )
 
+@router.post("/similar")
+async def find_similar_detections(
+    file: UploadFile = File(...),
+    k: int = Query(5, ge=1, le=50),
+    current_user: UserResponse = Depends(get_current_user),
+    _: None = Depends(rate_limit("similar_disease"))
+):
+    """
+    Find past detections whose images look most like the uploaded one
+    
+    The upload is classified as in /detect and its embedding is looked up in
+    the similarity index (built by jobs/build_similarity_index.py). Returns
+    the prediction plus the k nearest past detections with their cosine
+    similarity, most similar first.
+    """
+    image_bytes = await read_upload(file)
+    if not similarity_index.ready:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Similarity index not available. Run jobs/build_similarity_index.py for the current model."
+        )
+    
+    try:
+        result = await disease_service.predict_disease_shared(
+            image_bytes, image_hash=image_store.digest(image_bytes), embeddings=True
+        )
+        if not result['is_leaf']:
+            return FastJSONResponse({
+                "success": False,
+                "is_leaf": False,
+                "message": "This doesn't look like a plant leaf. Please upload a photo of a single leaf.",
+                "count": 0,
+                "similar": []
+            })
+        # Scans up to nprobe lists plus the delta file; kept off the event loop
+        neighbours = await asyncio.get_running_loop().run_in_executor(
+            None, similarity_index.search, result['embedding'], k
+        )
+        
+        disease_detections_collection = get_disease_detections_collection()
+        ids = [ObjectId(detection_id) for detection_id, _ in neighbours]
+        records = await disease_detections_collection.find(
+            {"_id": {"$in": ids}}, SIMILAR_PROJECTION
+        ).to_list(length=len(ids))
+        by_id = {str(record["_id"]): record for record in records}
+        
+        similar = [
+            {
+                "detection_id": detection_id,
+                "similarity": similarity,
+                **by_id[detection_id]["detection"],
+                "recommendation": by_id[detection_id].get("recommendation"),
+                "created_at": by_id[detection_id].get("created_at"),
+            }
+            for detection_id, similarity in neighbours
+            if detection_id in by_id
+        ]
+        return FastJSONResponse({
+            "success": True,
+            "plant": result['plant'],
+            "disease": result['disease'],
+            "confidence": result['confidence'],
+            "count": len(similar),
+            "similar": similar
+        })
+    except Exception as e:
+        logger.exception("Similar detection search failed: %s", e)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to find similar detections: {str(e)}"
+        )
+
 @router.get("/health")
 async def health_check():
     """Check if the disease detection model is loaded and ready"""
@@ -102,6 +261,7 @@ async def health_check():
         "status": "healthy",
         "model_loaded": True,
         "message": "ResNet18 disease detection model is ready",
+        "specialists": sorted(disease_service.specialists),
         "supported_plants": [
             "Apple", "Blueberry", "Cherry", "Corn", "Grape", "Orange", 
             "Peach", "Pepper", "Potato", "Raspberry", "Soybean", 
@@ -112,24 +272,29 @@ async def health_check():
 @router.get("/history")
 async def get_disease_detection_history(
     limit: int = 10,
-    current_user: UserResponse = Depends(get_current_user)
+    fields: Optional[str] = None,
+    current_user: UserResponse = Depends(get_current_user),
+    _: None = Depends(rate_limit("history"))
 ):
-    """Get disease detection history for the current user"""
+    """
+    Get disease detection history for the current user
+    
+    Pass `fields=` with comma-separated paths (e.g. `created_at,detection.disease`)
+    to receive only those fields.
+    """
+    projection = parse_fields(fields)
     try:
         disease_detections_collection = get_disease_detections_collection()
         detections = await disease_detections_collection.find(
-            {"user_id": current_user["id"]}
+            {"user_id": current_user["id"]}, projection
         ).sort("created_at", -1).limit(limit).to_list(length=limit)
         
-        # Convert ObjectId to string
-        for detection in detections:
-            detection["_id"] = str(detection["_id"])
-        
-        return {
+        # ObjectIds and datetimes are serialized directly by FastJSONResponse
+        return FastJSONResponse({
             "success": True,
             "count": len(detections),
             "detections": detections
-        }
+        })
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -1,26 +1,35 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from typing import Dict
+from typing import Dict, Optional
 from datetime import datetime
 from models.prediction import (
     CropPredictionInput, 
     CropPredictionResponse,
     FertilizerPredictionInput,
     FertilizerPredictionResponse,
-    CROP_MAPPING,
-    FERTILIZER_MAPPING,
-    FERTILIZER_EXPLANATIONS
 )
 from models.user import UserResponse
 from utils.auth import get_current_user
 from utils.database import get_crop_predictions_collection, get_fertilizer_predictions_collection
+from utils.profiling import request_profiler, profile_requested
+from utils.rate_limit import rate_limit
+from utils.responses import FastJSONResponse, parse_fields
 from services.ml_model import ml_service
+from services.fertilizer import fertilizer_service
+from services.stats import stats_service
+from services.shadow import shadow_traffic
+from services.drift import drift_monitor
+import logging
+import time
 
+logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/api/predict", tags=["Predictions"])
 
 @router.post("/crop", response_model=CropPredictionResponse)
 async def predict_crop(
     input_data: CropPredictionInput,
-    current_user: UserResponse = Depends(get_current_user)
+    current_user: UserResponse = Depends(get_current_user),
+    _: None = Depends(rate_limit("predict_crop")),
+    profile: bool = Depends(profile_requested)
 ):
     """
     Predict the best crop to grow based on soil and climate conditions
@@ -41,12 +50,16 @@ async def predict_crop(
             input_data.ph,
             input_data.rainfall
         ]
+        drift_monitor.observe("crop", features)
         
-        # Get prediction from model
-        crop_id = ml_service.predict_crop(features)
+        # Get prediction from model; identical concurrent requests share one call
+        started = time.perf_counter()
+        crop_id = await ml_service.predict_crop_shared(features, profile=profile)
+        model_ms = (time.perf_counter() - started) * 1000
         
         # Map prediction to crop name
-        crop_name = CROP_MAPPING.get(crop_id, "Unknown Crop")
+        crop_name = ml_service.crop_name(crop_id)
+        shadow_traffic.submit("crop", features, crop_name, model_ms)
         
         # Save prediction to database
         crop_predictions_collection = get_crop_predictions_collection()
@@ -69,6 +82,7 @@ async def predict_crop(
             "created_at": datetime.utcnow()
         }
         await crop_predictions_collection.insert_one(prediction_record)
+        await stats_service.record("crop", current_user["id"], crop_name, prediction_record["created_at"])
         
         return CropPredictionResponse(
             success=True,
@@ -78,9 +92,7 @@ async def predict_crop(
         )
         
     except Exception as e:
-        import traceback
-        print("ERROR in crop prediction:")
-        print(traceback.format_exc())
+        logger.exception("Crop prediction failed: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Prediction failed: {str(e)}"
@@ -89,35 +101,40 @@ async def predict_crop(
 @router.post("/fertilizer", response_model=FertilizerPredictionResponse)
 async def predict_fertilizer(
     input_data: FertilizerPredictionInput,
-    current_user: UserResponse = Depends(get_current_user)
+    current_user: UserResponse = Depends(get_current_user),
+    _: None = Depends(rate_limit("predict_fertilizer")),
+    profile: bool = Depends(profile_requested)
 ):
     """
     Predict the best fertilizer for the given soil conditions and crop
     
     Requires authentication. Returns recommended fertilizer based on:
-    - Current soil nutrient levels (N, P, K)
-    - Climate conditions
+    - Current soil nutrient levels (N, P, K) against the crop's targets
     - Soil pH
     - Crop type being grown
     """
     try:
-        # Prepare features (same as crop prediction - the model was trained on the same features)
-        features = [
-            input_data.N,
-            input_data.P,
-            input_data.K,
-            input_data.temperature,
-            input_data.humidity,
-            input_data.ph,
-            input_data.rainfall
-        ]
+        drift_monitor.observe("fertilizer", [
+            input_data.N, input_data.P, input_data.K, input_data.temperature,
+            input_data.humidity, input_data.ph, input_data.rainfall
+        ])
         
-        # Get prediction from model
-        fertilizer_id = ml_service.predict_fertilizer(features)
-        
-        # Map prediction to fertilizer name
-        fertilizer_name = FERTILIZER_MAPPING.get(fertilizer_id, "10-26-26")
-        explanation = FERTILIZER_EXPLANATIONS.get(fertilizer_name, "Recommended for optimal crop growth.")
+        # Rule lookup against the crop's N/P/K/pH targets - no model call
+        started = time.perf_counter()
+        with request_profiler.profile("predict_fertilizer", force=profile):
+            recommendation = fertilizer_service.recommend(
+                input_data.N, input_data.P, input_data.K, input_data.ph, input_data.crop_type
+            )
+        model_ms = (time.perf_counter() - started) * 1000
+        fertilizer_name = recommendation["fertilizer"]
+        fertilizer_id = recommendation["fertilizer_id"]
+        explanation = recommendation["explanation"]
+        shadow_traffic.submit(
+            "fertilizer",
+            (input_data.N, input_data.P, input_data.K, input_data.ph, input_data.crop_type),
+            fertilizer_name,
+            model_ms
+        )
         
         # Save prediction to database
         fertilizer_predictions_collection = get_fertilizer_predictions_collection()
@@ -137,24 +154,30 @@ async def predict_fertilizer(
             "prediction": {
                 "fertilizer": fertilizer_name,
                 "fertilizer_id": fertilizer_id,
-                "explanation": explanation
+                "explanation": explanation,
+                "deficits": recommendation["deficits"]
             },
             "created_at": datetime.utcnow()
         }
         await fertilizer_predictions_collection.insert_one(prediction_record)
+        await stats_service.record("fertilizer", current_user["id"], fertilizer_name, prediction_record["created_at"])
         
         return FertilizerPredictionResponse(
             success=True,
             fertilizer=fertilizer_name,
             fertilizer_id=fertilizer_id,
             explanation=explanation,
+            deficits=recommendation["deficits"],
             message=f"Based on your soil analysis and crop type ({input_data.crop_type}), {fertilizer_name} fertilizer is recommended."
         )
         
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
     except Exception as e:
-        import traceback
-        print("ERROR in fertilizer prediction:")
-        print(traceback.format_exc())
+        logger.exception("Fertilizer prediction failed: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Prediction failed: {str(e)}"
@@ -178,24 +201,29 @@ async def health_check():
 @router.get("/crop/history")
 async def get_crop_prediction_history(
     limit: int = 10,
-    current_user: UserResponse = Depends(get_current_user)
+    fields: Optional[str] = None,
+    current_user: UserResponse = Depends(get_current_user),
+    _: None = Depends(rate_limit("history"))
 ):
-    """Get crop prediction history for the current user"""
+    """
+    Get crop prediction history for the current user
+    
+    Pass `fields=` with comma-separated paths (e.g. `created_at,prediction.crop`)
+    to receive only those fields.
+    """
+    projection = parse_fields(fields)
     try:
         crop_predictions_collection = get_crop_predictions_collection()
         predictions = await crop_predictions_collection.find(
-            {"user_id": current_user["id"]}
+            {"user_id": current_user["id"]}, projection
         ).sort("created_at", -1).limit(limit).to_list(length=limit)
         
-        # Convert ObjectId to string
-        for pred in predictions:
-            pred["_id"] = str(pred["_id"])
-        
-        return {
+        # ObjectIds and datetimes are serialized directly by FastJSONResponse
+        return FastJSONResponse({
             "success": True,
             "count": len(predictions),
             "predictions": predictions
-        }
+        })
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -205,24 +233,29 @@ async def get_crop_prediction_history(
 @router.get("/fertilizer/history")
 async def get_fertilizer_prediction_history(
     limit: int = 10,
-    current_user: UserResponse = Depends(get_current_user)
+    fields: Optional[str] = None,
+    current_user: UserResponse = Depends(get_current_user),
+    _: None = Depends(rate_limit("history"))
 ):
-    """Get fertilizer prediction history for the current user"""
+    """
+    Get fertilizer prediction history for the current user
+    
+    Pass `fields=` with comma-separated paths (e.g. `created_at,prediction.fertilizer`)
+    to receive only those fields.
+    """
+    projection = parse_fields(fields)
     try:
         fertilizer_predictions_collection = get_fertilizer_predictions_collection()
         predictions = await fertilizer_predictions_collection.find(
-            {"user_id": current_user["id"]}
+            {"user_id": current_user["id"]}, projection
         ).sort("created_at", -1).limit(limit).to_list(length=limit)
         
-        # Convert ObjectId to string
-        for pred in predictions:
-            pred["_id"] = str(pred["_id"])
-        
-        return {
+        # ObjectIds and datetimes are serialized directly by FastJSONResponse
+        return FastJSONResponse({
             "success": True,
             "count": len(predictions),
             "predictions": predictions
-        }
+        })
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -0,0 +1,46 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from models.user import UserResponse
+from utils.auth import get_current_user
+from services.stats import stats_service, user_scope, GLOBAL_SCOPE
+import logging
+
+logger = logging.getLogger(__name__)
+router = APIRouter(prefix="/api/stats", tags=["Statistics"])
+
+@router.get("/me")
+async def get_my_stats(
+    days: int = Query(30, ge=1, le=366),
+    current_user: UserResponse = Depends(get_current_user)
+):
+    """
+    Prediction counts for the current user
+    
+    Totals per prediction type, counts per crop, fertilizer and disease, and
+    a daily series over the last `days` days. Served from pre-aggregated
+    counters, so the cost does not grow with the size of the history.
+    """
+    try:
+        stats = await stats_service.get(user_scope(current_user["id"]), days)
+        return {"success": True, "scope": "user", "stats": stats}
+    except Exception as e:
+        logger.exception("Failed to load stats: %s", e)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to retrieve stats: {str(e)}"
+        )
+
+@router.get("/global")
+async def get_global_stats(
+    days: int = Query(30, ge=1, le=366),
+    current_user: UserResponse = Depends(get_current_user)
+):
+    """Prediction counts across all users, same layout as /api/stats/me"""
+    try:
+        stats = await stats_service.get(GLOBAL_SCOPE, days)
+        return {"success": True, "scope": "global", "stats": stats}
+    except Exception as e:
+        logger.exception("Failed to load stats: %s", e)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to retrieve stats: {str(e)}"
+        )
@@ -0,0 +1,136 @@
+"""
+Production launcher: several uvicorn workers that share the CPUs instead of fighting over them
+
+Left alone, TensorFlow, XGBoost (OpenMP) and BLAS each size their thread
+pools to every core of the machine, in every worker process, so N workers
+run N x cores busy threads. This launcher splits the usable CPUs (affinity
+mask and cgroup quota) into one share per worker, caps each worker's
+thread pools to its share before the models are imported, and can pin the
+worker to those CPUs. The parent process binds the socket once and
+supervises the workers, restarting any that die.
+
+Usage (from backend/):
+    python serve.py
+    python serve.py --workers 4 --threads 2 --affinity
+    python serve.py --dry-run
+"""
+import argparse
+import json
+import logging
+import multiprocessing
+import signal
+import sys
+import time
+from multiprocessing.connection import wait
+
+import uvicorn
+
+from utils.cpu_budget import (
+    SERVE_CPU_AFFINITY, SERVE_THREADS_PER_WORKER, SERVE_WORKERS, SERVE_WORKER_MEMORY_MB,
+    apply_thread_budget, available_cpus, plan_workers,
+)
+
+logger = logging.getLogger("serve")
+
+# A worker that dies sooner than this after starting is restarted with a delay
+MIN_UPTIME_SECONDS = 10
+RESTART_DELAY_SECONDS = 5
+
+
+def run_worker(index: int, threads: int, cpu_set: list, config_kwargs: dict, sockets: list):
+    """Entry point of a worker process: set its thread budget, then import and serve the app"""
+    apply_thread_budget(threads, cpu_set)
+    config = uvicorn.Config("main:app", **config_kwargs)
+    # Imports the app, which also sets up logging for this process
+    config.load()
+    logger.info(
+        "Worker %d: %d model threads%s", index, threads, f", CPUs {cpu_set}" if cpu_set else ""
+    )
+    uvicorn.Server(config).run(sockets=sockets)
+
+
+class Supervisor:
+    """Starts one process per planned worker and keeps them running until told to stop"""
+
+    def __init__(self, plan: dict, affinity: bool, config_kwargs: dict):
+        self.plan = plan
+        self.affinity = affinity
+        self.config_kwargs = config_kwargs
+        self.context = multiprocessing.get_context("spawn")
+        self.processes = {}
+        self.started_at = {}
+        self.stopping = False
+
+    def start_worker(self, index: int, sockets: list):
+        cpu_set = self.plan["cpu_sets"][index] if self.affinity else None
+        process = self.context.Process(
+            target=run_worker, name=f"agridoctor-worker-{index}",
+            args=(index, self.plan["threads_per_worker"], cpu_set, self.config_kwargs, sockets),
+        )
+        process.start()
+        self.processes[index] = process
+        self.started_at[index] = time.monotonic()
+
+    def stop(self, *_):
+        self.stopping = True
+
+    def run(self):
+        config = uvicorn.Config("main:app", **self.config_kwargs)
+        sockets = [config.bind_socket()]
+        signal.signal(signal.SIGINT, self.stop)
+        signal.signal(signal.SIGTERM, self.stop)
+        for index in range(self.plan["workers"]):
+            self.start_worker(index, sockets)
+
+        while not self.stopping:
+            wait([process.sentinel for process in self.processes.values()], timeout=1)
+            for index, process in list(self.processes.items()):
+                if process.is_alive() or self.stopping:
+                    continue
+                uptime = time.monotonic() - self.started_at[index]
+                logger.error("Worker %d exited with code %s after %.0fs, restarting", index, process.exitcode, uptime)
+                if uptime < MIN_UPTIME_SECONDS:
+                    time.sleep(RESTART_DELAY_SECONDS)
+                self.start_worker(index, sockets)
+
+        logger.info("Stopping %d workers", len(self.processes))
+        for process in self.processes.values():
+            process.terminate()
+        for process in self.processes.values():
+            process.join()
+        for sock in sockets:
+            sock.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the API with CPU-budgeted worker processes")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=SERVE_WORKERS, help="Worker processes (0: derive)")
+    parser.add_argument("--threads", type=int, default=SERVE_THREADS_PER_WORKER,
+                        help="Model threads per worker (0: derive)")
+    parser.add_argument("--affinity", action="store_true", default=SERVE_CPU_AFFINITY,
+                        help="Pin each worker to its own CPUs")
+    parser.add_argument("--worker-memory-mb", type=int, default=SERVE_WORKER_MEMORY_MB,
+                        help="Memory per worker, caps the derived worker count")
+    parser.add_argument("--dry-run", action="store_true", help="Print the plan and exit")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    plan = plan_workers(available_cpus(), args.workers, args.threads, args.worker_memory_mb)
+    if args.dry_run:
+        print(json.dumps(dict(plan, affinity=args.affinity), indent=2))
+        return
+    if plan["oversubscribed"]:
+        logger.warning("⚠ %d workers x %d threads is more than the %d usable CPUs",
+                       plan["workers"], plan["threads_per_worker"], plan["cpus"])
+    logger.info("Serving on %s:%d with %d workers x %d model threads (%d CPUs%s)",
+                args.host, args.port, plan["workers"], plan["threads_per_worker"], plan["cpus"],
+                ", pinned" if args.affinity else "")
+
+    Supervisor(plan, args.affinity, {"host": args.host, "port": args.port}).run()
+    sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,32 @@
 import tensorflow as tf
 from PIL import Image
 import io
+import os
+import json
+import hashlib
 from pathlib import Path
+from typing import Optional
 import logging
 import numpy as np
+from dotenv import load_dotenv
+from models.disease import get_recommendation
+from services.leaf_filter import leaf_filter
+from utils import cpu_budget
+from utils.profiling import request_profiler
+from utils.single_flight import SingleFlight
+
+load_dotenv()
 
 logger = logging.getLogger(__name__)
 
+# Specialist model configurations
+# JSON object mapping a plant name to a .keras model (relative to the file) trained on
+# that plant's classes only, in PLANT_DISEASES order; see README "Plant hint"
+DISEASE_SPECIALISTS_FILE = Path(os.getenv(
+    "DISEASE_SPECIALISTS_FILE",
+    Path(__file__).parent.parent.parent / "models" / "disease_specialists.json"
+))
+
 # Plant disease classes (38 classes) - MUST match the alphabetical order from training
 # TensorFlow's image_dataset_from_directory sorts class folders alphabetically
 PLANT_DISEASES = [
@@ -50,6 +70,11 @@ PLANT_DISEASES = [
     'Tomato___Tomato_Yellow_Leaf_Curl_Virus'
 ]
 
+# Test-time augmentation views, in the order tta_views() builds them
+TTA_VIEWS = ['original', 'flip_horizontal', 'flip_vertical', 'center_crop', 'rotate_cw', 'rotate_ccw']
+TTA_CROP_FRACTION = 0.85
+TTA_ROTATION_DEGREES = 10
+
 class DiseaseDetectionService:
     """Service for loading and using the trained Keras disease detection model"""
     
@@ -58,109 +83,445 @@ class DiseaseDetectionService:
         self.model_path = Path(__file__).parent.parent.parent / "models" / "trained_model.keras"
         self.classes = PLANT_DISEASES
         self.image_size = (128, 128)  # Model was trained with 128x128 images
+        self.top_k = 5
+        self.model_version = None
+        self.embedding_model = None
+        self.specialists_file = DISEASE_SPECIALISTS_FILE
+        self.specialists = {}
+        self.specialist_versions = {}
+        self.disease_flight = SingleFlight("disease")
+        self._build_class_metadata()
+    
+    def _build_class_metadata(self):
+        """Parse class names and look up recommendations once instead of per request"""
+        self.class_plants = []
+        self.class_diseases = []
+        for class_name in self.classes:
+            parts = class_name.split('___')
+            self.class_plants.append(parts[0].replace('_', ' '))
+            self.class_diseases.append(parts[1].replace('_', ' ') if len(parts) > 1 else 'Unknown')
+        self.class_is_healthy = np.array(['healthy' in d.lower() for d in self.class_diseases])
+        self.class_recommendations = [get_recommendation(d) for d in self.class_diseases]
+        
+        # Class indices per plant, for plant hints; hints match the full name or its first word
+        self.plant_classes = {}
+        for idx, plant in enumerate(self.class_plants):
+            self.plant_classes.setdefault(plant, []).append(idx)
+        self.plant_classes = {plant: np.array(indices) for plant, indices in self.plant_classes.items()}
+        self.plant_aliases = {}
+        for plant in self.plant_classes:
+            self.plant_aliases[plant.lower()] = plant
+            self.plant_aliases.setdefault(plant.split()[0].strip(',').lower(), plant)
+    
+    def resolve_plant(self, hint: str) -> Optional[str]:
+        """Plant name for a user-supplied hint (case-insensitive), or None if no plant matches"""
+        return self.plant_aliases.get(hint.strip().lower())
+    
+    @staticmethod
+    def _file_version(path: Path) -> str:
+        """First 12 hex digits of the file's SHA-256"""
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        return digest.hexdigest()[:12]
         
     def load_model(self):
         """Load the Keras model at application startup"""
         try:
             if not self.model_path.exists():
-                logger.warning(f"⚠ Model file not found at {self.model_path}")
+                logger.warning("⚠ Model file not found at %s", self.model_path)
                 logger.warning("⚠ Please run the notebook 'notebooks/Train_plant_disease.ipynb' to generate the model file")
                 logger.warning("⚠ Disease detection service will not be available")
                 return False
             
+            self._limit_threads()
             self.model = tf.keras.models.load_model(self.model_path)
-            logger.info(f"✓ Plant disease model loaded successfully from {self.model_path}")
-            logger.info(f"✓ Model expects input shape: {self.model.input_shape}")
+            self.model_version = self._file_version(self.model_path)
+            self.embedding_model = self._build_embedding_model()
+            self.load_specialists()
+            logger.info("✓ Plant disease model loaded successfully from %s (version %s)", self.model_path, self.model_version)
+            logger.info("✓ Model expects input shape: %s", self.model.input_shape)
             return True
         except Exception as e:
-            logger.error(f"✗ Failed to load plant disease model: {str(e)}")
-            logger.error(f"⚠ Please ensure the model file exists at {self.model_path}")
+            logger.error("✗ Failed to load plant disease model: %s", e)
+            logger.error("⚠ Please ensure the model file exists at %s", self.model_path)
             return False
     
-    def predict_disease(self, image_bytes: bytes) -> dict:
+    @staticmethod
+    def _limit_threads():
+        """Apply MODEL_THREADS to TensorFlow's pools; only possible before its runtime starts"""
+        if cpu_budget.MODEL_THREADS <= 0:
+            return
+        try:
+            tf.config.threading.set_intra_op_parallelism_threads(cpu_budget.MODEL_THREADS)
+            tf.config.threading.set_inter_op_parallelism_threads(1)
+        except RuntimeError as e:
+            logger.warning("⚠ TensorFlow thread budget not applied: %s", e)
+    
+    def load_specialists(self, routes_file: Path = None):
+        """
+        Load the per-plant specialist models listed in the routing table
+        
+        Entries whose plant is unknown, whose file is missing or whose output
+        size does not match the plant's class count are skipped with a warning;
+        those plants fall back to the global model. Nothing is loaded when
+        specialists_file is None.
+        """
+        routes_file = routes_file or self.specialists_file
+        self.specialists, self.specialist_versions = {}, {}
+        if routes_file is None or not Path(routes_file).exists():
+            return
+        routes_file = Path(routes_file)
+        try:
+            routes = json.loads(routes_file.read_text())
+        except (OSError, ValueError) as e:
+            logger.error("✗ Could not read specialist routing table %s: %s", routes_file, e)
+            return
+        
+        for hint, model_file in routes.items():
+            plant = self.resolve_plant(hint)
+            path = routes_file.parent / model_file
+            if plant is None or not path.exists():
+                logger.warning("⚠ Skipping specialist %s -> %s: unknown plant or missing file", hint, path)
+                continue
+            try:
+                model = tf.keras.models.load_model(path)
+            except Exception as e:
+                logger.warning("⚠ Skipping specialist %s: %s", path, e)
+                continue
+            n_classes = len(self.plant_classes[plant])
+            if model.output_shape[-1] != n_classes or tuple(model.input_shape[1:3]) != self.image_size:
+                logger.warning("⚠ Skipping specialist %s: expected %s input and %d outputs, got %s -> %s",
+                               path, self.image_size, n_classes, model.input_shape, model.output_shape)
+                continue
+            self.specialists[plant] = model
+            self.specialist_versions[plant] = self._file_version(path)
+            logger.info("✓ %s specialist loaded from %s (%d classes)", plant, path, n_classes)
+    
+    def _build_embedding_model(self):
+        """
+        Same weights, two outputs: the penultimate activations and the class scores
+        
+        Rebuilt functionally from the Sequential layers, so one forward pass
+        yields both. Returns None for models that are not Sequential.
+        """
+        if not isinstance(self.model, tf.keras.Sequential) or len(self.model.layers) < 2:
+            logger.warning("⚠ Embeddings unavailable: expected a Sequential model")
+            return None
+        inputs = tf.keras.Input(shape=self.model.input_shape[1:])
+        x = inputs
+        for layer in self.model.layers[:-1]:
+            x = layer(x)
+        return tf.keras.Model(inputs, [x, self.model.layers[-1](x)])
+    
+    def preprocess_image(self, image_bytes: bytes) -> np.ndarray:
+        """
+        Decode and resize image bytes into a model input array
+        
+        Args:
+            image_bytes: Image file bytes
+        
+        Returns:
+            np.ndarray: float32 array of shape (128, 128, 3) in the [0, 255] range
+        """
+        # Load and preprocess image - match Streamlit preprocessing exactly
+        # TensorFlow's image_dataset_from_directory keeps values in [0, 255] range
+        # So we should NOT normalize here to match the training data format
+        image = Image.open(io.BytesIO(image_bytes)).convert('RGB')
+        image = image.resize(self.image_size)
+        
+        # Convert to numpy array - keep values in [0, 255] range (no normalization)
+        # This matches tf.keras.preprocessing.image.img_to_array behavior
+        return np.array(image, dtype=np.float32)
+    
+    def tta_views(self, image_bytes: bytes) -> np.ndarray:
+        """
+        Build the test-time augmentation views of one image
+        
+        The image is decoded once. Crops are taken with resize(box=...) on the
+        decoded image so they cost the same as the plain resize; flips and
+        rotations work on the already resized 128x128 image.
+        
+        Args:
+            image_bytes: Image file bytes
+        
+        Returns:
+            np.ndarray: float32 array of shape (len(TTA_VIEWS), 128, 128, 3)
+        """
+        image = Image.open(io.BytesIO(image_bytes)).convert('RGB')
+        base = image.resize(self.image_size)
+        width, height = image.size
+        dx, dy = int(width * (1 - TTA_CROP_FRACTION) / 2), int(height * (1 - TTA_CROP_FRACTION) / 2)
+        
+        views = [
+            base,
+            base.transpose(Image.FLIP_LEFT_RIGHT),
+            base.transpose(Image.FLIP_TOP_BOTTOM),
+            image.resize(self.image_size, box=(dx, dy, width - dx, height - dy)),
+            base.rotate(TTA_ROTATION_DEGREES, resample=Image.BILINEAR),
+            base.rotate(-TTA_ROTATION_DEGREES, resample=Image.BILINEAR),
+        ]
+        return np.stack([np.asarray(view, dtype=np.float32) for view in views])
+    
+    def predict_disease(self, image_bytes: bytes, tta: bool = False, embeddings: bool = False,
+                        plant: str = None) -> dict:
         """
         Predict plant disease from image bytes
         
         Args:
             image_bytes: Image file bytes
+            tta: Average predictions over flipped, cropped and rotated views
+            embeddings: Also return the image embedding (see predict_scores)
+            plant: Plant name from resolve_plant; only its classes are considered
         
         Returns:
             dict: Prediction results with disease name, confidence, and plant info
         """
-        if self.model is None:
-            raise RuntimeError(
-                "Model not loaded. The trained_model.keras file is missing. "
-                "Please run 'notebooks/Train_plant_disease.ipynb' to generate it."
-            )
+        return self.predict_disease_batch([image_bytes], tta=tta, embeddings=embeddings, plant=plant)[0]
+    
+    async def predict_disease_shared(self, image_bytes: bytes, tta: bool = False, profile: bool = False,
+                                     image_hash: str = None, embeddings: bool = False,
+                                     plant: str = None) -> dict:
+        """
+        predict_disease off the event loop, shared by concurrent identical uploads
+        
+        Uploads with the same content hash and tta flag that arrive while one
+        is being predicted wait for that prediction instead of running the
+        model again. The returned dict may be shared between requests.
+        
+        Args:
+            image_bytes: Image file bytes
+            tta: Average predictions over flipped, cropped and rotated views
+            profile: Profile the model call (only honoured for the request that runs it)
+            image_hash: SHA-256 hex digest of image_bytes, if the caller already computed it
+            embeddings: Also return the image embedding (see predict_scores)
+            plant: Plant name from resolve_plant; only its classes are considered
+        
+        Returns:
+            dict: Prediction results with disease name, confidence, and plant info
+        """
+        self._check_model_loaded()
+        key = (self.model_version, image_hash or hashlib.sha256(image_bytes).hexdigest(), tta, embeddings, plant)
+        return await self.disease_flight.run(
+            key, self._profiled_predict_disease, image_bytes, tta, profile, embeddings, plant
+        )
+    
+    def _profiled_predict_disease(self, image_bytes: bytes, tta: bool, profile: bool, embeddings: bool,
+                                  plant: Optional[str]) -> dict:
+        # Entered in the worker thread, which is the one the sampler must watch
+        with request_profiler.profile("predict_disease", force=profile):
+            return self.predict_disease(image_bytes, tta=tta, embeddings=embeddings, plant=plant)
+    
+    def predict_disease_batch(self, images: list, tta: bool = False, embeddings: bool = False,
+                              plant: str = None) -> list:
+        """
+        Predict plant diseases for several images in a single forward pass
+        
+        With tta=True every image contributes len(TTA_VIEWS) views to the same
+        batch tensor, so augmentation still costs one model call. Images the
+        leaf filter rejects are left out of the batch and come back as
+        'Not a leaf' dicts with success=False and is_leaf=False.
+        
+        Args:
+            images: List of image file bytes
+            tta: Average predictions over flipped, cropped and rotated views
+            embeddings: Add each image's embedding to its dict as 'embedding'
+            plant: Plant name from resolve_plant, applied to every image: only its
+                   classes are considered, scored by its specialist model if one
+                   is loaded (see predict_scores)
+        
+        Returns:
+            list: One prediction dict per image, in input order
+        """
+        self._check_model_loaded()
         
         try:
-            # Load and preprocess image - match Streamlit preprocessing exactly
-            # TensorFlow's image_dataset_from_directory keeps values in [0, 255] range
-            # So we should NOT normalize here to match the training data format
-            image = Image.open(io.BytesIO(image_bytes)).convert('RGB')
-            image = image.resize(self.image_size)
-            
-            # Convert to numpy array - keep values in [0, 255] range (no normalization)
-            # This matches tf.keras.preprocessing.image.img_to_array behavior
-            image_array = np.array(image, dtype=np.float32)
+            if tta:
+                image_array = np.concatenate([self.tta_views(image_bytes) for image_bytes in images])
+            else:
+                image_array = np.stack([self.preprocess_image(image_bytes) for image_bytes in images])
             
-            # Add batch dimension
-            image_array = np.expand_dims(image_array, axis=0)
+            # Log image statistics for debugging - guarded, mean/std scan the whole batch
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Image array shape: %s, mean: %.4f, std: %.4f",
+                             image_array.shape, image_array.mean(), image_array.std())
             
-            # Log image statistics for debugging
-            logger.debug(f"Image array shape: {image_array.shape}")
-            logger.debug(f"Image array mean: {image_array.mean():.4f}, std: {image_array.std():.4f}")
+            # Colour pre-filter on the plain view: non-leaf uploads never reach the CNN
+            views = len(TTA_VIEWS) if tta else 1
+            leaf, plant_ratios = leaf_filter.check_colour(image_array[::views])
+            results = [
+                None if accepted else leaf_filter.rejection('colour', ratio)
+                for accepted, ratio in zip(leaf, plant_ratios)
+            ]
+            if not leaf.any():
+                return results
+            if not leaf.all():
+                image_array = image_array[np.repeat(leaf, views)]
             
             # Make prediction
-            predictions = self.model.predict(image_array, verbose=0)
-            
-            # Get predicted class and confidence
-            predicted_idx = np.argmax(predictions[0])
-            confidence_score = float(predictions[0][predicted_idx])
+            if embeddings:
+                predictions, vectors = self.predict_scores(image_array, views=views, embeddings=True, plant=plant)
+            else:
+                predictions = self.predict_scores(image_array, views=views, plant=plant)
             
             # Log raw outputs for debugging
-            logger.debug(f"Prediction probabilities - min: {predictions.min():.4f}, max: {predictions.max():.4f}")
-            logger.debug(f"Predicted class: {predicted_idx}, Confidence: {confidence_score:.4f}")
-                
-            # Get prediction details
-            predicted_class = self.classes[predicted_idx]
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Prediction probabilities - min: %.4f, max: %.4f",
+                             predictions.min(), predictions.max())
+            
+            # Flat class distributions mean the CNN does not recognise the input either
+            certain, entropies = leaf_filter.check_uncertainty(predictions)
+            predicted = self.postprocess(predictions, plant=plant)
+            for row, index in enumerate(np.flatnonzero(leaf)):
+                if not certain[row]:
+                    results[index] = leaf_filter.rejection('uncertain', plant_ratios[index], entropies[row])
+                    continue
+                results[index] = predicted[row]
+                if embeddings:
+                    results[index]['embedding'] = vectors[row]
+            return results
+            
+        except Exception as e:
+            logger.error("Prediction error: %s", e)
+            raise
+    
+    def _check_model_loaded(self):
+        if self.model is None:
+            raise RuntimeError(
+                "Model not loaded. The trained_model.keras file is missing. "
+                "Please run 'notebooks/Train_plant_disease.ipynb' to generate it."
+            )
+    
+    def routes_to_specialist(self, plant: Optional[str], embeddings: bool = False) -> bool:
+        """Whether predict_scores would use a specialist model for this plant"""
+        return plant in self.specialists and not embeddings
+    
+    def predict_scores(self, image_array: np.ndarray, views: int = 1, embeddings: bool = False,
+                       plant: str = None):
+        """
+        Class probabilities for already preprocessed images
+        
+        Lets callers that decode images themselves (e.g. in a thread pool)
+        reuse the model call without going back through image bytes.
+        
+        Args:
+            image_array: float32 array of shape (n_images * views, 128, 128, 3)
+            views: Consecutive rows per image whose scores are averaged (TTA)
+            embeddings: Also return the penultimate-layer activations from the
+                        same forward pass, averaged over views and L2-normalized
+            plant: Score with this plant's specialist model, if one is loaded.
+                   Its scores are spread back over all classes (zero elsewhere).
+                   Ignored when embeddings=True: the similarity index is built
+                   from the global model's embeddings.
+        
+        Returns:
+            np.ndarray: Array of shape (n_images, n_classes), or a
+            (scores, embeddings) tuple when embeddings=True
+        """
+        self._check_model_loaded()
+        if self.routes_to_specialist(plant, embeddings):
+            specialist_scores = self.specialists[plant].predict(image_array, verbose=0)
+            predictions = np.zeros((len(specialist_scores), len(self.classes)), dtype=specialist_scores.dtype)
+            predictions[:, self.plant_classes[plant]] = specialist_scores
+            if views > 1:
+                predictions = predictions.reshape(-1, views, predictions.shape[-1]).mean(axis=1)
+            return predictions
+        if not embeddings:
+            predictions = self.model.predict(image_array, verbose=0)
+            if views > 1:
+                predictions = predictions.reshape(-1, views, predictions.shape[-1]).mean(axis=1)
+            return predictions
+        
+        if self.embedding_model is None:
+            raise RuntimeError("Embeddings are not available for this model")
+        vectors, predictions = self.embedding_model.predict(image_array, verbose=0)
+        vectors = vectors.reshape(len(vectors), -1)
+        if views > 1:
+            predictions = predictions.reshape(-1, views, predictions.shape[-1]).mean(axis=1)
+            vectors = vectors.reshape(-1, views, vectors.shape[-1]).mean(axis=1)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return predictions, (vectors / np.maximum(norms, 1e-12)).astype(np.float32)
+    
+    def top_k_indices(self, predictions: np.ndarray, k: int) -> tuple:
+        """
+        Top-k class indices and scores for every row of a score matrix
+        
+        Uses argpartition so only the k selected scores are sorted.
+        
+        Returns:
+            tuple: (indices, scores), both of shape (n_images, k), best first
+        """
+        k = min(k, predictions.shape[1])
+        candidates = np.argpartition(-predictions, k - 1, axis=1)[:, :k]
+        candidate_scores = np.take_along_axis(predictions, candidates, axis=1)
+        order = np.argsort(-candidate_scores, axis=1)
+        return (
+            np.take_along_axis(candidates, order, axis=1),
+            np.take_along_axis(candidate_scores, order, axis=1),
+        )
+    
+    def postprocess(self, predictions: np.ndarray, plant: str = None) -> list:
+        """
+        Turn a batch of class probabilities into prediction dicts
+        
+        Args:
+            predictions: Array of shape (n_images, n_classes)
+            plant: Only rank this plant's classes, with their probabilities
+                   renormalized to sum to 1
+        
+        Returns:
+            list: One prediction dict per row
+        """
+        predictions = np.asarray(predictions)
+        if plant is None:
+            top_indices, top_scores = self.top_k_indices(predictions, self.top_k)
+        else:
+            classes = self.plant_classes[plant]
+            scores = predictions[:, classes]
+            totals = scores.sum(axis=1, keepdims=True)
+            # All of a row's mass on other plants (float32 underflow): nothing to tell the classes apart
+            scores = np.where(totals > 0, scores / np.maximum(totals, 1e-30), 1.0 / len(classes))
+            top_indices, top_scores = self.top_k_indices(scores, self.top_k)
+            top_indices = classes[top_indices]
+        top_indices, top_scores = top_indices.tolist(), top_scores.tolist()
+        
+        results = []
+        for indices, scores in zip(top_indices, top_scores):
+            predicted_idx, confidence_score = indices[0], scores[0]
+            plant_name = self.class_plants[predicted_idx]
+            disease_name = self.class_diseases[predicted_idx]
             
             # Warning for suspiciously high confidence (might indicate overfitting)
             if confidence_score > 0.99:
-                logger.warning(f"Very high confidence ({confidence_score:.4f}) - model might be overfitted")
-            
-            # Parse disease information
-            parts = predicted_class.split('___')
-            plant_name = parts[0].replace('_', ' ')
-            disease_name = parts[1].replace('_', ' ') if len(parts) > 1 else 'Unknown'
+                logger.warning("Very high confidence (%.4f) - model might be overfitted", confidence_score)
             
-            # Get top 5 predictions for better visibility
-            top_indices = np.argsort(predictions[0])[::-1][:min(5, len(self.classes))]
             top_predictions = [
                 {
-                    'disease': self.classes[idx].split('___')[1].replace('_', ' '),
-                    'plant': self.classes[idx].split('___')[0].replace('_', ' '),
-                    'confidence': float(predictions[0][idx])
+                    'disease': self.class_diseases[idx],
+                    'plant': self.class_plants[idx],
+                    'confidence': score
                 }
-                for idx in top_indices
+                for idx, score in zip(indices, scores)
             ]
             
-            # Log top predictions for debugging
-            logger.info(f"Prediction: {plant_name} - {disease_name} ({confidence_score:.2%})")
-            logger.debug(f"Top 3 alternatives: {[(p['disease'], f"{p['confidence']:.2%}") for p in top_predictions[1:4]]}")
+            logger.info("Prediction: %s - %s (%.2f%%)", plant_name, disease_name, confidence_score * 100)
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Top 3 alternatives: %s",
+                             [(p['disease'], f"{p['confidence']:.2%}") for p in top_predictions[1:4]])
             
-            return {
+            results.append({
                 'success': True,
+                'is_leaf': True,
+                'class_id': predicted_idx,
                 'plant': plant_name,
                 'disease': disease_name,
-                'confidence': float(confidence_score),
-                'is_healthy': 'healthy' in disease_name.lower(),
+                'confidence': confidence_score,
+                'is_healthy': bool(self.class_is_healthy[predicted_idx]),
+                'recommendation': self.class_recommendations[predicted_idx],
                 'top_predictions': top_predictions
-            }
-            
-        except Exception as e:
-            logger.error(f"Prediction error: {str(e)}")
-            raise
+            })
+        return results
 
 # Global instance
 disease_service = DiseaseDetectionService()
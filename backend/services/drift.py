@@ -0,0 +1,260 @@
+import os
+import math
+import time
+import logging
+from bisect import bisect_right
+from datetime import datetime
+from pathlib import Path
+import numpy as np
+from dotenv import load_dotenv
+from utils.columnar import load_table
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Drift monitor configurations
+DRIFT_MONITOR_ENABLED = os.getenv("DRIFT_MONITOR_ENABLED", "true").lower() in ("1", "true", "yes")
+DRIFT_BASELINE_CSV = Path(os.getenv(
+    "DRIFT_BASELINE_CSV", Path(__file__).parent.parent.parent / "Data-processed" / "crop_recommendation.csv"
+))
+# Equal-mass bins of the baseline per feature; each request costs one bisect per feature
+DRIFT_BINS = int(os.getenv("DRIFT_BINS", "20"))
+# Live windows are compared against the baseline and rotated this often
+DRIFT_WINDOW_SECONDS = float(os.getenv("DRIFT_WINDOW_SECONDS", "3600"))
+# Usual PSI reading: < 0.1 stable, 0.1-0.25 moderate shift, > 0.25 significant shift
+DRIFT_PSI_WARN = float(os.getenv("DRIFT_PSI_WARN", "0.1"))
+DRIFT_PSI_ALERT = float(os.getenv("DRIFT_PSI_ALERT", "0.25"))
+# Fewer requests than this in a window are too few to score
+DRIFT_MIN_SAMPLES = int(os.getenv("DRIFT_MIN_SAMPLES", "100"))
+
+FEATURES = ["N", "P", "K", "temperature", "humidity", "ph", "rainfall"]
+QUANTILES = (0.05, 0.5, 0.95)
+PSI_EPSILON = 1e-4
+
+
+def psi(observed: np.ndarray, expected: np.ndarray) -> float:
+    """Population stability index between two binned distributions (proportions)"""
+    observed = np.clip(observed, PSI_EPSILON, None)
+    expected = np.clip(expected, PSI_EPSILON, None)
+    return float(np.sum((observed - expected) * np.log(observed / expected)))
+
+
+def ks_statistic(observed: np.ndarray, expected: np.ndarray) -> float:
+    """Kolmogorov-Smirnov distance, evaluated at the bin edges"""
+    return float(np.max(np.abs(np.cumsum(observed) - np.cumsum(expected))))
+
+
+def histogram_quantiles(counts: np.ndarray, bounds: np.ndarray, quantiles: tuple = QUANTILES) -> list:
+    """Quantiles of a binned sample (len(bounds) - 1 bins), interpolating linearly within bins"""
+    cumulative = np.concatenate([[0], np.cumsum(counts)]) / max(counts.sum(), 1)
+    return [float(np.interp(q, cumulative, bounds)) for q in quantiles]
+
+
+class Window:
+    """Per-feature bin counts and extremes of one stretch of live traffic; constant size"""
+
+    __slots__ = ("started_at", "count", "bins", "low", "high")
+
+    def __init__(self, n_features: int, n_bins: int):
+        self.started_at = datetime.utcnow()
+        self.count = 0
+        self.bins = [[0] * n_bins for _ in range(n_features)]
+        self.low = [math.inf] * n_features
+        self.high = [-math.inf] * n_features
+
+
+class DriftMonitor:
+    """
+    Streaming input-drift scores for the soil and climate features
+
+    The baseline is the training CSV: per feature, DRIFT_BINS equal-mass bin
+    edges and the share of training rows in each bin (plus two open-ended
+    bins for values outside the training range). Every request increments
+    one bin per feature in the current window and in a running total, so
+    memory does not grow with traffic. Windows rotate every
+    DRIFT_WINDOW_SECONDS; the finished one is scored and kept for the report,
+    and features past DRIFT_PSI_ALERT are logged.
+
+    Counts are per process and updated on the event loop thread only.
+    """
+
+    def __init__(self, baseline_csv: Path, n_bins: int, window_seconds: float, enabled: bool = True):
+        self.baseline_csv = Path(baseline_csv)
+        self.n_bins = n_bins
+        self.window_seconds = window_seconds
+        self.enabled = enabled
+        self.edges = None
+        self.streams = {}
+
+    @property
+    def ready(self) -> bool:
+        return self.enabled and self.edges is not None
+
+    def load(self):
+        """Compute the baseline bins from the training CSV"""
+        if not self.enabled:
+            return False
+        try:
+            samples = np.asarray(load_table(self.baseline_csv).matrix(FEATURES), dtype=np.float64)
+        except Exception as e:
+            logger.error("✗ Drift monitor disabled, could not read baseline %s: %s", self.baseline_csv, e)
+            return False
+
+        probabilities = np.linspace(0, 1, self.n_bins + 1)[1:-1]
+        self.edges, self.edge_lists, self.baseline = [], [], []
+        self.baseline_quantiles, self.lower, self.upper = [], [], []
+        for column in samples.T:
+            # Integer-valued features repeat quantiles; duplicate edges would leave empty bins
+            edges = np.unique(np.quantile(column, probabilities))
+            counts = np.bincount(np.searchsorted(edges, column, side="right"), minlength=len(edges) + 1)
+            # Extra bin past each end for values the training data never had
+            self.edges.append(edges)
+            self.edge_lists.append(edges.tolist())
+            self.baseline.append(np.concatenate([[0.0], counts / len(column), [0.0]]))
+            self.baseline_quantiles.append(np.quantile(column, QUANTILES).tolist())
+            self.lower.append(float(column.min()))
+            self.upper.append(float(column.max()))
+        logger.info("✓ Drift baseline: %d rows of %s", len(samples), self.baseline_csv.name)
+        return True
+
+    def _new_window(self) -> Window:
+        return Window(len(FEATURES), max(len(edges) for edges in self.edge_lists) + 3)
+
+    def observe(self, route: str, features: list):
+        """
+        Count one request's feature values
+
+        Args:
+            route: Stream name, e.g. "crop"
+            features: Values in FEATURES order
+        """
+        if self.edges is None:
+            return
+        stream = self.streams.get(route)
+        now = time.monotonic()
+        if stream is None:
+            stream = self.streams[route] = {
+                "current": self._new_window(), "total": self._new_window(),
+                "rotate_at": now + self.window_seconds, "previous_scores": None,
+            }
+        elif now >= stream["rotate_at"]:
+            self._rotate(route, stream, now)
+
+        current, total = stream["current"], stream["total"]
+        current.count += 1
+        total.count += 1
+        for i, value in enumerate(features):
+            # Bin 0 is below the training range and the last one above it
+            if value < self.lower[i]:
+                b = 0
+            elif value > self.upper[i]:
+                b = len(self.edge_lists[i]) + 2
+            else:
+                b = bisect_right(self.edge_lists[i], value) + 1
+            current.bins[i][b] += 1
+            total.bins[i][b] += 1
+            if value < current.low[i]:
+                current.low[i] = value
+            if value > current.high[i]:
+                current.high[i] = value
+            if value < total.low[i]:
+                total.low[i] = value
+            if value > total.high[i]:
+                total.high[i] = value
+
+    def observe_batch(self, route: str, rows: np.ndarray):
+        """
+        Count many requests' feature values at once (same bins as observe)
+
+        Args:
+            route: Stream name, e.g. "crop"
+            rows: Array of shape (n_rows, len(FEATURES))
+        """
+        if self.edges is None or not len(rows):
+            return
+        rows = np.asarray(rows, dtype=np.float64)
+        # The first row goes through observe, which creates or rotates the stream
+        self.observe(route, rows[0].tolist())
+        rows = rows[1:]
+        if not len(rows):
+            return
+        stream = self.streams[route]
+        current, total = stream["current"], stream["total"]
+        current.count += len(rows)
+        total.count += len(rows)
+        for i, column in enumerate(rows.T):
+            n_bins = len(self.edge_lists[i]) + 3
+            bins = np.searchsorted(self.edges[i], column, side="right") + 1
+            bins[column < self.lower[i]] = 0
+            bins[column > self.upper[i]] = n_bins - 1
+            counts = np.bincount(bins, minlength=n_bins).tolist()
+            low, high = float(column.min()), float(column.max())
+            for window in (current, total):
+                window_bins = window.bins[i]
+                for b, count in enumerate(counts):
+                    window_bins[b] += count
+                window.low[i] = min(window.low[i], low)
+                window.high[i] = max(window.high[i], high)
+
+    def _rotate(self, route: str, stream: dict, now: float):
+        scores = self.score(stream["current"])
+        stream["previous_scores"] = scores
+        stream["current"] = self._new_window()
+        stream["rotate_at"] = now + self.window_seconds
+        drifted = [name for name, feature in scores["features"].items() if feature["status"] == "alert"]
+        if drifted:
+            logger.warning("⚠ Input drift on %s over the last window (%d requests): %s",
+                           route, scores["count"], ", ".join(drifted))
+
+    def score(self, window: Window) -> dict:
+        """PSI, KS and quantiles of one window against the baseline"""
+        features = {}
+        for i, name in enumerate(FEATURES):
+            n_bins = len(self.baseline[i])
+            counts = np.asarray(window.bins[i][:n_bins], dtype=np.float64)
+            entry = {"baseline_quantiles": self.baseline_quantiles[i]}
+            if window.count >= DRIFT_MIN_SAMPLES:
+                observed = counts / window.count
+                value = psi(observed, self.baseline[i])
+                entry.update({
+                    "psi": value,
+                    "ks": ks_statistic(observed, self.baseline[i]),
+                    "status": "alert" if value >= DRIFT_PSI_ALERT else "warn" if value >= DRIFT_PSI_WARN else "ok",
+                    "outside_training_range": float(observed[0] + observed[-1]),
+                })
+            else:
+                entry["status"] = "insufficient_data"
+            if window.count:
+                bounds = np.concatenate([
+                    [min(window.low[i], self.lower[i]), self.lower[i]], self.edges[i],
+                    [self.upper[i], max(window.high[i], self.upper[i])],
+                ])
+                entry["quantiles"] = histogram_quantiles(counts, bounds)
+            features[name] = entry
+        return {"started_at": window.started_at, "count": window.count, "features": features}
+
+    def report(self) -> dict:
+        """Scores of every stream's current window, last finished window and running total"""
+        report = {}
+        for route, stream in self.streams.items():
+            report[route] = {
+                "current": self.score(stream["current"]),
+                "previous": stream["previous_scores"],
+                "total": self.score(stream["total"]),
+            }
+        return report
+
+    def metrics(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "ready": self.ready,
+            "baseline": str(self.baseline_csv),
+            "bins": self.n_bins,
+            "window_seconds": self.window_seconds,
+            "thresholds": {"psi_warn": DRIFT_PSI_WARN, "psi_alert": DRIFT_PSI_ALERT, "min_samples": DRIFT_MIN_SAMPLES},
+            "streams": self.report() if self.ready else {},
+        }
+
+# Global instance
+drift_monitor = DriftMonitor(DRIFT_BASELINE_CSV, DRIFT_BINS, DRIFT_WINDOW_SECONDS, DRIFT_MONITOR_ENABLED)
@@ -0,0 +1,167 @@
+import re
+import hashlib
+import numpy as np
+from pathlib import Path
+import logging
+from models.prediction import FERTILIZER_MAPPING, FERTILIZER_EXPLANATIONS
+from utils.columnar import load_table
+
+logger = logging.getLogger(__name__)
+
+FERTILIZER_CSV = Path(__file__).parent.parent.parent / "Data-processed" / "fertilizer.csv"
+
+# N-P-K content (%) of every product in FERTILIZER_MAPPING
+FERTILIZER_NPK = {
+    "Urea": (46, 0, 0),
+    "DAP": (18, 46, 0),
+    "14-35-14": (14, 35, 14),
+    "28-28": (28, 28, 0),
+    "17-17-17": (17, 17, 17),
+    "20-20": (20, 20, 0),
+    "10-26-26": (10, 26, 26),
+}
+
+# Recommended when the soil already meets every N/P/K target
+MAINTENANCE_FERTILIZER = "17-17-17"
+
+# Other names the crop is commonly entered as, after normalization
+CROP_ALIASES = {
+    "corn": "maize",
+    "paddy": "rice",
+    "grape": "grapes",
+    "kidneybean": "kidneybeans",
+    "pigeonpea": "pigeonpeas",
+    "mothbean": "mothbeans",
+    "mungbeans": "mungbean",
+    "greengram": "mungbean",
+    "chickpeas": "chickpea",
+    "gram": "chickpea",
+    "blackgrams": "blackgram",
+    "lentils": "lentil",
+}
+
+# pH this far from the crop's target gets a liming / acidifying note
+PH_TOLERANCE = 0.5
+
+NUTRIENTS = ["N", "P", "K"]
+
+
+def normalize_crop_name(name: str) -> str:
+    """'Kidney Beans', 'kidney_beans' and 'kidneybeans' all map to 'kidneybeans'"""
+    key = re.sub(r"[^a-z]", "", name.lower())
+    return CROP_ALIASES.get(key, key)
+
+
+class FertilizerEngine:
+    """
+    Rule-based fertilizer recommendation from per-crop nutrient targets
+
+    Data-processed/fertilizer.csv gives the N, P, K and pH each crop needs.
+    The shortfall of the soil against those targets is matched to the
+    fertilizer whose N-P-K ratio points the same way (cosine similarity),
+    so a recommendation is a table lookup and one small matrix product.
+    """
+
+    def __init__(self):
+        self.data_path = FERTILIZER_CSV
+        self.version = None
+        self.crops = []
+        self.index = {}
+        self.targets = None
+        self.fertilizer_ids = np.array(sorted(FERTILIZER_MAPPING))
+        compositions = np.array([FERTILIZER_NPK[FERTILIZER_MAPPING[i]] for i in self.fertilizer_ids], dtype=np.float64)
+        self.directions = compositions / np.linalg.norm(compositions, axis=1, keepdims=True)
+        self.maintenance_id = next(i for i, name in FERTILIZER_MAPPING.items() if name == MAINTENANCE_FERTILIZER)
+
+    def load(self):
+        """Load the per-crop targets into the in-memory index"""
+        try:
+            table = load_table(self.data_path)
+            self.version = hashlib.sha256(Path(self.data_path).read_bytes()).hexdigest()[:12]
+            self.crops = [str(c) for c in table["Crop"]]
+            self.targets = np.ascontiguousarray(table.matrix(NUTRIENTS + ["pH"]), dtype=np.float64)
+            self.index = {normalize_crop_name(c): i for i, c in enumerate(self.crops)}
+            logger.info("✓ Fertilizer targets loaded for %d crops from %s", len(self.crops), self.data_path)
+            return True
+        except Exception as e:
+            logger.error("✗ Failed to load fertilizer targets: %s", e)
+            raise
+
+    def crop_indices(self, crop_types: list) -> np.ndarray:
+        """
+        Row numbers in the target table for a list of crop names
+
+        Raises:
+            ValueError: If a crop has no targets
+        """
+        if self.targets is None:
+            raise RuntimeError("Fertilizer targets not loaded. Call load() first.")
+        try:
+            return np.array([self.index[normalize_crop_name(c)] for c in crop_types], dtype=np.intp)
+        except KeyError:
+            unknown = sorted({c for c in crop_types if normalize_crop_name(c) not in self.index})
+            raise ValueError(
+                f"No fertilizer targets for crop type(s): {', '.join(unknown)}. "
+                f"Supported crops: {', '.join(self.crops)}"
+            )
+
+    def recommend_batch(self, soil, crop_types: list) -> dict:
+        """
+        Recommend fertilizers for many soil samples at once
+
+        Args:
+            soil: Array-like of shape (n_samples, 4) with columns [N, P, K, ph]
+            crop_types: Crop name for every sample
+
+        Returns:
+            dict: Arrays fertilizer_id (n,), deficit (n, 3) in kg/ha,
+                  target (n, 4) and ph_delta (n,) = soil pH - target pH
+        """
+        soil = np.asarray(soil, dtype=np.float64).reshape(-1, 4)
+        target = self.targets[self.crop_indices(crop_types)]
+        deficit = np.maximum(target[:, :3] - soil[:, :3], 0.0)
+
+        magnitude = np.linalg.norm(deficit, axis=1)
+        similarity = deficit @ self.directions.T
+        fertilizer_id = np.where(magnitude > 0, self.fertilizer_ids[similarity.argmax(axis=1)], self.maintenance_id)
+
+        return {
+            "fertilizer_id": fertilizer_id,
+            "deficit": deficit,
+            "target": target,
+            "ph_delta": soil[:, 3] - target[:, 3],
+        }
+
+    def recommend(self, N: float, P: float, K: float, ph: float, crop_type: str) -> dict:
+        """
+        Recommend a fertilizer for one soil sample
+
+        Returns:
+            dict: fertilizer, fertilizer_id, explanation and the nutrient deficits
+        """
+        batch = self.recommend_batch([[N, P, K, ph]], [crop_type])
+        fertilizer_id = int(batch["fertilizer_id"][0])
+        fertilizer_name = FERTILIZER_MAPPING[fertilizer_id]
+        deficit = dict(zip(NUTRIENTS, batch["deficit"][0].round(1).tolist()))
+        return {
+            "fertilizer": fertilizer_name,
+            "fertilizer_id": fertilizer_id,
+            "explanation": self.explain(fertilizer_name, crop_type, deficit, float(batch["ph_delta"][0])),
+            "deficits": deficit,
+        }
+
+    def explain(self, fertilizer_name: str, crop_type: str, deficit: dict, ph_delta: float) -> str:
+        short = [f"{n} by {v:g} kg/ha" for n, v in deficit.items() if v > 0]
+        if short:
+            parts = [f"Soil is short of {', '.join(short)} for {crop_type}."]
+        else:
+            parts = [f"Soil already meets the N, P and K targets for {crop_type}; a light maintenance dose is enough."]
+        parts.append(FERTILIZER_EXPLANATIONS.get(fertilizer_name, "Recommended for optimal crop growth."))
+        if ph_delta < -PH_TOLERANCE:
+            parts.append(f"pH is {-ph_delta:.1f} below the crop's target; consider liming.")
+        elif ph_delta > PH_TOLERANCE:
+            parts.append(f"pH is {ph_delta:.1f} above the crop's target; consider sulphur or organic matter.")
+        return " ".join(parts)
+
+# Global instance
+fertilizer_service = FertilizerEngine()
@@ -0,0 +1,193 @@
+import os
+import hashlib
+import logging
+import threading
+import uuid
+from pathlib import Path
+from typing import Optional
+import numpy as np
+from dotenv import load_dotenv
+from services.disease_detection import disease_service
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Image store configurations
+IMAGE_STORE_ENABLED = os.getenv("IMAGE_STORE_ENABLED", "false").lower() in ("1", "true", "yes")
+IMAGE_STORE_DIR = Path(os.getenv("IMAGE_STORE_DIR", Path(__file__).parent.parent / "images"))
+# Originals plus arrays; the least recently uploaded images are evicted beyond this (0 = unlimited)
+IMAGE_STORE_MAX_GB = float(os.getenv("IMAGE_STORE_MAX_GB", "10"))
+# Eviction stops once the store is back under this fraction of the limit
+EVICTION_TARGET = 0.9
+
+ORIGINAL_SUFFIX = ".orig"
+
+
+class ImageStore:
+    """
+    Content-addressed store for uploaded disease images
+
+    Each unique upload is written once, under its SHA-256:
+
+        <root>/ab/cd/abcd....orig          the uploaded bytes
+        <root>/ab/cd/abcd....128x128.npy   the model input as uint8 (H, W, 3)
+
+    Identical uploads from any user map to the same files; a repeat only
+    refreshes the original's mtime, which is what eviction orders by. The
+    array is written before the original, so an existing original means
+    both files are complete.
+    """
+
+    def __init__(self, root: Path, max_bytes: int, enabled: bool = True):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self.total_bytes = None
+        self.stored = 0
+        self.duplicates = 0
+        self.bytes_saved = 0
+        self.evicted = 0
+        self.failures = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def digest(image_bytes: bytes) -> str:
+        return hashlib.sha256(image_bytes).hexdigest()
+
+    @property
+    def array_suffix(self) -> str:
+        width, height = disease_service.image_size
+        return f".{width}x{height}.npy"
+
+    def _directory(self, digest: str) -> Path:
+        return self.root / digest[:2] / digest[2:4]
+
+    def original_path(self, digest: str) -> Optional[Path]:
+        """Path of the stored upload, or None if it is not (or no longer) stored"""
+        path = self._directory(digest) / f"{digest}{ORIGINAL_SUFFIX}"
+        return path if path.exists() else None
+
+    def load_array(self, digest: str) -> Optional[np.ndarray]:
+        """
+        Preprocessed model input for a stored image, without decoding the original
+
+        Returns:
+            np.ndarray: float32 array of shape (128, 128, 3) in the [0, 255] range, or None
+        """
+        path = self._directory(digest) / f"{digest}{self.array_suffix}"
+        try:
+            return np.load(path).astype(np.float32)
+        except FileNotFoundError:
+            return None
+
+    def put(self, image_bytes: bytes, digest: Optional[str] = None) -> Optional[str]:
+        """
+        Store an upload unless an identical one is already stored
+
+        Blocking; meant to run in a background task after the response is
+        sent. Errors are logged and counted, never raised: the detection
+        itself has already been saved.
+
+        Args:
+            image_bytes: Uploaded image file bytes
+            digest: SHA-256 of image_bytes if the caller already has it
+
+        Returns:
+            str: The image's SHA-256, or None if it could not be stored
+        """
+        digest = digest or self.digest(image_bytes)
+        directory = self._directory(digest)
+        original = directory / f"{digest}{ORIGINAL_SUFFIX}"
+        try:
+            if original.exists():
+                os.utime(original)
+                with self._lock:
+                    self.duplicates += 1
+                    self.bytes_saved += len(image_bytes)
+                return digest
+
+            # The model input is stored as uint8: PIL resizes in uint8, so nothing is lost
+            array = disease_service.preprocess_image(image_bytes).astype(np.uint8)
+            directory.mkdir(parents=True, exist_ok=True)
+            array_path = directory / f"{digest}{self.array_suffix}"
+            self._write_atomic(array_path, lambda f: np.save(f, array))
+            self._write_atomic(original, lambda f: f.write(image_bytes))
+
+            with self._lock:
+                if self.total_bytes is None:
+                    self.total_bytes = self._scan_size()
+                else:
+                    self.total_bytes += len(image_bytes) + array_path.stat().st_size
+                self.stored += 1
+                if self.max_bytes and self.total_bytes > self.max_bytes:
+                    self._evict()
+            return digest
+        except Exception as e:
+            with self._lock:
+                self.failures += 1
+            logger.error("Failed to store image %s: %s", digest, e)
+            return None
+
+    @staticmethod
+    def _write_atomic(path: Path, write):
+        # Concurrent writers of the same image each use their own temp file
+        tmp = path.with_name(f".{path.name}.{uuid.uuid4().hex}.tmp")
+        try:
+            with open(tmp, "wb") as f:
+                write(f)
+            os.replace(tmp, path)
+        finally:
+            tmp.unlink(missing_ok=True)
+
+    def _entries(self) -> list:
+        """(mtime, bytes, files) for every stored image"""
+        entries = []
+        for original in self.root.glob(f"*/*/*{ORIGINAL_SUFFIX}"):
+            files = [original] + list(original.parent.glob(f"{original.stem}.*.npy"))
+            try:
+                stats = [f.stat() for f in files]
+            except FileNotFoundError:
+                continue  # evicted or replaced while scanning
+            entries.append((stats[0].st_mtime, sum(s.st_size for s in stats), files))
+        return entries
+
+    def _scan_size(self) -> int:
+        return sum(size for _, size, _ in self._entries())
+
+    def _evict(self):
+        """Delete least recently uploaded images until under the target size (caller holds the lock)"""
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        target = self.max_bytes * EVICTION_TARGET
+        removed = 0
+        for _, size, files in entries:
+            if total <= target:
+                break
+            # Original first, so a half-removed image already counts as missing
+            for path in files:
+                path.unlink(missing_ok=True)
+            total -= size
+            removed += 1
+        self.total_bytes = total
+        self.evicted += removed
+        logger.info("Image store over %d bytes: evicted %d images", self.max_bytes, removed)
+
+    def metrics(self) -> dict:
+        with self._lock:
+            if self.enabled and self.total_bytes is None and self.root.exists():
+                self.total_bytes = self._scan_size()
+            return {
+                "enabled": self.enabled,
+                "root": str(self.root),
+                "max_bytes": self.max_bytes,
+                "total_bytes": self.total_bytes or 0,
+                "stored": self.stored,
+                "duplicates": self.duplicates,
+                "bytes_saved": self.bytes_saved,
+                "evicted": self.evicted,
+                "failures": self.failures,
+            }
+
+# Global instance
+image_store = ImageStore(IMAGE_STORE_DIR, int(IMAGE_STORE_MAX_GB * 1024 ** 3), IMAGE_STORE_ENABLED)
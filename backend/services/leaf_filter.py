@@ -0,0 +1,133 @@
+import os
+import logging
+import threading
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Leaf filter configurations
+LEAF_FILTER_ENABLED = os.getenv("LEAF_FILTER_ENABLED", "true").lower() in ("1", "true", "yes")
+# Fraction of foliage-coloured pixels below which an upload is rejected before the CNN
+LEAF_MIN_PLANT_RATIO = float(os.getenv("LEAF_MIN_PLANT_RATIO", "0.1"))
+# Normalized entropy (0 = certain, 1 = uniform) above which a prediction is rejected;
+# 1.0 disables the check - calibrate with benchmarks/bench_leaf_filter.py first
+OOD_MAX_ENTROPY = float(os.getenv("OOD_MAX_ENTROPY", "1.0"))
+
+# Yellow-green through green, in degrees; browns and skin tones fall below, sky above
+PLANT_HUE_RANGE = (35.0, 160.0)
+MIN_SATURATION = 0.2
+MIN_VALUE = 0.15
+# Every 4th pixel each way of the 128x128 input is plenty to estimate a ratio
+SAMPLE_STRIDE = 4
+
+NOT_A_LEAF_ADVICE = "Upload a close, well-lit photo of a single plant leaf against a plain background."
+
+
+def plant_pixel_ratio(images: np.ndarray) -> np.ndarray:
+    """
+    Fraction of foliage-coloured pixels per image
+
+    Args:
+        images: float array of shape (n, H, W, 3) in the [0, 255] range
+
+    Returns:
+        np.ndarray: Array of shape (n,) with values in [0, 1]
+    """
+    rgb = images[:, ::SAMPLE_STRIDE, ::SAMPLE_STRIDE, :].astype(np.float32) / 255.0
+    r, g, b = rgb[..., 0], rgb[..., 1], rgb[..., 2]
+    value = rgb.max(axis=-1)
+    delta = value - rgb.min(axis=-1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        saturation = np.where(value > 0, delta / value, 0.0)
+        # Standard RGB -> hue, in degrees
+        hue = np.where(value == r, (g - b) / delta % 6,
+                       np.where(value == g, (b - r) / delta + 2, (r - g) / delta + 4)) * 60.0
+    plant = (
+        (delta > 0) & (saturation >= MIN_SATURATION) & (value >= MIN_VALUE)
+        & (hue >= PLANT_HUE_RANGE[0]) & (hue <= PLANT_HUE_RANGE[1])
+    )
+    return plant.mean(axis=(1, 2))
+
+
+def normalized_entropy(probabilities: np.ndarray) -> np.ndarray:
+    """Entropy of each row of class probabilities divided by log(n_classes)"""
+    p = np.clip(probabilities, 1e-12, 1.0)
+    return -(p * np.log(p)).sum(axis=1) / np.log(p.shape[1])
+
+
+class LeafFilter:
+    """
+    Cheap checks that keep non-leaf uploads away from (or out of) the CNN
+
+    Before the model: uploads with too few foliage-coloured pixels (selfies,
+    soil, screenshots) are rejected without a forward pass. After the model:
+    predictions whose class distribution is too flat (out-of-distribution
+    inputs that got past the colour check) are rejected instead of being
+    reported with a meaningless label.
+    """
+
+    def __init__(self, min_plant_ratio: float, max_entropy: float, enabled: bool = True):
+        self.min_plant_ratio = min_plant_ratio
+        self.max_entropy = max_entropy
+        self.enabled = enabled
+        self.checked = 0
+        self.rejected_colour = 0
+        self.rejected_uncertain = 0
+        self._lock = threading.Lock()
+
+    def check_colour(self, images: np.ndarray) -> tuple:
+        """
+        Returns:
+            tuple: (accepted bool mask, plant pixel ratios), both of shape (n,)
+        """
+        ratios = plant_pixel_ratio(images)
+        accepted = ratios >= self.min_plant_ratio if self.enabled else np.ones(len(images), dtype=bool)
+        with self._lock:
+            self.checked += len(images)
+            self.rejected_colour += int((~accepted).sum())
+        return accepted, ratios
+
+    def check_uncertainty(self, probabilities: np.ndarray) -> tuple:
+        """
+        Returns:
+            tuple: (accepted bool mask, normalized entropies), both of shape (n,)
+        """
+        entropy = normalized_entropy(probabilities)
+        accepted = entropy <= self.max_entropy if self.enabled else np.ones(len(entropy), dtype=bool)
+        with self._lock:
+            self.rejected_uncertain += int((~accepted).sum())
+        return accepted, entropy
+
+    def rejection(self, reason: str, plant_ratio: float, entropy: float = None) -> dict:
+        """Prediction dict returned instead of a disease for a rejected upload"""
+        return {
+            'success': False,
+            'is_leaf': False,
+            'plant': 'Unknown',
+            'disease': 'Not a leaf',
+            'confidence': 0.0,
+            'is_healthy': False,
+            'recommendation': NOT_A_LEAF_ADVICE,
+            'top_predictions': [],
+            'rejection': {
+                'reason': reason,
+                'plant_ratio': float(plant_ratio),
+                'entropy': None if entropy is None else float(entropy),
+            },
+        }
+
+    def metrics(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "min_plant_ratio": self.min_plant_ratio,
+            "max_entropy": self.max_entropy,
+            "checked": self.checked,
+            "rejected_colour": self.rejected_colour,
+            "rejected_uncertain": self.rejected_uncertain,
+        }
+
+# Global instance
+leaf_filter = LeafFilter(LEAF_MIN_PLANT_RATIO, OOD_MAX_ENTROPY, LEAF_FILTER_ENABLED)
@@ -1,28 +1,62 @@
 import pickle
+import json
+import hashlib
 import numpy as np
 from pathlib import Path
 import logging
+from models.prediction import CROP_MAPPING, CROP_DISPLAY_NAMES
+from utils.cpu_budget import limit_model_threads
+from utils.profiling import request_profiler
+from utils.single_flight import SingleFlight
 
 logger = logging.getLogger(__name__)
 
+MODELS_DIR = Path(__file__).parent.parent.parent / "models"
+
 class MLModelService:
     """Service for loading and using the pre-trained XGBoost model"""
     
     def __init__(self):
         self.model = None
-        self.model_path = Path(__file__).parent.parent.parent / "models" / "XGBoost.pkl"
+        self.model_path = MODELS_DIR / "XGBoost.pkl"
+        self.manifest_path = MODELS_DIR / "manifest.json"
+        self.labels = None
+        self.model_version = None
+        self.crop_flight = SingleFlight("crop")
         
     def load_model(self):
-        """Load the XGBoost model at application startup"""
+        """
+        Load the XGBoost model at application startup
+        
+        If models/manifest.json exists (written by training/pipeline.py), the
+        serving model and its label order are taken from it; otherwise the
+        model at model_path is used with the static CROP_MAPPING.
+        """
         try:
-            with open(self.model_path, 'rb') as f:
-                self.model = pickle.load(f)
-            logger.info(f"✓ XGBoost model loaded successfully from {self.model_path}")
+            if self.manifest_path.exists():
+                manifest = json.loads(self.manifest_path.read_text())
+                entry = manifest["models"][manifest["serving_model"]]
+                self.model_path = MODELS_DIR / entry["path"]
+                self.labels = manifest["labels"]
+                logger.info("✓ Using %s from training manifest", manifest["serving_model"])
+            
+            model_bytes = self.model_path.read_bytes()
+            # n_jobs=MODEL_THREADS so workers started by serve.py stay within their CPU share
+            self.model = limit_model_threads(pickle.loads(model_bytes))
+            self.model_version = hashlib.sha256(model_bytes).hexdigest()[:12]
+            logger.info("✓ XGBoost model loaded successfully from %s (version %s)", self.model_path, self.model_version)
             return True
         except Exception as e:
-            logger.error(f"✗ Failed to load XGBoost model: {str(e)}")
+            logger.error("✗ Failed to load XGBoost model: %s", e)
             raise
     
+    def crop_name(self, crop_id: int) -> str:
+        """Display name for a predicted crop index"""
+        if self.labels is not None and 0 <= crop_id < len(self.labels):
+            label = self.labels[crop_id]
+            return CROP_DISPLAY_NAMES.get(label, label.title())
+        return CROP_MAPPING.get(crop_id, "Unknown Crop")
+    
     def predict_crop(self, features: list) -> int:
         """
         Predict crop recommendation
@@ -44,9 +78,52 @@ class MLModelService:
         
         return int(prediction[0])
     
+    async def predict_crop_shared(self, features: list, profile: bool = False) -> int:
+        """
+        predict_crop off the event loop, shared by concurrent identical requests
+        
+        Requests with the same feature vector that arrive while one is being
+        predicted wait for that prediction instead of calling the model again.
+        
+        Args:
+            features: List of 7 features [N, P, K, temperature, humidity, ph, rainfall]
+            profile: Profile the model call (only honoured for the request that runs it)
+        
+        Returns:
+            int: Predicted crop class index
+        """
+        key = (self.model_version, tuple(float(value) for value in features))
+        return await self.crop_flight.run(key, self._profiled_predict_crop, features, profile)
+    
+    def _profiled_predict_crop(self, features: list, profile: bool) -> int:
+        # Entered in the worker thread, which is the one the sampler must watch
+        with request_profiler.profile("predict_crop", force=profile):
+            return self.predict_crop(features)
+    
+    def predict_crop_batch(self, features) -> np.ndarray:
+        """
+        Predict crop recommendations for many samples in one model call
+        
+        Args:
+            features: Array-like of shape (n_samples, 7) with columns
+                      [N, P, K, temperature, humidity, ph, rainfall]
+        
+        Returns:
+            np.ndarray: Predicted crop class indices, one per row
+        """
+        if self.model is None:
+            raise RuntimeError("Model not loaded. Call load_model() first.")
+        
+        X = np.asarray(features, dtype=np.float64).reshape(-1, 7)
+        
+        return np.asarray(self.model.predict(X)).astype(int)
+    
     def predict_fertilizer(self, features: list) -> int:
         """
-        Predict fertilizer recommendation
+        Predict fertilizer recommendation with the crop classifier
+        
+        Legacy path: the route now uses services.fertilizer, which looks up
+        the crop's nutrient targets instead. Kept for benchmark comparison.
         
         Args:
             features: List of features [N, P, K, temperature, humidity, ph, rainfall, crop_type]
@@ -0,0 +1,456 @@
+import os
+import time
+import queue
+import pickle
+import random
+import sqlite3
+import hashlib
+import logging
+import threading
+import multiprocessing
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+import numpy as np
+from dotenv import load_dotenv
+from services.ml_model import ml_service
+from services.fertilizer import fertilizer_service, FertilizerEngine
+from services.disease_detection import disease_service, DiseaseDetectionService, TTA_VIEWS
+from utils.cpu_budget import apply_thread_budget, limit_model_threads
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Shadow traffic configurations
+# Fraction of live requests mirrored to a candidate model (0 turns shadowing off)
+SHADOW_SAMPLE_RATE = float(os.getenv("SHADOW_SAMPLE_RATE", "0"))
+# Candidates: a crop model pickle, a fertilizer target table, a disease .keras model
+SHADOW_CROP_MODEL = os.getenv("SHADOW_CROP_MODEL")
+SHADOW_FERTILIZER_TARGETS = os.getenv("SHADOW_FERTILIZER_TARGETS")
+SHADOW_DISEASE_MODEL = os.getenv("SHADOW_DISEASE_MODEL")
+SHADOW_DB_PATH = Path(os.getenv("SHADOW_DB_PATH", Path(__file__).parent.parent / "shadow" / "shadow.db"))
+# Mirrored requests waiting for the shadow process; more are dropped, never waited for
+SHADOW_MAX_PENDING = int(os.getenv("SHADOW_MAX_PENDING", "64"))
+# Priority and thread budget of the process that runs the candidates
+SHADOW_NICE = int(os.getenv("SHADOW_NICE", "10"))
+SHADOW_MODEL_THREADS = int(os.getenv("SHADOW_MODEL_THREADS", "1"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS comparisons (
+    id INTEGER PRIMARY KEY,
+    route TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    primary_version TEXT,
+    candidate_version TEXT,
+    primary_label TEXT,
+    candidate_label TEXT,
+    agree INTEGER,
+    primary_ms REAL,
+    candidate_ms REAL,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS comparisons_route_time ON comparisons (route, created_at);
+"""
+
+
+def _file_version(path: Path) -> str:
+    return hashlib.sha256(Path(path).read_bytes()).hexdigest()[:12]
+
+
+class CropCandidate:
+    """A candidate crop model pickle, compared on the predicted crop name"""
+
+    route = "crop"
+
+    def __init__(self, path: str):
+        # n_jobs from the shadow process' thread budget
+        self.model = limit_model_threads(pickle.loads(Path(path).read_bytes()))
+        self.version = _file_version(path)
+
+    def run(self, features: list) -> str:
+        X = np.asarray(features, dtype=np.float64).reshape(1, -1)
+        return ml_service.crop_name(int(self.model.predict(X)[0]))
+
+
+class FertilizerCandidate:
+    """A candidate fertilizer target table, compared on the recommended product"""
+
+    route = "fertilizer"
+
+    def __init__(self, path: str):
+        self.engine = FertilizerEngine()
+        self.engine.data_path = Path(path)
+        self.engine.load()
+        self.version = self.engine.version
+
+    def run(self, sample: tuple) -> str:
+        return self.engine.recommend(*sample)["fertilizer"]
+
+
+class DiseaseCandidate:
+    """
+    A candidate global disease model, compared on plant and disease
+
+    Decoding is timed along with the model call, as it is in the live
+    request. Specialists are not loaded for the candidate: it stands in for
+    trained_model.keras, so requests a specialist answered are not mirrored.
+    """
+
+    route = "disease"
+
+    def __init__(self, path: str):
+        self.service = DiseaseDetectionService()
+        self.service.model_path = Path(path)
+        self.service.specialists_file = None
+        if not self.service.load_model():
+            raise RuntimeError(f"Could not load candidate disease model from {path}")
+        self.version = self.service.model_version
+
+    def run(self, request: tuple) -> str:
+        image_bytes, tta, plant = request
+        if tta:
+            image_array, views = self.service.tta_views(image_bytes), len(TTA_VIEWS)
+        else:
+            image_array, views = self.service.preprocess_image(image_bytes)[np.newaxis], 1
+        scores = self.service.predict_scores(image_array, views=views, plant=plant)
+        result = self.service.postprocess(scores, plant=plant)[0]
+        return f"{result['plant']} - {result['disease']}"
+
+
+CANDIDATE_TYPES = {
+    "crop": (CropCandidate, SHADOW_CROP_MODEL),
+    "fertilizer": (FertilizerCandidate, SHADOW_FERTILIZER_TARGETS),
+    "disease": (DiseaseCandidate, SHADOW_DISEASE_MODEL),
+}
+
+
+def primary_version(route: str) -> Optional[str]:
+    """Version of the serving model a candidate is compared with"""
+    if route == "crop":
+        return ml_service.model_version
+    if route == "fertilizer":
+        return fertilizer_service.version
+    return disease_service.model_version
+
+
+def _lower_priority(nice: int):
+    """Renice every thread of this process; threads started later inherit it"""
+    try:
+        for tid in os.listdir("/proc/self/task"):
+            os.setpriority(os.PRIO_PROCESS, int(tid), nice)
+    except (AttributeError, OSError) as e:
+        logger.debug("Could not lower shadow process priority: %s", e)
+
+
+def run_candidates(connection, paths: dict, crop_labels: Optional[list], threads: int, nice: int):
+    """
+    Entry point of the shadow process
+
+    Lowers its priority and thread budget before any model is loaded, sends
+    back {route: version or error}, then answers (route, request) messages
+    with (label, milliseconds, error) until it receives None.
+    """
+    _lower_priority(nice)
+    apply_thread_budget(threads)
+    # Crop indices are named in the serving model's label order
+    ml_service.labels = crop_labels
+    candidates, loaded = {}, {}
+    for route, path in paths.items():
+        try:
+            candidates[route] = CANDIDATE_TYPES[route][0](path)
+            loaded[route] = {"version": candidates[route].version}
+        except Exception as e:
+            loaded[route] = {"error": f"{type(e).__name__}: {e}"}
+    connection.send(loaded)
+
+    while True:
+        try:
+            message = connection.recv()
+        except EOFError:
+            return
+        if message is None:
+            return
+        route, request = message
+        try:
+            started = time.perf_counter()
+            label = candidates[route].run(request)
+            connection.send((label, (time.perf_counter() - started) * 1000, None))
+        except Exception as e:
+            connection.send((None, None, f"{type(e).__name__}: {e}"))
+
+
+class ShadowTraffic:
+    """
+    Mirror a sample of live requests to candidate models, off the request path
+
+    Routes call submit() after computing their response, passing the live
+    answer and how long the serving model took: a random draw and a
+    non-blocking put on a bounded queue. The candidates run in a separate
+    process at a lower priority and with its own small thread budget, so
+    they never share the serving models' thread pools. A background thread
+    hands each mirrored request to that process and appends a row to a
+    SQLite file: both labels, whether they agree, and both latencies. The
+    latencies are measured under different conditions (a live request with
+    the serving thread pools, against a niced process with
+    SHADOW_MODEL_THREADS threads), so they describe each side, not which
+    model is faster. When the candidates fall behind, new requests are
+    dropped and counted.
+
+    jobs/shadow_report.py summarizes the file.
+    """
+
+    def __init__(self, db_path: Path, sample_rate: float, max_pending: int):
+        self.db_path = Path(db_path)
+        self.sample_rate = sample_rate
+        # route -> candidate version, for the candidates the shadow process loaded
+        self.candidates = {}
+        self.submitted = 0
+        self.dropped = 0
+        self.compared = 0
+        self.errors = 0
+        self.restarts = 0
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._thread = None
+        self._process = None
+        self._connection = None
+        self._paths = {}
+
+    @property
+    def enabled(self) -> bool:
+        return self.sample_rate > 0 and bool(self.candidates)
+
+    def load(self):
+        """Start the shadow process with the configured candidates, and the thread feeding it"""
+        if self.sample_rate <= 0:
+            return
+        self._paths = {route: path for route, (_, path) in CANDIDATE_TYPES.items() if path}
+        if not self._paths:
+            return
+        try:
+            loaded = self._start_process()
+        except Exception as e:
+            logger.error("✗ Failed to start the shadow process: %s", e)
+            return
+        for route, result in loaded.items():
+            if "error" in result:
+                logger.error("✗ Failed to load %s shadow candidate %s: %s", route, self._paths[route], result["error"])
+                continue
+            self.candidates[route] = result["version"]
+            logger.info("✓ Shadowing %.1f%% of %s requests with %s (version %s)",
+                        self.sample_rate * 100, route, self._paths[route], result["version"])
+        if not self.candidates:
+            self._stop_process()
+        elif self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="shadow-traffic", daemon=True)
+            self._thread.start()
+
+    def _start_process(self) -> dict:
+        # Spawned, not forked: the child sets its thread budget before its models start their pools
+        context = multiprocessing.get_context("spawn")
+        self._connection, child = context.Pipe()
+        self._process = context.Process(
+            target=run_candidates, name="shadow-candidates", daemon=True,
+            args=(child, self._paths, ml_service.labels, SHADOW_MODEL_THREADS, SHADOW_NICE),
+        )
+        self._process.start()
+        child.close()
+        return self._connection.recv()
+
+    def _stop_process(self):
+        if self._process is None:
+            return
+        try:
+            self._connection.send(None)
+        except OSError:
+            pass
+        self._process.join(5)
+        if self._process.is_alive():
+            self._process.terminate()
+        self._connection.close()
+        self._process = self._connection = None
+
+    def stop(self, timeout: float = 5.0):
+        """Finish the comparison in progress and stop the thread and process; queued requests are discarded"""
+        if self._thread is None:
+            return
+        while True:
+            try:
+                self._queue.get_nowait()
+            except queue.Empty:
+                break
+        self._queue.put(None)
+        self._thread.join(timeout)
+        self._thread = None
+        self._stop_process()
+
+    def submit(self, route: str, request, primary_label: str, primary_ms: float):
+        """
+        Maybe mirror one request to the route's candidate; never blocks
+
+        Args:
+            route: "crop", "fertilizer" or "disease"
+            request: The model input, as the candidate's run() takes it
+            primary_label: What the serving model answered
+            primary_ms: How long the live call to the serving model took
+        """
+        if route not in self.candidates or random.random() >= self.sample_rate:
+            return
+        try:
+            self._queue.put_nowait((route, request, primary_label, primary_ms, datetime.utcnow()))
+            self.submitted += 1
+        except queue.Full:
+            self.dropped += 1
+
+    def connect(self) -> sqlite3.Connection:
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        connection = sqlite3.connect(self.db_path)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.executescript(SCHEMA)
+        return connection
+
+    def run_candidate(self, route: str, request) -> tuple:
+        """(label, milliseconds) from the shadow process; a process that died is restarted"""
+        try:
+            self._connection.send((route, request))
+            label, elapsed_ms, error = self._connection.recv()
+        except (EOFError, OSError):
+            exitcode = self._process.exitcode if self._process else None
+            self._stop_process()
+            self.restarts += 1
+            self._start_process()
+            raise RuntimeError(f"Shadow process exited (code {exitcode}), restarted")
+        if error:
+            raise RuntimeError(error)
+        return label, elapsed_ms
+
+    def _run(self):
+        # Linux applies nice values per thread: recording comparisons also yields to live requests
+        try:
+            os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), SHADOW_NICE)
+        except (AttributeError, OSError) as e:
+            logger.debug("Could not lower shadow thread priority: %s", e)
+        connection = self.connect()
+        try:
+            while True:
+                item = self._queue.get()
+                if item is None:
+                    return
+                route, request, primary_label, primary_ms, created_at = item
+                row = {"candidate_label": None, "agree": None, "candidate_ms": None, "error": None}
+                try:
+                    label, candidate_ms = self.run_candidate(route, request)
+                    row.update(candidate_label=label, agree=int(label == primary_label), candidate_ms=candidate_ms)
+                    self.compared += 1
+                except Exception as e:
+                    self.errors += 1
+                    row["error"] = f"{type(e).__name__}: {e}"
+                    logger.warning("Shadow %s comparison failed: %s", route, e)
+                try:
+                    connection.execute(
+                        "INSERT INTO comparisons (route, created_at, primary_version, candidate_version, "
+                        "primary_label, candidate_label, agree, primary_ms, candidate_ms, error) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        (route, created_at.isoformat(), primary_version(route), self.candidates[route],
+                         primary_label, row["candidate_label"], row["agree"], primary_ms,
+                         row["candidate_ms"], row["error"]),
+                    )
+                    connection.commit()
+                except sqlite3.Error as e:
+                    logger.error("Failed to record shadow comparison: %s", e)
+        finally:
+            connection.close()
+
+    def report(self, route: str = None, since: Optional[datetime] = None, candidate_version: str = None,
+               top: int = 5) -> dict:
+        """
+        Agreement and latency of each candidate, from the comparison store
+
+        Args:
+            route: Only this route (default: all)
+            since: Only comparisons made after this time
+            candidate_version: Only this candidate (default: every version seen)
+            top: Number of most frequent disagreements to list
+
+        Returns:
+            dict: route -> candidate version -> summary
+        """
+        if not self.db_path.exists():
+            return {}
+        where, params = ["1 = 1"], []
+        if route:
+            where.append("route = ?")
+            params.append(route)
+        if since:
+            where.append("created_at >= ?")
+            params.append(since.isoformat())
+        if candidate_version:
+            where.append("candidate_version = ?")
+            params.append(candidate_version)
+        clause = " AND ".join(where)
+
+        connection = self.connect()
+        try:
+            rows = connection.execute(
+                f"SELECT route, candidate_version, primary_version, agree, primary_ms, candidate_ms, error "
+                f"FROM comparisons WHERE {clause}", params
+            ).fetchall()
+            disagreements = connection.execute(
+                f"SELECT route, candidate_version, primary_label, candidate_label, COUNT(*) AS n "
+                f"FROM comparisons WHERE {clause} AND agree = 0 "
+                f"GROUP BY route, candidate_version, primary_label, candidate_label ORDER BY n DESC", params
+            ).fetchall()
+        finally:
+            connection.close()
+
+        groups = {}
+        for route_name, version, primary_version, agree, primary_ms, candidate_ms, error in rows:
+            group = groups.setdefault((route_name, version), {
+                "primary_versions": set(), "agree": [], "primary_ms": [], "candidate_ms": [], "errors": 0
+            })
+            group["primary_versions"].add(primary_version)
+            if error:
+                group["errors"] += 1
+                continue
+            group["agree"].append(agree)
+            group["primary_ms"].append(primary_ms)
+            group["candidate_ms"].append(candidate_ms)
+
+        summary = {}
+        for (route_name, version), group in groups.items():
+            compared = len(group["agree"])
+            entry = {
+                "compared": compared,
+                "errors": group["errors"],
+                "primary_versions": sorted(v for v in group["primary_versions"] if v),
+                "agreement": float(np.mean(group["agree"])) if compared else None,
+                "disagreements": [
+                    {"primary": p, "candidate": c, "count": n}
+                    for r, v, p, c, n in disagreements if (r, v) == (route_name, version)
+                ][:top],
+            }
+            if compared:
+                primary_ms, candidate_ms = np.array(group["primary_ms"]), np.array(group["candidate_ms"])
+                # Not comparable with each other: see the class docstring
+                for name, values in (("primary", primary_ms), ("candidate", candidate_ms)):
+                    entry[f"{name}_p50_ms"] = float(np.percentile(values, 50))
+                    entry[f"{name}_p95_ms"] = float(np.percentile(values, 95))
+            summary.setdefault(route_name, {})[version] = entry
+        return summary
+
+    def metrics(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "sample_rate": self.sample_rate,
+            "candidates": dict(self.candidates),
+            "submitted": self.submitted,
+            "dropped": self.dropped,
+            "compared": self.compared,
+            "errors": self.errors,
+            "restarts": self.restarts,
+            "pending": self._queue.qsize(),
+        }
+
+# Global instance
+shadow_traffic = ShadowTraffic(SHADOW_DB_PATH, SHADOW_SAMPLE_RATE, SHADOW_MAX_PENDING)
@@ -0,0 +1,280 @@
+import os
+import json
+import uuid
+import shutil
+import logging
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+import numpy as np
+from bson import ObjectId
+from numpy.lib.format import open_memmap
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Similarity index configurations
+SIMILARITY_INDEX_DIR = Path(os.getenv("SIMILARITY_INDEX_DIR", Path(__file__).parent.parent / "similarity"))
+# Inverted lists scanned per query: more is slower and closer to exact
+SIMILARITY_NPROBE = int(os.getenv("SIMILARITY_NPROBE", "16"))
+
+
+def fit_pca(sample: np.ndarray, dim: int) -> tuple:
+    """
+    Mean and top `dim` principal directions of a sample of embeddings
+
+    Returns:
+        tuple: (mean of shape (D,), components of shape (D, dim)), float32
+    """
+    sample = np.asarray(sample, dtype=np.float32)
+    mean = sample.mean(axis=0)
+    _, _, vt = np.linalg.svd(sample - mean, full_matrices=False)
+    return mean, np.ascontiguousarray(vt[:dim].T)
+
+
+def project(embeddings: np.ndarray, mean: np.ndarray, components: np.ndarray) -> np.ndarray:
+    """Reduce embeddings with the PCA and L2-normalize, so dot product is cosine similarity"""
+    reduced = (np.atleast_2d(embeddings).astype(np.float32) - mean) @ components
+    norms = np.linalg.norm(reduced, axis=1, keepdims=True)
+    return reduced / np.maximum(norms, 1e-12)
+
+
+def spherical_kmeans(vectors: np.ndarray, n_clusters: int, iterations: int = 10, seed: int = 0) -> np.ndarray:
+    """Unit-norm centroids maximizing cosine similarity to their members"""
+    rng = np.random.default_rng(seed)
+    vectors = np.asarray(vectors, dtype=np.float32)
+    centroids = vectors[rng.choice(len(vectors), n_clusters, replace=False)].copy()
+    for _ in range(iterations):
+        assignment = (vectors @ centroids.T).argmax(axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignment, vectors)
+        counts = np.bincount(assignment, minlength=n_clusters)
+        # Re-seed empty lists from random points so every list stays in use
+        empty = counts == 0
+        sums[empty] = vectors[rng.choice(len(vectors), int(empty.sum()), replace=False)]
+        centroids = sums / np.maximum(np.linalg.norm(sums, axis=1, keepdims=True), 1e-12)
+    return centroids
+
+
+def build_ivf(vectors: np.ndarray, ids: np.ndarray, mean: np.ndarray, components: np.ndarray,
+              directory: Path, model_version: str, n_lists: int = None, train_size: int = 100_000,
+              chunk_size: int = 65_536, seed: int = 0, last_id: str = None) -> dict:
+    """
+    Write an IVF index over projected, unit-norm vectors
+
+    Vectors are clustered into n_lists inverted lists (sqrt(N) by default),
+    and stored grouped by list as float16, so probing a list reads one
+    contiguous slice of the memory-mapped file. The index is written to a
+    temporary directory and moved into place at the end.
+
+    Args:
+        vectors: (N, dim) output of project()
+        ids: (N, 12) uint8, the detection ObjectIds' bytes
+        mean, components: The PCA from fit_pca, needed to project queries
+        directory: Where the index lives
+        model_version: Version of the model the embeddings came from
+        last_id: Highest detection _id the build scanned; newer detections
+                 belong in the delta file (see jobs/build_similarity_index.py)
+    """
+    n = len(vectors)
+    n_lists = n_lists or max(1, int(np.sqrt(n)))
+    rng = np.random.default_rng(seed)
+    train = vectors[np.sort(rng.choice(n, min(n, max(train_size, n_lists)), replace=False))]
+    centroids = spherical_kmeans(train, n_lists, seed=seed)
+
+    assignment = np.concatenate([
+        (np.asarray(vectors[start:start + chunk_size], dtype=np.float32) @ centroids.T).argmax(axis=1)
+        for start in range(0, n, chunk_size)
+    ])
+    order = np.argsort(assignment, kind="stable")
+    offsets = np.concatenate([[0], np.cumsum(np.bincount(assignment, minlength=n_lists))]).astype(np.int64)
+
+    directory = Path(directory)
+    tmp = directory.with_name(directory.name + ".building")
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir(parents=True)
+    np.save(tmp / "mean.npy", mean.astype(np.float32))
+    np.save(tmp / "components.npy", components.astype(np.float32))
+    np.save(tmp / "centroids.npy", centroids.astype(np.float32))
+    np.save(tmp / "offsets.npy", offsets)
+    stored = open_memmap(tmp / "vectors.npy", mode="w+", dtype=np.float16, shape=(n, vectors.shape[1]))
+    for start in range(0, n, chunk_size):
+        stored[start:start + chunk_size] = vectors[order[start:start + chunk_size]]
+    stored.flush()
+    del stored
+    np.save(tmp / "ids.npy", np.asarray(ids, dtype=np.uint8)[order])
+    info = {
+        "build_id": uuid.uuid4().hex[:12],
+        "model_version": model_version,
+        "count": n,
+        "dim": int(vectors.shape[1]),
+        "embedding_dim": int(components.shape[0]),
+        "lists": n_lists,
+        "last_id": last_id,
+        "built_at": datetime.utcnow().isoformat(),
+    }
+    (tmp / "index.json").write_text(json.dumps(info, indent=2))
+
+    # The old build's delta file goes with it. Its records up to last_id are in this build;
+    # the build job re-embeds the newer ones into the new delta file (catch_up)
+    old = directory.with_name(directory.name + ".old")
+    shutil.rmtree(old, ignore_errors=True)
+    if directory.exists():
+        directory.rename(old)
+    tmp.rename(directory)
+    shutil.rmtree(old, ignore_errors=True)
+    return info
+
+
+class SimilarityIndex:
+    """
+    Approximate nearest-neighbour search over past detection embeddings
+
+    The bulk of the vectors sits in an IVF index built offline by
+    jobs/build_similarity_index.py and memory-mapped read-only. Queries are
+    projected with the index's PCA, compared to the list centroids, and only
+    the `nprobe` closest lists are scanned.
+
+    Detections made after the build are appended to delta-<build_id>.bin
+    (fixed-size records of ObjectId + float16 vector, shared by all workers)
+    and scanned exhaustively until the next build folds them in. The file
+    is tied to the build because vectors are stored already projected with
+    that build's PCA, so a new build starts an empty one; detections newer
+    than the build's `last_id` are re-embedded into it by the build job.
+    """
+
+    def __init__(self, directory: Path, nprobe: int = SIMILARITY_NPROBE):
+        self.directory = Path(directory)
+        self.nprobe = nprobe
+        self.info = None
+        self.searches = 0
+        self.added = 0
+        self._delta = None
+        self._delta_size = -1
+        self._lock = threading.Lock()
+
+    @property
+    def ready(self) -> bool:
+        return self.info is not None
+
+    def load(self, model_version: Optional[str]) -> bool:
+        """Open the index if it exists and was built from the serving model's embeddings"""
+        info_path = self.directory / "index.json"
+        if not info_path.exists():
+            logger.info("Similarity index not built yet (%s)", self.directory)
+            return False
+        info = json.loads(info_path.read_text())
+        if info["model_version"] != model_version:
+            logger.warning("⚠ Similarity index was built for model %s, serving %s: rebuild it",
+                           info["model_version"], model_version)
+            return False
+
+        self.mean = np.load(self.directory / "mean.npy")
+        self.components = np.load(self.directory / "components.npy")
+        self.centroids = np.load(self.directory / "centroids.npy")
+        self.offsets = np.load(self.directory / "offsets.npy")
+        self.vectors = np.load(self.directory / "vectors.npy", mmap_mode="r")
+        self.ids = np.load(self.directory / "ids.npy", mmap_mode="r")
+        self.record = np.dtype([("id", "u1", (12,)), ("vector", "<f2", (info["dim"],))])
+        self.delta_path = self.directory / f"delta-{info['build_id']}.bin"
+        self._delta_size = -1
+        self.info = info
+        logger.info("✓ Similarity index loaded: %d vectors in %d lists", info["count"], info["lists"])
+        return True
+
+    def add(self, detection_id: str, embedding: np.ndarray):
+        """
+        Append one detection's embedding to the delta file
+
+        Blocking; meant to run in a background task. One write per record,
+        so concurrent appends from other workers do not interleave.
+        """
+        if not self.ready:
+            return
+        try:
+            self.add_batch([detection_id], np.atleast_2d(embedding))
+        except OSError as e:
+            logger.error("Failed to add %s to the similarity index: %s", detection_id, e)
+
+    def add_batch(self, detection_ids: list, embeddings: np.ndarray):
+        """Append several detections to the delta file in a single write"""
+        records = np.zeros(len(detection_ids), dtype=self.record)
+        records["id"] = [np.frombuffer(ObjectId(detection_id).binary, dtype=np.uint8)
+                         for detection_id in detection_ids]
+        records["vector"] = project(embeddings, self.mean, self.components)
+        fd = os.open(self.delta_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, records.tobytes())
+        finally:
+            os.close(fd)
+        self.added += len(records)
+
+    def _delta_records(self) -> np.ndarray:
+        """Records appended since the build, re-mapped when the file has grown"""
+        path = self.delta_path
+        size = path.stat().st_size if path.exists() else 0
+        with self._lock:
+            if size != self._delta_size:
+                count = size // self.record.itemsize
+                self._delta = (np.memmap(path, dtype=self.record, mode="r", shape=(count,))
+                               if count else np.zeros(0, dtype=self.record))
+                self._delta_size = size
+            return self._delta
+
+    def search(self, embedding: np.ndarray, k: int = 5, nprobe: int = None) -> list:
+        """
+        The k most similar past detections
+
+        Args:
+            embedding: Penultimate-layer embedding from DiseaseDetectionService
+            k: Number of neighbours
+            nprobe: Inverted lists to scan (default SIMILARITY_NPROBE)
+
+        Returns:
+            list: (detection id as hex string, cosine similarity) pairs, most similar first
+        """
+        if not self.ready:
+            raise RuntimeError("Similarity index is not loaded")
+        query = project(embedding, self.mean, self.components)[0]
+        nprobe = min(nprobe or self.nprobe, len(self.centroids))
+
+        lists = np.argpartition(-(self.centroids @ query), nprobe - 1)[:nprobe]
+        candidate_ids, candidate_scores = [], []
+        for i in lists:
+            start, end = self.offsets[i], self.offsets[i + 1]
+            if end > start:
+                candidate_scores.append(self.vectors[start:end].astype(np.float32) @ query)
+                candidate_ids.append(self.ids[start:end])
+
+        delta = self._delta_records()
+        if len(delta):
+            candidate_scores.append(delta["vector"].astype(np.float32) @ query)
+            candidate_ids.append(delta["id"])
+        self.searches += 1
+        if not candidate_scores:
+            return []
+
+        scores = np.concatenate(candidate_scores)
+        ids = np.concatenate(candidate_ids)
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        # float16 storage can push an exact match a hair above 1
+        return [(ids[i].tobytes().hex(), min(float(scores[i]), 1.0)) for i in top]
+
+    def metrics(self) -> dict:
+        delta = self._delta_records() if self.ready else ()
+        return {
+            "ready": self.ready,
+            "index": self.info,
+            "delta": len(delta),
+            "nprobe": self.nprobe,
+            "searches": self.searches,
+            "added": self.added,
+        }
+
+# Global instance
+similarity_index = SimilarityIndex(SIMILARITY_INDEX_DIR)
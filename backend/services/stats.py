@@ -0,0 +1,172 @@
+from datetime import datetime, timedelta
+import logging
+from pymongo import UpdateOne
+from utils.database import (
+    get_stats_collection,
+    get_crop_predictions_collection,
+    get_fertilizer_predictions_collection,
+    get_disease_detections_collection,
+)
+
+logger = logging.getLogger(__name__)
+
+KINDS = ["crop", "fertilizer", "disease"]
+GLOBAL_SCOPE = "global"
+
+
+def user_scope(user_id: str) -> str:
+    return f"user:{user_id}"
+
+
+def day_id(scope: str, day: str) -> str:
+    # Zero-padded ISO dates sort lexically, so a date range is an _id range
+    return f"{scope}:day:{day}"
+
+
+def counter_key(label: str) -> str:
+    """MongoDB field names cannot contain '.' or start with '$'"""
+    return label.replace(".", "_").replace("$", "_")
+
+
+def disease_label(plant: str, disease: str) -> str:
+    return f"{plant} - {disease}"
+
+
+class StatsService:
+    """
+    Pre-aggregated prediction counters
+
+    Every stored prediction increments four small documents in the
+    prediction_stats collection: the user's counters, the global counters and
+    the per-day bucket of each. Reading the stats for a scope is then one
+    find_one plus a range scan over at most `days` bucket documents, no
+    matter how much history the user has.
+
+        {_id: "user:<id>" | "global", totals: {crop, fertilizer, disease},
+         crop: {<name>: n}, fertilizer: {<name>: n}, disease: {<plant - disease>: n}, healthy: n}
+        {_id: "<scope>:day:YYYY-MM-DD", day, totals: {...}, crop: {...}, ...}
+    """
+
+    async def record(self, kind: str, user_id: str, label: str, created_at: datetime, healthy: bool = None):
+        """
+        Count one stored prediction
+
+        Failures are logged and swallowed: the prediction itself is already
+        saved, and rebuild() can restore exact counts from the raw history.
+        """
+        inc = {f"totals.{kind}": 1, f"{kind}.{counter_key(label)}": 1}
+        if healthy:
+            inc["healthy"] = 1
+        set_fields = {"updated_at": created_at}
+        day = created_at.strftime("%Y-%m-%d")
+
+        operations = []
+        for scope in (user_scope(user_id), GLOBAL_SCOPE):
+            operations.append(UpdateOne({"_id": scope}, {"$inc": inc, "$set": set_fields}, upsert=True))
+            operations.append(UpdateOne(
+                {"_id": day_id(scope, day)},
+                {"$inc": inc, "$set": set_fields, "$setOnInsert": {"day": day}},
+                upsert=True
+            ))
+        try:
+            await get_stats_collection().bulk_write(operations, ordered=False)
+        except Exception as e:
+            logger.error("Failed to update %s stats for user %s: %s", kind, user_id, e)
+
+    async def summary(self, scope: str) -> dict:
+        """The scope's counter document, empty if nothing was recorded yet"""
+        return await get_stats_collection().find_one({"_id": scope}) or {}
+
+    async def get(self, scope: str, days: int = 30, summary: dict = None) -> dict:
+        """
+        Counters and a zero-filled daily series for one scope
+
+        Args:
+            scope: user_scope(user_id) or GLOBAL_SCOPE
+            days: Number of days in the series, ending today (UTC)
+            summary: The scope's counter document, if the caller already read it
+        """
+        collection = get_stats_collection()
+        if summary is None:
+            summary = await self.summary(scope)
+
+        today = datetime.utcnow().date()
+        start = today - timedelta(days=days - 1)
+        buckets = await collection.find({
+            "_id": {"$gte": day_id(scope, start.isoformat()), "$lte": day_id(scope, today.isoformat())}
+        }).to_list(length=days)
+        by_day = {bucket["day"]: bucket.get("totals", {}) for bucket in buckets}
+
+        daily = []
+        for offset in range(days):
+            day = (start + timedelta(days=offset)).isoformat()
+            totals = by_day.get(day, {})
+            daily.append({"date": day, **{kind: totals.get(kind, 0) for kind in KINDS}})
+
+        totals = summary.get("totals", {})
+        return {
+            "totals": {kind: totals.get(kind, 0) for kind in KINDS},
+            "crops": summary.get("crop", {}),
+            "fertilizers": summary.get("fertilizer", {}),
+            "diseases": summary.get("disease", {}),
+            "healthy": summary.get("healthy", 0),
+            "daily": daily,
+            "updated_at": summary.get("updated_at"),
+        }
+
+    async def rebuild(self) -> dict:
+        """
+        Recompute every counter from the raw prediction collections
+
+        Replaces the whole prediction_stats collection; increments that land
+        while it runs may be lost, so run it when traffic is quiet.
+        """
+        sources = [
+            ("crop", get_crop_predictions_collection(), "$prediction.crop", None),
+            ("fertilizer", get_fertilizer_predictions_collection(), "$prediction.fertilizer", None),
+            ("disease", get_disease_detections_collection(),
+             {"$concat": ["$detection.plant", " - ", "$detection.disease"]}, "$detection.is_healthy"),
+        ]
+        documents = {}
+
+        def bump(doc_id: str, kind: str, label: str, count: int, healthy_count: int, day: str = None):
+            doc = documents.setdefault(doc_id, {"_id": doc_id, "totals": {}, "healthy": 0})
+            if day:
+                doc["day"] = day
+            doc["totals"][kind] = doc["totals"].get(kind, 0) + count
+            counters = doc.setdefault(kind, {})
+            counters[counter_key(label)] = counters.get(counter_key(label), 0) + count
+            doc["healthy"] += healthy_count
+
+        for kind, collection, label_expr, healthy_expr in sources:
+            pipeline = [{
+                "$group": {
+                    "_id": {
+                        "user_id": "$user_id",
+                        "label": label_expr,
+                        "day": {"$dateToString": {"format": "%Y-%m-%d", "date": "$created_at"}},
+                    },
+                    "count": {"$sum": 1},
+                    "healthy": {"$sum": {"$cond": [healthy_expr, 1, 0]}} if healthy_expr else {"$sum": 0},
+                }
+            }]
+            async for group in collection.aggregate(pipeline):
+                key, count, healthy = group["_id"], group["count"], group["healthy"]
+                label = key.get("label") or "Unknown"
+                for scope in (user_scope(key["user_id"]), GLOBAL_SCOPE):
+                    bump(scope, kind, label, count, healthy)
+                    bump(day_id(scope, key["day"]), kind, label, count, healthy, day=key["day"])
+
+        now = datetime.utcnow()
+        for doc in documents.values():
+            doc["updated_at"] = now
+
+        stats_collection = get_stats_collection()
+        await stats_collection.delete_many({})
+        if documents:
+            await stats_collection.insert_many(list(documents.values()), ordered=False)
+        logger.info("Rebuilt %d stats documents", len(documents))
+        return {"documents": len(documents)}
+
+# Global instance
+stats_service = StatsService()
@@ -0,0 +1,268 @@
+"""
+Streaming tf.data input pipeline for training and evaluating the disease model
+
+Reads a PlantVillage-style tree (one sub-folder per class, named as in
+PLANT_DISEASES) with parallel decoding, an optional on-disk cache of decoded
+images and prefetching, so retraining and offline evaluation keep every core
+busy instead of waiting on image_dataset_from_directory.
+
+Images come out exactly as the model saw them in training: 128x128 RGB,
+float32 in [0, 255], no normalization. Two decoders are available:
+
+    tf       native tf ops set up to reproduce the service's PIL path: JPEGs
+             decoded with the accurate DCT (as libjpeg does for PIL), bicubic
+             antialiased resize, rounded back to whole pixel values. Within
+             one grey level of the service; `compare` measures the gap on
+             your own images
+    service  DiseaseDetectionService.preprocess_image (PIL) run inside the
+             pipeline, bit-identical to what the API serves, but holds the GIL
+
+`train` writes to models/candidate_model.keras by default, so a run never
+replaces the served model; promote it with training/evaluate_disease.py.
+
+Usage (from backend/):
+    python training/disease_input.py train --train-dir DATA/train --valid-dir DATA/valid --epochs 3
+    python training/disease_input.py evaluate --data-dir DATA/valid
+    python training/disease_input.py throughput --data-dir DATA/train --cache ../.pipeline_cache/disease/train
+    python training/disease_input.py compare --data-dir DATA/valid --limit 200
+"""
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import numpy as np
+import tensorflow as tf
+
+from services.disease_detection import disease_service, PLANT_DISEASES
+
+AUTOTUNE = tf.data.AUTOTUNE
+IMAGE_SIZE = disease_service.image_size
+IMAGE_SUFFIXES = {".jpg", ".jpeg", ".png", ".bmp", ".gif"}
+MODELS_DIR = Path(__file__).resolve().parent.parent.parent / "models"
+
+
+def list_images(data_dir, class_names: list = PLANT_DISEASES) -> tuple:
+    """
+    File paths and integer labels for a class-per-folder directory
+
+    Labels follow class_names (the order the model was trained with), not
+    whatever folders happen to exist; unknown folders are rejected.
+    """
+    data_dir = Path(data_dir)
+    index = {name: i for i, name in enumerate(class_names)}
+    unknown = [d.name for d in data_dir.iterdir() if d.is_dir() and d.name not in index]
+    if unknown:
+        raise ValueError(f"Folders not in the class list: {', '.join(sorted(unknown))}")
+
+    paths, labels = [], []
+    for name in class_names:
+        class_dir = data_dir / name
+        if not class_dir.is_dir():
+            continue
+        for path in sorted(class_dir.iterdir()):
+            if path.suffix.lower() in IMAGE_SUFFIXES:
+                paths.append(str(path))
+                labels.append(index[name])
+    return paths, np.asarray(labels, dtype=np.int32)
+
+
+def _tf_decode(path):
+    data = tf.io.read_file(path)
+    # decode_image uses the fast integer DCT for JPEGs, which is off by about
+    # one grey level from the libjpeg default PIL uses
+    image = tf.cond(
+        tf.io.is_jpeg(data),
+        lambda: tf.io.decode_jpeg(data, channels=3, dct_method="INTEGER_ACCURATE"),
+        lambda: tf.io.decode_image(data, channels=3, expand_animations=False),
+    )
+    # PIL's Image.resize default: bicubic, filter widened when downscaling
+    image = tf.image.resize(image, IMAGE_SIZE, method="bicubic", antialias=True)
+    image = tf.clip_by_value(tf.round(image), 0, 255)
+    image.set_shape((*IMAGE_SIZE, 3))
+    return image
+
+
+def _service_decode(path):
+    def load(p):
+        with open(p.decode(), "rb") as f:
+            return disease_service.preprocess_image(f.read())
+
+    image = tf.numpy_function(load, [path], tf.float32, stateful=False)
+    image.set_shape((*IMAGE_SIZE, 3))
+    return image
+
+
+DECODERS = {"tf": _tf_decode, "service": _service_decode}
+
+
+def make_dataset(data_dir, batch_size: int = 32, shuffle: bool = False, cache: str = None,
+                 decoder: str = "tf", label_mode: str = "categorical", shuffle_buffer: int = 2048,
+                 seed: int = None) -> tf.data.Dataset:
+    """
+    Build a batched (images, labels) dataset
+
+    Args:
+        data_dir: Class-per-folder image directory
+        batch_size: Images per batch
+        shuffle: Shuffle (after the cache, so each epoch gets a new order)
+        cache: None, "memory", or a file prefix for an on-disk cache of decoded
+               images. A file cache becomes valid after one full pass.
+        decoder: "tf" or "service" (see module docstring)
+        label_mode: "categorical" (one-hot, as in the notebook) or "int"
+        shuffle_buffer: Decoded images held for shuffling
+        seed: Shuffle seed
+
+    Returns:
+        tf.data.Dataset yielding (float32 [B,128,128,3], labels)
+    """
+    paths, labels = list_images(data_dir)
+    if not paths:
+        raise ValueError(f"No images found under {data_dir}")
+
+    ds = tf.data.Dataset.from_tensor_slices((paths, labels))
+    decode = DECODERS[decoder]
+    depth = len(PLANT_DISEASES)
+
+    def load(path, label):
+        if label_mode == "categorical":
+            label = tf.one_hot(label, depth)
+        return decode(path), label
+
+    ds = ds.map(load, num_parallel_calls=AUTOTUNE, deterministic=not shuffle)
+    if cache == "memory":
+        ds = ds.cache()
+    elif cache:
+        Path(cache).parent.mkdir(parents=True, exist_ok=True)
+        ds = ds.cache(str(cache))
+    if shuffle:
+        ds = ds.shuffle(shuffle_buffer, seed=seed, reshuffle_each_iteration=True)
+    return ds.batch(batch_size).prefetch(AUTOTUNE)
+
+
+def configure_runtime(mixed_precision: str = "off", intra_op_threads: int = 0, inter_op_threads: int = 0):
+    """Set precision policy and TF thread pools (0 lets TF use all cores)"""
+    if intra_op_threads:
+        tf.config.threading.set_intra_op_parallelism_threads(intra_op_threads)
+    if inter_op_threads:
+        tf.config.threading.set_inter_op_parallelism_threads(inter_op_threads)
+    if mixed_precision != "off":
+        # bfloat16 is the useful choice on recent CPUs, float16 on GPUs
+        tf.keras.mixed_precision.set_global_policy(f"mixed_{mixed_precision}")
+
+
+def build_model() -> tf.keras.Model:
+    """The CNN from notebooks/Train_plant_disease.ipynb"""
+    layers = tf.keras.layers
+    model = tf.keras.Sequential([layers.Input(shape=(*IMAGE_SIZE, 3))])
+    for filters in (32, 64, 128, 256, 512):
+        model.add(layers.Conv2D(filters, 3, padding="same", activation="relu"))
+        model.add(layers.Conv2D(filters, 3, activation="relu"))
+        model.add(layers.MaxPool2D(pool_size=2, strides=2))
+    model.add(layers.Dropout(0.25))
+    model.add(layers.Flatten())
+    model.add(layers.Dense(1500, activation="relu"))
+    model.add(layers.Dropout(0.4))
+    # Keep the softmax in float32 under mixed precision
+    model.add(layers.Dense(len(PLANT_DISEASES), activation="softmax", dtype="float32"))
+    model.compile(
+        optimizer=tf.keras.optimizers.Adam(learning_rate=0.0001),
+        loss="categorical_crossentropy",
+        metrics=["accuracy"],
+    )
+    return model
+
+
+def cmd_train(args):
+    train_ds = make_dataset(args.train_dir, args.batch_size, shuffle=True, cache=args.cache,
+                            decoder=args.decoder, seed=args.seed)
+    valid_ds = make_dataset(args.valid_dir, args.batch_size,
+                            cache=f"{args.cache}-valid" if args.cache and args.cache != "memory" else args.cache,
+                            decoder=args.decoder)
+    model = build_model()
+    history = model.fit(train_ds, validation_data=valid_ds, epochs=args.epochs)
+    model.save(args.output)
+    history_path = Path(args.output).with_name(f"{Path(args.output).stem}_hist.json")
+    history_path.write_text(json.dumps(history.history))
+    print(f"Model saved to {args.output}, history to {history_path}")
+
+
+def cmd_evaluate(args):
+    model = tf.keras.models.load_model(args.model)
+    ds = make_dataset(args.data_dir, args.batch_size, cache=args.cache, decoder=args.decoder)
+    started = time.perf_counter()
+    loss, accuracy = model.evaluate(ds)
+    elapsed = time.perf_counter() - started
+    images = len(list_images(args.data_dir)[0])
+    print(f"loss {loss:.4f}, accuracy {accuracy:.4f}, {images / elapsed:.1f} images/sec")
+
+
+def cmd_throughput(args):
+    """Iterate the input pipeline alone to see whether it can outrun the model"""
+    ds = make_dataset(args.data_dir, args.batch_size, cache=args.cache, decoder=args.decoder)
+    for epoch in range(args.epochs):
+        count, started = 0, time.perf_counter()
+        for images, _ in ds:
+            count += int(images.shape[0])
+        elapsed = time.perf_counter() - started
+        print(f"pass {epoch + 1}: {count} images in {elapsed:.2f}s ({count / elapsed:.1f} images/sec)")
+
+
+def cmd_compare(args):
+    """Per-pixel difference between the tf and service decoders"""
+    paths, _ = list_images(args.data_dir)
+    if not paths:
+        raise ValueError(f"No images found under {args.data_dir}")
+    diffs = []
+    for path in paths[:args.limit]:
+        native = _tf_decode(tf.constant(path)).numpy()
+        with open(path, "rb") as f:
+            reference = disease_service.preprocess_image(f.read())
+        diffs.append(np.abs(native - reference))
+    diffs = np.stack(diffs)
+    print(f"{len(diffs)} images: mean abs diff {diffs.mean():.3f}, max {diffs.max():.0f}, "
+          f"pixels off by more than 1: {(diffs > 1).mean():.4%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="tf.data input pipeline for the disease model")
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--batch-size", type=int, default=32)
+    common.add_argument("--cache", help='"memory" or a file prefix for caching decoded images')
+    common.add_argument("--decoder", choices=list(DECODERS), default="tf")
+    common.add_argument("--mixed-precision", choices=["off", "float16", "bfloat16"], default="off")
+    common.add_argument("--intra-op-threads", type=int, default=0)
+    common.add_argument("--inter-op-threads", type=int, default=0)
+
+    sub = parser.add_subparsers(dest="command", required=True)
+    train = sub.add_parser("train", parents=[common])
+    train.add_argument("--train-dir", required=True)
+    train.add_argument("--valid-dir", required=True)
+    train.add_argument("--epochs", type=int, default=3)
+    train.add_argument("--seed", type=int, default=None)
+    train.add_argument("--output", default=str(MODELS_DIR / "candidate_model.keras"),
+                       help="Where to save the model (the served model is trained_model.keras)")
+
+    evaluate = sub.add_parser("evaluate", parents=[common])
+    evaluate.add_argument("--data-dir", required=True)
+    evaluate.add_argument("--model", default=str(MODELS_DIR / "trained_model.keras"))
+
+    throughput = sub.add_parser("throughput", parents=[common])
+    throughput.add_argument("--data-dir", required=True)
+    throughput.add_argument("--epochs", type=int, default=2, help="Passes (the second reads from the cache)")
+
+    compare = sub.add_parser("compare", parents=[common])
+    compare.add_argument("--data-dir", required=True)
+    compare.add_argument("--limit", type=int, default=200, help="Images to compare")
+
+    args = parser.parse_args()
+    configure_runtime(args.mixed_precision, args.intra_op_threads, args.inter_op_threads)
+    {"train": cmd_train, "evaluate": cmd_evaluate, "throughput": cmd_throughput,
+     "compare": cmd_compare}[args.command](args)
+
+
+if __name__ == "__main__":
+    main()
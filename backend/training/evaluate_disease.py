@@ -0,0 +1,231 @@
+"""
+Offline evaluation of a disease model over a labelled image directory
+
+Walks a PlantVillage-style tree (one sub-folder per class, named as in
+PLANT_DISEASES), decodes images in a thread pool with the service's own
+preprocessing, and scores them in batches through
+DiseaseDetectionService.predict_scores. Files are streamed and only a few
+batches are in flight at any time, so memory stays flat however large the
+tree is.
+
+The report (accuracy, per-class precision/recall, the confusion matrix and
+images/sec) is written as JSON. With --baseline the run becomes a regression
+gate: it exits 1 when accuracy drops more than --max-drop below an earlier
+report, which is the check to pass before promoting a new trained_model.keras.
+
+Usage (from backend/):
+    python training/evaluate_disease.py --data-dir DATA/valid
+    python training/evaluate_disease.py --data-dir DATA/valid --model /tmp/candidate.keras \\
+        --baseline ../models/trained_model.evaluation.json --max-drop 0.005
+"""
+import argparse
+import csv
+import hashlib
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from itertools import islice
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import numpy as np
+
+from services.disease_detection import DiseaseDetectionService, TTA_VIEWS
+
+IMAGE_SUFFIXES = {".jpg", ".jpeg", ".png", ".bmp", ".gif"}
+
+
+def iter_labelled_files(data_dir: Path, classes: list):
+    """Yield (path, class_index) lazily; folders not in classes are skipped with a warning"""
+    index = {name: i for i, name in enumerate(classes)}
+    for entry in sorted(os.scandir(data_dir), key=lambda e: e.name):
+        if not entry.is_dir():
+            continue
+        if entry.name not in index:
+            print(f"Skipping unknown class folder: {entry.name}", file=sys.stderr)
+            continue
+        for image in os.scandir(entry.path):
+            if image.is_file() and Path(image.name).suffix.lower() in IMAGE_SUFFIXES:
+                yield image.path, index[entry.name]
+
+
+def decoded_batches(files, decode, batch_size: int, workers: int, prefetch: int = 2):
+    """
+    Decode files in a thread pool, yielding (images, labels, paths, failures) per batch
+
+    At most prefetch + 1 batches are decoded or waiting at a time, so the
+    next batches decode while the model scores the current one.
+    """
+    def load(path):
+        with open(path, "rb") as f:
+            return decode(f.read())
+
+    def collect(chunk, futures):
+        images, labels, paths, failures = [], [], [], []
+        for (path, label), future in zip(chunk, futures):
+            try:
+                images.append(future.result())
+                labels.append(label)
+                paths.append(path)
+            except Exception as e:
+                failures.append((path, str(e)))
+        return images, np.asarray(labels, dtype=np.int64), paths, failures
+
+    files = iter(files)
+    pending = deque()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for chunk in iter(lambda: list(islice(files, batch_size)), []):
+            pending.append((chunk, [pool.submit(load, path) for path, _ in chunk]))
+            if len(pending) > prefetch:
+                yield collect(*pending.popleft())
+        while pending:
+            yield collect(*pending.popleft())
+
+
+def model_digest(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def per_class_metrics(confusion: np.ndarray, classes: list) -> dict:
+    support = confusion.sum(axis=1)
+    predicted = confusion.sum(axis=0)
+    correct = np.diag(confusion)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        recall = np.where(support > 0, correct / support, np.nan)
+        precision = np.where(predicted > 0, correct / predicted, np.nan)
+    return {
+        name: {
+            "support": int(support[i]),
+            "precision": None if np.isnan(precision[i]) else float(precision[i]),
+            "recall": None if np.isnan(recall[i]) else float(recall[i]),
+        }
+        for i, name in enumerate(classes)
+    }
+
+
+def evaluate(service: DiseaseDetectionService, data_dir: Path, batch_size: int, workers: int,
+             tta: bool = False, mistakes_writer=None) -> dict:
+    """Score every image under data_dir and return the report dict"""
+    classes = service.classes
+    confusion = np.zeros((len(classes), len(classes)), dtype=np.int64)
+    decode = service.tta_views if tta else service.preprocess_image
+    views = len(TTA_VIEWS) if tta else 1
+    failures = []
+
+    started = time.perf_counter()
+    batches = decoded_batches(iter_labelled_files(data_dir, classes), decode, batch_size, workers)
+    for images, labels, paths, failed in batches:
+        failures.extend(failed)
+        if not images:
+            continue
+        array = np.concatenate(images) if tta else np.stack(images)
+        predicted = service.predict_scores(array, views=views).argmax(axis=1)
+        np.add.at(confusion, (labels, predicted), 1)
+        if mistakes_writer is not None:
+            for path, label, guess in zip(paths, labels, predicted):
+                if label != guess:
+                    mistakes_writer.writerow([path, classes[label], classes[guess]])
+        done = int(confusion.sum())
+        print(f"\r{done} images, {done / (time.perf_counter() - started):.1f} images/sec", end="", file=sys.stderr)
+    elapsed = time.perf_counter() - started
+    print(file=sys.stderr)
+
+    total = int(confusion.sum())
+    return {
+        "created_at": datetime.utcnow().isoformat(),
+        "data_dir": str(data_dir),
+        "model": {"path": str(service.model_path), "sha256": model_digest(service.model_path)},
+        "tta": tta,
+        "images": total,
+        "failed": len(failures),
+        "failed_examples": [{"path": p, "error": e} for p, e in failures[:20]],
+        "accuracy": float(np.trace(confusion) / total) if total else 0.0,
+        "elapsed_s": elapsed,
+        "images_per_sec": total / elapsed if elapsed > 0 else 0.0,
+        "classes": classes,
+        "per_class": per_class_metrics(confusion, classes),
+        "confusion_matrix": confusion.tolist(),
+    }
+
+
+def print_report(report: dict, worst: int = 10):
+    print(f"Accuracy {report['accuracy']:.4%} on {report['images']} images "
+          f"({report['failed']} unreadable), {report['images_per_sec']:.1f} images/sec")
+    scored = [(m["recall"], name, m) for name, m in report["per_class"].items() if m["recall"] is not None]
+    print(f"\n{'lowest recall':<55} {'recall':>8} {'precision':>10} {'support':>8}")
+    for recall, name, m in sorted(scored)[:worst]:
+        precision = f"{m['precision']:.4f}" if m["precision"] is not None else "-"
+        print(f"{name:<55} {recall:>8.4f} {precision:>10} {m['support']:>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate a disease model over a labelled image directory")
+    parser.add_argument("--data-dir", type=Path, required=True, help="PlantVillage-style directory")
+    parser.add_argument("--model", type=Path, help="Model to evaluate (default: the service's trained_model.keras)")
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="Decoding threads")
+    parser.add_argument("--tta", action="store_true", help="Score with test-time augmentation")
+    parser.add_argument("--output", type=Path, help="Report file (default: <model>.evaluation.json)")
+    parser.add_argument("--confusion-csv", type=Path, help="Also write the confusion matrix as CSV")
+    parser.add_argument("--mistakes", type=Path, help="Write misclassified files as CSV (path, true, predicted)")
+    parser.add_argument("--baseline", type=Path, help="Earlier report to compare against")
+    parser.add_argument("--max-drop", type=float, default=0.005, help="Allowed accuracy drop vs --baseline")
+    parser.add_argument("--min-accuracy", type=float, help="Fail below this accuracy")
+    args = parser.parse_args()
+
+    service = DiseaseDetectionService()
+    if args.model:
+        service.model_path = args.model
+    if not service.load_model():
+        sys.exit(f"Could not load model from {service.model_path}")
+
+    mistakes_file = open(args.mistakes, "w", newline="") if args.mistakes else None
+    try:
+        writer = csv.writer(mistakes_file) if mistakes_file else None
+        if writer:
+            writer.writerow(["path", "true_class", "predicted_class"])
+        report = evaluate(service, args.data_dir, args.batch_size, args.workers, args.tta, writer)
+    finally:
+        if mistakes_file:
+            mistakes_file.close()
+
+    if report["images"] == 0:
+        sys.exit(f"No images found under {args.data_dir}")
+
+    output = args.output or service.model_path.with_name(f"{service.model_path.stem}.evaluation.json")
+    output.write_text(json.dumps(report, indent=2))
+    if args.confusion_csv:
+        with open(args.confusion_csv, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["true \\ predicted", *report["classes"]])
+            for name, row in zip(report["classes"], report["confusion_matrix"]):
+                writer.writerow([name, *row])
+
+    print_report(report)
+    print(f"\nReport written to {output}")
+
+    failed = False
+    if args.min_accuracy is not None and report["accuracy"] < args.min_accuracy:
+        print(f"FAIL: accuracy {report['accuracy']:.4%} is below {args.min_accuracy:.4%}")
+        failed = True
+    if args.baseline:
+        baseline = json.loads(args.baseline.read_text())
+        drop = baseline["accuracy"] - report["accuracy"]
+        print(f"Baseline accuracy {baseline['accuracy']:.4%} ({-drop:+.4%})")
+        if drop > args.max_drop:
+            print(f"FAIL: accuracy dropped by {drop:.4%} (allowed {args.max_drop:.4%})")
+            failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,267 @@
+"""
+Cached crop training pipeline
+
+Rebuilds Data-processed/ and models/*.pkl from Data-raw/ without the
+notebooks. Stages run in order raw -> processed -> columnar -> features ->
+models; each stage is keyed by a SHA-256 over the stage code
+(training/stages.py), its parameters and its input file contents, and is
+skipped when the key and its output files are unchanged since the last run.
+Independent classifiers train in parallel worker processes. The run ends by
+writing models/manifest.json, which MLModelService reads to pick the
+serving model and its label order.
+
+Usage (from backend/):
+    python training/pipeline.py                  # full rebuild, cached
+    python training/pipeline.py --from features  # keep the committed crop_recommendation.csv
+    python training/pipeline.py --models XGBoost RandomForest --jobs 2
+    python training/pipeline.py --force          # ignore the cache
+"""
+import argparse
+import hashlib
+import json
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from functools import partial
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from training import stages
+from utils.columnar import columnar_dir
+from utils.cpu_budget import apply_thread_budget, available_cpus
+
+REPO_DIR = Path(__file__).resolve().parent.parent.parent
+RAW_DIR = REPO_DIR / "Data-raw"
+PROCESSED_DIR = REPO_DIR / "Data-processed"
+MODELS_DIR = REPO_DIR / "models"
+CACHE_DIR = REPO_DIR / ".pipeline_cache"
+MANIFEST_PATH = MODELS_DIR / "manifest.json"
+SERVING_MODEL = "XGBoost"
+
+
+def file_digest(path: Path) -> str:
+    """SHA-256 of a file's contents"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+# Editing any stage function invalidates every cached stage
+STAGES_CODE_DIGEST = file_digest(Path(stages.__file__))
+
+
+class Stage:
+    """One cacheable step: a callable plus the files it reads and writes"""
+
+    def __init__(self, name: str, func, inputs: list, outputs: list, params: dict = None):
+        self.name = name
+        self.func = func
+        self.inputs = [Path(p) for p in inputs]
+        self.outputs = [Path(p) for p in outputs]
+        self.params = params or {}
+
+    def key(self) -> str:
+        digest = hashlib.sha256()
+        digest.update(self.name.encode())
+        digest.update(STAGES_CODE_DIGEST.encode())
+        digest.update(json.dumps(self.params, sort_keys=True).encode())
+        for path in self.inputs:
+            digest.update(file_digest(path).encode())
+        return digest.hexdigest()
+
+    def run(self) -> dict:
+        return self.func(*self.inputs, *self.outputs, self.params)
+
+
+class StageCache:
+    """Remembers the key, output digests and result of every stage's last run"""
+
+    def __init__(self, cache_dir: Path):
+        self.cache_dir = cache_dir
+        self.state_path = cache_dir / "state.json"
+        self.state = json.loads(self.state_path.read_text()) if self.state_path.exists() else {}
+
+    def lookup(self, stage: Stage, key: str):
+        """Return the cached result if the stage is fresh, else None"""
+        record = self.state.get(stage.name)
+        if record is None or record["key"] != key:
+            return None
+        for path in stage.outputs:
+            if not path.exists() or file_digest(path) != record["outputs"].get(str(path)):
+                return None
+        return record["result"]
+
+    def store(self, stage: Stage, key: str, result: dict):
+        self.state[stage.name] = {
+            "key": key,
+            "outputs": {str(path): file_digest(path) for path in stage.outputs},
+            "result": result,
+            "updated_at": datetime.utcnow().isoformat(),
+        }
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.state_path.write_text(json.dumps(self.state, indent=2))
+
+
+def _run_stage(stage: Stage) -> dict:
+    """Top-level so it can be shipped to worker processes"""
+    return stage.run()
+
+
+class Pipeline:
+    def __init__(self, cache: StageCache, force: bool = False, jobs: int = None):
+        self.cache = cache
+        self.force = force
+        self.jobs = jobs or len(available_cpus())
+        self.results = {}
+
+    def _fresh(self, stage: Stage, key: str):
+        return None if self.force else self.cache.lookup(stage, key)
+
+    def run(self, stage: Stage) -> dict:
+        key = stage.key()
+        result = self._fresh(stage, key)
+        if result is not None:
+            print(f"[cached] {stage.name}")
+        else:
+            started = time.perf_counter()
+            result = stage.run()
+            self.cache.store(stage, key, result)
+            print(f"[built]  {stage.name} ({time.perf_counter() - started:.1f}s)")
+        self.results[stage.name] = {"key": key, **result}
+        return result
+
+    def run_parallel(self, stage_list: list) -> dict:
+        """Run independent stages across worker processes, skipping fresh ones"""
+        pending = []
+        for stage in stage_list:
+            key = stage.key()
+            result = self._fresh(stage, key)
+            if result is not None:
+                print(f"[cached] {stage.name}")
+                self.results[stage.name] = {"key": key, **result}
+            else:
+                pending.append((stage, key))
+
+        if pending:
+            started = time.perf_counter()
+            workers = min(self.jobs, len(pending))
+            # Split the cores between the workers instead of letting each model's pool take them all
+            threads = max(1, len(available_cpus()) // workers)
+            with ProcessPoolExecutor(max_workers=workers, initializer=apply_thread_budget,
+                                     initargs=(threads,)) as pool:
+                futures = [(stage, key, pool.submit(_run_stage, stage)) for stage, key in pending]
+                for stage, key, future in futures:
+                    result = future.result()
+                    self.cache.store(stage, key, result)
+                    self.results[stage.name] = {"key": key, **result}
+                    print(f"[built]  {stage.name} (accuracy {result['accuracy']:.4f})")
+            print(f"Trained {len(pending)} model(s) in {time.perf_counter() - started:.1f}s "
+                  f"({workers} processes x {threads} threads)")
+        return self.results
+
+
+def build_stages(seed: int, test_size: float, split_seed: int) -> dict:
+    crop_processed = PROCESSED_DIR / "MergeFileCrop.csv"
+    fertilizer_processed = PROCESSED_DIR / "FertilizerData.csv"
+    dataset = PROCESSED_DIR / "crop_recommendation.csv"
+    features = CACHE_DIR / "features.npz"
+
+    return {
+        "raw": Stage(
+            "prepare_raw", stages.prepare_raw,
+            inputs=[RAW_DIR / "cpdata.csv", RAW_DIR / "Fertilizer.csv"],
+            outputs=[crop_processed, fertilizer_processed],
+        ),
+        "processed": Stage(
+            "recommendation_data", stages.build_recommendation_data,
+            inputs=[crop_processed, fertilizer_processed],
+            outputs=[dataset],
+            params={"seed": seed},
+        ),
+        "columnar": Stage(
+            "columnar", stages.write_columnar,
+            inputs=[crop_processed, fertilizer_processed, dataset],
+            outputs=[columnar_dir(p) / "schema.json" for p in (crop_processed, fertilizer_processed, dataset)],
+        ),
+        "features": Stage(
+            "features", stages.build_features,
+            inputs=[dataset],
+            outputs=[features],
+            params={"test_size": test_size, "split_seed": split_seed},
+        ),
+        "models": [
+            Stage(
+                f"model:{name}", partial(stages.train_model, name),
+                inputs=[features],
+                outputs=[MODELS_DIR / f"{name}.pkl"],
+                params={"spec": stages.MODEL_SPECS[name]},
+            )
+            for name in stages.MODEL_SPECS
+        ],
+    }
+
+
+def build_manifest(results: dict, labels: list) -> dict:
+    models = {}
+    for name, spec in stages.MODEL_SPECS.items():
+        result = results.get(f"model:{name}")
+        if result is None:
+            continue
+        path = MODELS_DIR / f"{name}.pkl"
+        models[name] = {
+            "path": path.name,
+            "sha256": file_digest(path),
+            "accuracy": result["accuracy"],
+            "cache_key": result["key"],
+        }
+    return {
+        "created_at": datetime.utcnow().isoformat(),
+        "serving_model": SERVING_MODEL if SERVING_MODEL in models else next(iter(models), None),
+        "features": stages.FEATURE_COLUMNS,
+        "labels": labels,
+        "data": {
+            "crop_recommendation.csv": file_digest(PROCESSED_DIR / "crop_recommendation.csv"),
+        },
+        "models": models,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cached crop recommendation training pipeline")
+    parser.add_argument("--from", dest="start", choices=["raw", "processed", "columnar", "features"], default="raw",
+                        help="First stage to consider (earlier outputs are used as-is)")
+    parser.add_argument("--models", nargs="+", choices=list(stages.MODEL_SPECS), help="Train only these models")
+    parser.add_argument("--jobs", type=int, default=None, help="Parallel training processes (default: all cores)")
+    parser.add_argument("--seed", type=int, default=42, help="Seed for the synthetic NPK jitter")
+    parser.add_argument("--test-size", type=float, default=0.2)
+    parser.add_argument("--split-seed", type=int, default=2)
+    parser.add_argument("--force", action="store_true", help="Rebuild every stage")
+    args = parser.parse_args()
+
+    stage_map = build_stages(args.seed, args.test_size, args.split_seed)
+    pipeline = Pipeline(StageCache(CACHE_DIR), force=args.force, jobs=args.jobs)
+
+    order = ["raw", "processed", "columnar", "features"]
+    for name in order[order.index(args.start):]:
+        pipeline.run(stage_map[name])
+
+    model_stages = [s for s in stage_map["models"] if not args.models or s.name.split(":", 1)[1] in args.models]
+    pipeline.run_parallel(model_stages)
+
+    # Keep entries for models that were not retrained this run
+    for stage in stage_map["models"]:
+        record = pipeline.cache.state.get(stage.name)
+        if stage.name not in pipeline.results and record and stage.outputs[0].exists():
+            pipeline.results[stage.name] = {"key": record["key"], **record["result"]}
+
+    manifest = build_manifest(pipeline.results, pipeline.results["features"]["labels"])
+    stages.write_manifest(MANIFEST_PATH, manifest)
+    print(f"\nManifest written to {MANIFEST_PATH} (serving model: {manifest['serving_model']})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""
+Stage functions for the crop training pipeline
+
+Scripted versions of notebooks/Crop_data_prep.ipynb,
+notebooks/Final_recommendationdata_creation.ipynb and
+notebooks/Crop_Recommendation_Model.ipynb. Every function reads its inputs
+from disk and writes its outputs to disk so the pipeline can cache it.
+"""
+import json
+import pickle
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from utils.columnar import load_table, write_table
+from utils.cpu_budget import limit_model_threads
+
+FEATURE_COLUMNS = ["N", "P", "K", "temperature", "humidity", "ph", "rainfall"]
+
+# Fertilizer table crop names that differ from the crop dataset labels
+FERTILIZER_NAME_FIXES = {
+    "mungbeans": "mungbean",
+    "lentils(masoordal)": "lentil",
+    "pigeonpeas(toordal)": "pigeonpeas",
+    "mothbean(matki)": "mothbeans",
+    "chickpeas(channa)": "chickpea",
+}
+
+# Per-crop NPK jitter ranges (inclusive) used to synthesize soil readings
+NPK_JITTER = {"N": (-20, 20), "P": (-5, 20), "K": (-5, 5)}
+
+# Classifier specs: name -> (estimator factory name, constructor params)
+MODEL_SPECS = {
+    "DecisionTree": ("decision_tree", {"criterion": "entropy", "random_state": 2, "max_depth": 5}),
+    "NBClassifier": ("naive_bayes", {}),
+    "SVMClassifier": ("svm", {"kernel": "poly", "degree": 3, "C": 1}),
+    "LogisticRegression": ("logistic_regression", {"random_state": 2, "max_iter": 1000}),
+    "RandomForest": ("random_forest", {"n_estimators": 20, "random_state": 0}),
+    "XGBoost": ("xgboost", {}),
+}
+
+
+def normalize_crop_name(name: str) -> str:
+    """Lower-case and strip spaces, as the notebooks' change_case did"""
+    return name.replace(" ", "").lower()
+
+
+def prepare_raw(crop_raw: Path, fertilizer_raw: Path, crop_out: Path, fertilizer_out: Path, params: dict) -> dict:
+    """raw -> processed: keep crops present in both datasets, one fertilizer row per crop"""
+    crop = pd.read_csv(crop_raw)
+    fert = pd.read_csv(fertilizer_raw).drop(columns=["Unnamed: 0"], errors="ignore")
+
+    crop["label"] = crop["label"].map(normalize_crop_name)
+    fert["Crop"] = fert["Crop"].map(normalize_crop_name).replace(FERTILIZER_NAME_FIXES)
+
+    shared = [name for name in fert["Crop"].unique() if name in set(crop["label"])]
+    new_crop = pd.concat([crop[crop["label"] == name] for name in shared])
+    first_rows = fert.drop_duplicates("Crop")
+    new_fert = pd.concat([first_rows[first_rows["Crop"] == name] for name in shared])
+
+    new_crop.to_csv(crop_out)
+    new_fert.to_csv(fertilizer_out)
+    return {"crops": len(shared), "rows": len(new_crop)}
+
+
+def build_recommendation_data(crop_processed: Path, fertilizer_processed: Path, output: Path, params: dict) -> dict:
+    """processed -> crop_recommendation.csv: attach jittered per-crop NPK targets to each climate row"""
+    merge_crop = pd.read_csv(crop_processed).drop(columns=["Unnamed: 0"], errors="ignore")
+    fert = pd.read_csv(fertilizer_processed).drop(columns=["Unnamed: 0"], errors="ignore").set_index("Crop")
+
+    rng = np.random.default_rng(params["seed"])
+    targets = fert.loc[merge_crop["label"], ["N", "P", "K"]].to_numpy()
+    for column_index, column in enumerate(["N", "P", "K"]):
+        low, high = NPK_JITTER[column]
+        merge_crop[column] = targets[:, column_index] + rng.integers(low, high + 1, size=len(merge_crop))
+
+    merge_crop[FEATURE_COLUMNS + ["label"]].to_csv(output, index=False)
+    return {"rows": len(merge_crop)}
+
+
+def write_columnar(crop_processed: Path, fertilizer_processed: Path, dataset: Path,
+                   crop_schema: Path, fertilizer_schema: Path, dataset_schema: Path, params: dict) -> dict:
+    """processed CSVs -> typed columnar copies that training and benchmarks memory-map"""
+    return {"tables": [str(write_table(path)) for path in (crop_processed, fertilizer_processed, dataset)]}
+
+
+def build_features(dataset: Path, output: Path, params: dict) -> dict:
+    """crop_recommendation.csv -> label-encoded train/test split saved as .npz"""
+    from sklearn.model_selection import train_test_split
+
+    # Memory-mapped columnar copy when available; string categories are already sorted codes
+    table = load_table(dataset)
+    labels = np.array(table.categories("label"))
+    y = table.codes("label")
+    X = table.matrix(FEATURE_COLUMNS)
+    X_train, X_test, y_train, y_test = train_test_split(
+        X, y, test_size=params["test_size"], random_state=params["split_seed"]
+    )
+    np.savez(output, X_train=X_train, X_test=X_test, y_train=y_train, y_test=y_test, labels=labels)
+    return {"train_rows": len(X_train), "test_rows": len(X_test), "labels": labels.tolist()}
+
+
+def build_estimator(kind: str, params: dict):
+    """Instantiate an unfitted classifier for a MODEL_SPECS entry"""
+    if kind == "decision_tree":
+        from sklearn.tree import DecisionTreeClassifier
+        return DecisionTreeClassifier(**params)
+    if kind == "naive_bayes":
+        from sklearn.naive_bayes import GaussianNB
+        return GaussianNB(**params)
+    if kind == "svm":
+        # The notebook scales with MinMaxScaler before fitting; keep the scaler with the model
+        from sklearn.pipeline import make_pipeline
+        from sklearn.preprocessing import MinMaxScaler
+        from sklearn.svm import SVC
+        return make_pipeline(MinMaxScaler(), SVC(**params))
+    if kind == "logistic_regression":
+        from sklearn.linear_model import LogisticRegression
+        return LogisticRegression(**params)
+    if kind == "random_forest":
+        from sklearn.ensemble import RandomForestClassifier
+        return RandomForestClassifier(**params)
+    if kind == "xgboost":
+        import xgboost as xgb
+        return xgb.XGBClassifier(**params)
+    raise ValueError(f"Unknown estimator kind: {kind}")
+
+
+def train_model(name: str, features: Path, output: Path, params: dict) -> dict:
+    """features -> models/<name>.pkl; runs in a worker process with its thread budget applied"""
+    data = np.load(features)
+    kind, estimator_params = MODEL_SPECS[name]
+    # n_jobs only sets the thread count, so it stays out of MODEL_SPECS and the cache key
+    model = limit_model_threads(build_estimator(kind, estimator_params))
+    model.fit(data["X_train"], data["y_train"])
+    accuracy = float(np.mean(model.predict(data["X_test"]) == data["y_test"]))
+
+    with open(output, "wb") as f:
+        pickle.dump(model, f)
+    return {"accuracy": accuracy}
+
+
+def write_manifest(path: Path, manifest: dict):
+    path.write_text(json.dumps(manifest, indent=2))
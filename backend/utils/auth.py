@@ -65,3 +65,13 @@ async def get_current_user(token: str = Depends(oauth2_scheme)):
     user["id"] = str(user["_id"])
     
     return user
+
+async def get_current_admin(current_user: dict = Depends(get_current_user)):
+    """Require the current user to be flagged as an administrator"""
+    if not current_user.get("is_admin"):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Administrator privileges required"
+        )
+    
+    return current_user
@@ -0,0 +1,224 @@
+"""
+Typed columnar copies of the CSV datasets, loaded by memory-mapping
+
+A table converted from `<dir>/<name>.csv` lives in `<dir>/columnar/<name>/`:
+
+    schema.json     column names, dtypes, categories and the source CSV's fingerprint
+    numeric.npy     all numeric columns as one float64 (rows, k) array in
+                    Fortran order, so both a single column and the whole
+                    feature matrix are zero-copy views of the mapped file
+    <col>.codes.npy int32 codes for each string column (values in schema.json)
+
+load_table() maps these files when they are present and match the CSV,
+and otherwise parses the CSV, so callers never need to know which one they got.
+"""
+import csv
+import hashlib
+import json
+import os
+import shutil
+import logging
+from pathlib import Path
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+SCHEMA_VERSION = 1
+COLUMNAR_DIR = "columnar"
+
+
+class Table:
+    """A dataset held as a numeric matrix plus dictionary-encoded string columns"""
+
+    def __init__(self, numeric: np.ndarray, numeric_columns: list, categorical: dict, source: str, mapped: bool):
+        self.numeric = numeric
+        self.numeric_columns = list(numeric_columns)
+        self.categorical = categorical  # name -> (codes, categories)
+        self.source = source
+        self.mapped = mapped
+        self._positions = {name: i for i, name in enumerate(self.numeric_columns)}
+
+    @property
+    def columns(self) -> list:
+        return self.numeric_columns + list(self.categorical)
+
+    def __len__(self) -> int:
+        return self.numeric.shape[0]
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        """Numeric columns come back as views; string columns are decoded"""
+        if name in self._positions:
+            return self.numeric[:, self._positions[name]]
+        codes, categories = self.categorical[name]
+        return np.asarray(categories, dtype=object)[codes]
+
+    def codes(self, name: str) -> np.ndarray:
+        return self.categorical[name][0]
+
+    def categories(self, name: str) -> list:
+        return self.categorical[name][1]
+
+    def matrix(self, columns: list = None) -> np.ndarray:
+        """
+        Numeric columns as a 2D array
+
+        Returns the mapped array itself when columns is None or matches the
+        stored order; any other selection is gathered into a copy.
+        """
+        if columns is None or list(columns) == self.numeric_columns:
+            return self.numeric
+        return self.numeric[:, [self._positions[name] for name in columns]]
+
+
+def columnar_dir(csv_path) -> Path:
+    csv_path = Path(csv_path)
+    return csv_path.parent / COLUMNAR_DIR / csv_path.stem
+
+
+def _file_digest(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _read_csv_columns(csv_path: Path) -> dict:
+    """Parse a CSV into {column: list of strings}, dropping unnamed index columns"""
+    try:
+        import pandas as pd
+    except ImportError:
+        pd = None
+
+    if pd is not None:
+        df = pd.read_csv(csv_path)
+        return {
+            name: df[name].to_numpy()
+            for name in df.columns
+            if name and not str(name).startswith("Unnamed:")
+        }
+
+    with open(csv_path, newline="") as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        values = [[] for _ in header]
+        for row in reader:
+            for column, value in zip(values, row):
+                column.append(value)
+    return {name: values[i] for i, name in enumerate(header) if name}
+
+
+def _split_columns(raw: dict) -> tuple:
+    """Separate numeric from string columns; returns (numeric dict, categorical dict)"""
+    numeric, categorical = {}, {}
+    for name, values in raw.items():
+        try:
+            numeric[name] = np.asarray(values, dtype=np.float64)
+        except (TypeError, ValueError):
+            categories, codes = np.unique(np.asarray(values, dtype=str), return_inverse=True)
+            categorical[name] = (codes.astype(np.int32), categories.tolist())
+    return numeric, categorical
+
+
+def _table_from_csv(csv_path: Path) -> Table:
+    numeric, categorical = _split_columns(_read_csv_columns(csv_path))
+    rows = len(next(iter(numeric.values()))) if numeric else len(next(iter(categorical.values()))[0])
+    matrix = np.empty((rows, len(numeric)), dtype=np.float64, order="F")
+    for i, values in enumerate(numeric.values()):
+        matrix[:, i] = values
+    return Table(matrix, list(numeric), categorical, str(csv_path), mapped=False)
+
+
+def write_table(csv_path, out_dir=None) -> Path:
+    """
+    Convert a CSV into the columnar layout
+
+    Args:
+        csv_path: Source CSV file
+        out_dir: Target directory (default: <csv dir>/columnar/<csv stem>)
+
+    Returns:
+        Path: The directory holding schema.json and the .npy files
+    """
+    csv_path = Path(csv_path)
+    out_dir = Path(out_dir) if out_dir else columnar_dir(csv_path)
+    table = _table_from_csv(csv_path)
+    stat = csv_path.stat()
+
+    # Write next to the target and swap in, so readers never see a half-written table
+    tmp_dir = out_dir.with_name(out_dir.name + ".tmp")
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    tmp_dir.mkdir(parents=True)
+
+    np.save(tmp_dir / "numeric.npy", np.asfortranarray(table.numeric))
+    columns = [{"name": name, "kind": "numeric", "dtype": "float64"} for name in table.numeric_columns]
+    for name, (codes, categories) in table.categorical.items():
+        np.save(tmp_dir / f"{name}.codes.npy", codes)
+        columns.append({"name": name, "kind": "categorical", "dtype": "int32", "categories": categories})
+
+    schema = {
+        "version": SCHEMA_VERSION,
+        "rows": len(table),
+        "columns": columns,
+        "source": csv_path.name,
+        "source_size": stat.st_size,
+        "source_mtime_ns": stat.st_mtime_ns,
+        "source_sha256": _file_digest(csv_path),
+    }
+    (tmp_dir / "schema.json").write_text(json.dumps(schema, indent=2))
+
+    shutil.rmtree(out_dir, ignore_errors=True)
+    os.replace(tmp_dir, out_dir)
+    return out_dir
+
+
+def _is_current(schema: dict, csv_path: Path) -> bool:
+    if schema.get("version") != SCHEMA_VERSION:
+        return False
+    if not csv_path.exists():
+        return True
+    stat = csv_path.stat()
+    if schema["source_size"] != stat.st_size:
+        return False
+    # A rewrite with identical content (e.g. a re-run pipeline stage) only changes the mtime
+    return schema["source_mtime_ns"] == stat.st_mtime_ns or schema["source_sha256"] == _file_digest(csv_path)
+
+
+def load_table(csv_path, mmap: bool = True) -> Table:
+    """
+    Load a dataset, preferring its memory-mapped columnar copy
+
+    Args:
+        csv_path: Path of the CSV (the columnar copy is looked up next to it)
+        mmap: Map the .npy files read-only instead of reading them into memory
+
+    Returns:
+        Table: The dataset; table.mapped tells which source was used
+    """
+    csv_path = Path(csv_path)
+    directory = columnar_dir(csv_path)
+    schema_path = directory / "schema.json"
+
+    if schema_path.exists():
+        schema = json.loads(schema_path.read_text())
+        if _is_current(schema, csv_path):
+            mmap_mode = "r" if mmap else None
+            numeric = np.load(directory / "numeric.npy", mmap_mode=mmap_mode)
+            numeric_columns = [c["name"] for c in schema["columns"] if c["kind"] == "numeric"]
+            categorical = {
+                c["name"]: (np.load(directory / f"{c['name']}.codes.npy", mmap_mode=mmap_mode), c["categories"])
+                for c in schema["columns"] if c["kind"] == "categorical"
+            }
+            return Table(numeric, numeric_columns, categorical, str(directory), mapped=mmap)
+        logger.warning("Columnar copy of %s is stale, falling back to CSV", csv_path.name)
+
+    return _table_from_csv(csv_path)
+
+
+if __name__ == "__main__":
+    import sys
+
+    # Usage (from backend/): python utils/columnar.py ../Data-raw/*.csv ../Data-processed/*.csv
+    for path in sys.argv[1:]:
+        print(f"{path} -> {write_table(path)}")
@@ -0,0 +1,135 @@
+import os
+import math
+import logging
+from pathlib import Path
+from typing import Optional
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Serving configurations
+# Worker processes; 0 derives them from the usable CPUs, the thread budget and memory
+SERVE_WORKERS = int(os.getenv("SERVE_WORKERS", "0"))
+# Threads each worker's TensorFlow, XGBoost and BLAS pools may use; 0 derives it from the workers
+SERVE_THREADS_PER_WORKER = int(os.getenv("SERVE_THREADS_PER_WORKER", "0"))
+# Pin every worker to its own CPUs (Linux only)
+SERVE_CPU_AFFINITY = os.getenv("SERVE_CPU_AFFINITY", "false").lower() in ("1", "true", "yes")
+# Resident memory of one worker with both models loaded; caps the derived worker count
+SERVE_WORKER_MEMORY_MB = int(os.getenv("SERVE_WORKER_MEMORY_MB", "1024"))
+# Thread budget of this process's model libraries; serve.py sets it per worker, 0 keeps library defaults
+MODEL_THREADS = int(os.getenv("MODEL_THREADS", "0"))
+
+# Read by OpenMP (XGBoost), the BLAS builds numpy may use and TensorFlow when their pools are created
+THREAD_ENV_VARS = (
+    "OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS",
+    "VECLIB_MAXIMUM_THREADS", "NUMEXPR_NUM_THREADS", "TF_NUM_INTRAOP_THREADS",
+)
+
+
+def cgroup_cpu_quota() -> Optional[float]:
+    """CPUs granted by the container's CFS quota (cgroup v2, then v1); None when unlimited"""
+    try:
+        quota, period = Path("/sys/fs/cgroup/cpu.max").read_text().split()
+        return None if quota == "max" else int(quota) / int(period)
+    except (OSError, ValueError):
+        pass
+    try:
+        quota = int(Path("/sys/fs/cgroup/cpu/cpu.cfs_quota_us").read_text())
+        period = int(Path("/sys/fs/cgroup/cpu/cpu.cfs_period_us").read_text())
+        return quota / period if quota > 0 else None
+    except (OSError, ValueError):
+        return None
+
+
+def available_cpus() -> list:
+    """CPU ids this process may run on, trimmed to the cgroup quota if that is lower"""
+    try:
+        cpus = sorted(os.sched_getaffinity(0))
+    except AttributeError:
+        # Not Linux: no affinity, count the machine's CPUs
+        cpus = list(range(os.cpu_count() or 1))
+    quota = cgroup_cpu_quota()
+    if quota is not None and quota < len(cpus):
+        cpus = cpus[:max(1, math.floor(quota))]
+    return cpus
+
+
+def available_memory_mb() -> Optional[float]:
+    """MemAvailable from /proc/meminfo, None where it cannot be read"""
+    try:
+        for line in Path("/proc/meminfo").read_text().splitlines():
+            if line.startswith("MemAvailable:"):
+                return int(line.split()[1]) / 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+
+def plan_workers(cpus: list, workers: int = 0, threads: int = 0,
+                 worker_memory_mb: float = SERVE_WORKER_MEMORY_MB, memory_mb: float = None) -> dict:
+    """
+    Split the usable CPUs between worker processes so their thread pools add up to them
+
+    Without a worker count, every CPU gets a single-threaded worker (or
+    len(cpus) // threads workers), capped by how many workers fit in memory.
+    Without a thread budget, each worker gets an equal share of the CPUs.
+    Single-row requests gain nothing from intra-op threads, so more
+    processes with fewer threads serve more requests per second; larger
+    thread budgets lower the latency of big disease batches instead.
+
+    Args:
+        cpus: CPU ids to share out (see available_cpus)
+        workers: Worker processes, 0 to derive
+        threads: Threads per worker, 0 to derive
+        worker_memory_mb: Memory one worker needs
+        memory_mb: Memory available for the workers (default: MemAvailable)
+
+    Returns:
+        dict: workers, threads per worker, the CPU ids each worker would be
+        pinned to, and whether the plan asks for more threads than CPUs
+    """
+    n = len(cpus)
+    if workers <= 0:
+        workers = max(1, n // threads) if threads > 0 else n
+        memory_mb = available_memory_mb() if memory_mb is None else memory_mb
+        if memory_mb is not None and worker_memory_mb > 0:
+            workers = max(1, min(workers, int(memory_mb // worker_memory_mb)))
+    if threads <= 0:
+        threads = max(1, n // workers)
+
+    # Consecutive blocks of `threads` CPUs, wrapping around when oversubscribed
+    cpu_sets = [[cpus[(i * threads + j) % n] for j in range(threads)] for i in range(workers)]
+    return {
+        "cpus": n,
+        "workers": workers,
+        "threads_per_worker": threads,
+        "cpu_sets": [sorted(set(cpu_set)) for cpu_set in cpu_sets],
+        "oversubscribed": workers * threads > n,
+    }
+
+
+def apply_thread_budget(threads: int, cpu_set: list = None):
+    """
+    Limit this process's model thread pools, and optionally pin it to cpu_set
+
+    Must run before numpy, XGBoost and TensorFlow are imported: their pools
+    are sized from these variables when they are first created.
+    """
+    global MODEL_THREADS
+    for name in THREAD_ENV_VARS:
+        os.environ[name] = str(threads)
+    # Model calls are one op after another; parallelism comes from intra-op threads
+    os.environ["TF_NUM_INTEROP_THREADS"] = "1"
+    os.environ["MODEL_THREADS"] = str(threads)
+    MODEL_THREADS = threads
+    if cpu_set:
+        os.sched_setaffinity(0, cpu_set)
+
+
+def limit_model_threads(model):
+    """Set a model's n_jobs (XGBoost, random forest) to MODEL_THREADS, if a budget is set"""
+    if MODEL_THREADS > 0 and "n_jobs" in getattr(model, "get_params", dict)():
+        model.set_params(n_jobs=MODEL_THREADS)
+    return model
@@ -53,3 +53,8 @@ def get_disease_detections_collection():
     """Get disease detections collection"""
     database = get_database()
     return database["disease_detections"]
+
+def get_stats_collection():
+    """Get pre-aggregated prediction stats collection"""
+    database = get_database()
+    return database["prediction_stats"]
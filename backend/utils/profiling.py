@@ -0,0 +1,148 @@
+import os
+import sys
+import random
+import threading
+import logging
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+from fastapi import Depends, Request
+from dotenv import load_dotenv
+from utils.auth import get_current_user
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Profiling configurations
+# Fraction of requests profiled without an explicit header (0 disables sampling)
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "1"))
+PROFILE_DIR = Path(os.getenv("PROFILE_DIR", Path(__file__).parent.parent / "profiles"))
+PROFILE_HEADER = "X-Profile"
+
+
+class StackSampler:
+    """Samples the call stack of a single thread from a background thread"""
+
+    def __init__(self, thread_id: int, interval: float):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({Path(code.co_filename).name}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def collapsed(self) -> str:
+        """Render samples in the collapsed-stack format read by flamegraph.pl and speedscope"""
+        return "\n".join(f"{stack} {count}" for stack, count in self.stacks.most_common()) + "\n"
+
+
+class _ProfileSession:
+    """Context manager that samples the calling thread and saves the profile on exit"""
+
+    def __init__(self, profiler: "RequestProfiler", name: str):
+        self.profiler = profiler
+        self.name = name
+        self.sampler = StackSampler(threading.get_ident(), profiler.interval)
+
+    def __enter__(self):
+        self.sampler.start()
+        return self.sampler
+
+    def __exit__(self, exc_type, exc, tb):
+        self.sampler.stop()
+        self.profiler.save(self.name, self.sampler)
+        return False
+
+
+class _NullSession:
+    """No-op context manager returned when a request is not profiled"""
+
+    def __enter__(self):
+        return None
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_SESSION = _NullSession()
+
+
+class RequestProfiler:
+    """Opt-in sampling profiler for the inference hot path"""
+
+    def __init__(self, sample_rate: float, output_dir: Path, interval_ms: float):
+        self.sample_rate = sample_rate
+        self.output_dir = Path(output_dir)
+        self.interval = interval_ms / 1000.0
+
+    def profile(self, name: str, force: bool = False):
+        """
+        Return a context manager that profiles the enclosed block
+
+        Args:
+            name: Label used in the profile filename (e.g. "predict_crop")
+            force: Profile regardless of the sample rate (admin header)
+
+        Returns:
+            A shared no-op context manager when the request is not sampled,
+            so the disabled path costs one comparison.
+        """
+        if not force and (self.sample_rate <= 0 or random.random() >= self.sample_rate):
+            return _NULL_SESSION
+        return _ProfileSession(self, name)
+
+    def save(self, name: str, sampler: StackSampler) -> Path:
+        """Write collapsed stacks to the profile directory"""
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        timestamp = datetime.utcnow().strftime("%Y%m%dT%H%M%S%f")
+        path = self.output_dir / f"{name}-{timestamp}.collapsed"
+        path.write_text(sampler.collapsed())
+        logger.info("Saved profile %s (%d samples)", path.name, sum(sampler.stacks.values()))
+        return path
+
+    def list_profiles(self) -> list:
+        """List saved profiles, newest first"""
+        if not self.output_dir.exists():
+            return []
+        files = sorted(self.output_dir.glob("*.collapsed"), key=lambda p: p.stat().st_mtime, reverse=True)
+        return [
+            {"name": f.name, "size": f.stat().st_size, "created_at": datetime.utcfromtimestamp(f.stat().st_mtime)}
+            for f in files
+        ]
+
+    def get_profile_path(self, filename: str) -> Path:
+        """Resolve a saved profile by filename, rejecting anything outside the profile directory"""
+        path = self.output_dir / Path(filename).name
+        if path.suffix != ".collapsed" or not path.is_file():
+            raise FileNotFoundError(filename)
+        return path
+
+
+async def profile_requested(request: Request, current_user: dict = Depends(get_current_user)) -> bool:
+    """Whether an administrator asked for this request to be profiled via the X-Profile header"""
+    if request.headers.get(PROFILE_HEADER) != "1":
+        return False
+    return bool(current_user.get("is_admin"))
+
+
+# Global instance
+request_profiler = RequestProfiler(PROFILE_SAMPLE_RATE, PROFILE_DIR, PROFILE_INTERVAL_MS)
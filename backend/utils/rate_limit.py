@@ -0,0 +1,239 @@
+import os
+import math
+import time
+import logging
+from collections import Counter
+from fastapi import Depends, HTTPException, Request, status
+from dotenv import load_dotenv
+from utils.auth import get_current_user
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Rate limit configurations
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() in ("1", "true", "yes")
+# Bucket size: the largest burst a user can send, in cost units
+RATE_LIMIT_CAPACITY = float(os.getenv("RATE_LIMIT_CAPACITY", "60"))
+# Cost units given back per second
+RATE_LIMIT_REFILL_PER_SEC = float(os.getenv("RATE_LIMIT_REFILL_PER_SEC", "1"))
+# "memory" (per process) or "redis" (shared between workers, needs the redis package)
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory")
+RATE_LIMIT_REDIS_URL = os.getenv("RATE_LIMIT_REDIS_URL", "redis://localhost:6379/0")
+
+# Cost of one call in bucket units, roughly proportional to CPU time.
+# A "<route>_tta" entry is charged instead when the call passes ?tta=true.
+ROUTE_COSTS = {
+    "predict_crop": 1,
+    "predict_fertilizer": 1,
+    "history": 1,
+    "dashboard": 1,
+    "detect_disease": 10,
+    "detect_disease_tta": 30,
+    "similar_disease": 10,
+    # Binary streams are charged per row/image, batched model calls are cheaper per item
+    "binary_crop_row": 0.001,
+    "binary_disease_image": 5,
+    "binary_disease_image_tta": 15,
+}
+
+
+class MemoryBucketStore:
+    """Token buckets in a dict; each worker process limits independently"""
+
+    def __init__(self, max_keys: int = 100_000):
+        self.buckets = {}
+        self.max_keys = max_keys
+
+    async def take(self, key: str, cost: float, capacity: float, rate: float) -> tuple:
+        """
+        Take cost tokens from the key's bucket if it holds enough
+
+        Returns:
+            tuple: (allowed, tokens left, seconds until cost tokens are available)
+        """
+        now = time.monotonic()
+        tokens, last = self.buckets.get(key, (capacity, now))
+        tokens = min(capacity, tokens + (now - last) * rate)
+        allowed = tokens >= cost
+        if allowed:
+            tokens -= cost
+        if key not in self.buckets and len(self.buckets) >= self.max_keys:
+            self._prune(now, capacity, rate)
+        self.buckets[key] = (tokens, now)
+        return allowed, tokens, 0.0 if allowed else (cost - tokens) / rate
+
+    def _prune(self, now: float, capacity: float, rate: float):
+        """Forget buckets that have refilled completely; they behave like new ones"""
+        full_after = capacity / rate
+        self.buckets = {k: v for k, v in self.buckets.items() if now - v[1] < full_after}
+
+
+class RedisBucketStore:
+    """Token buckets in Redis, shared by every worker that points at the same server"""
+
+    # Refill, take and store atomically; Redis' clock keeps workers consistent
+    SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local data = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(data[1]) or capacity
+local last = tonumber(data[2]) or now
+tokens = math.min(capacity, tokens + (now - last) * rate)
+local allowed = 0
+if tokens >= cost then
+    tokens = tokens - cost
+    allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity / rate * 1000))
+return {allowed, tostring(tokens)}
+"""
+
+    def __init__(self, url: str, prefix: str = "ratelimit:"):
+        import redis.asyncio as redis
+
+        self.client = redis.from_url(url)
+        self.prefix = prefix
+        self.script = self.client.register_script(self.SCRIPT)
+
+    async def take(self, key: str, cost: float, capacity: float, rate: float) -> tuple:
+        allowed, tokens = await self.script(keys=[self.prefix + key], args=[capacity, rate, cost])
+        tokens = float(tokens)
+        return bool(allowed), tokens, 0.0 if allowed else (cost - tokens) / rate
+
+
+class RateLimiter:
+    """Per-user token-bucket admission control with per-route costs"""
+
+    def __init__(self, store, capacity: float, refill_per_sec: float, enabled: bool = True):
+        self.store = store
+        self.capacity = capacity
+        self.refill_per_sec = refill_per_sec
+        self.enabled = enabled
+        self.allowed = Counter()
+        self.throttled = Counter()
+        self.throttled_users = Counter()
+        self.store_errors = 0
+
+    async def check(self, user_id: str, route: str, cost: float) -> tuple:
+        """
+        Charge a call against the user's bucket
+
+        A failing shared store lets the request through rather than taking
+        the API down with it.
+
+        Returns:
+            tuple: (allowed, tokens left, retry after in seconds)
+        """
+        try:
+            allowed, remaining, retry_after = await self.store.take(
+                user_id, min(cost, self.capacity), self.capacity, self.refill_per_sec
+            )
+        except Exception as e:
+            self.store_errors += 1
+            logger.error("Rate limit store failed, admitting request: %s", e)
+            return True, self.capacity, 0.0
+
+        if allowed:
+            self.allowed[route] += 1
+        else:
+            self.throttled[route] += 1
+            self.throttled_users[user_id] += 1
+            logger.warning("Throttled %s for user %s (retry in %.1fs)", route, user_id, retry_after)
+        return allowed, remaining, retry_after
+
+    def metrics(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "backend": type(self.store).__name__,
+            "capacity": self.capacity,
+            "refill_per_sec": self.refill_per_sec,
+            "route_costs": ROUTE_COSTS,
+            "allowed": dict(self.allowed),
+            "throttled": dict(self.throttled),
+            "top_throttled_users": dict(self.throttled_users.most_common(10)),
+            "store_errors": self.store_errors,
+        }
+
+
+def rate_limit(route: str):
+    """
+    Dependency that charges the current user for a call to `route`
+
+    Leaves X-RateLimit-* headers on request.state for
+    RateLimitHeadersMiddleware and raises 429 with Retry-After when the
+    user's bucket cannot cover the cost.
+    """
+    tta_route = f"{route}_tta"
+
+    async def dependency(request: Request, current_user: dict = Depends(get_current_user)):
+        if not rate_limiter.enabled:
+            return
+        name = route
+        if tta_route in ROUTE_COSTS and request.query_params.get("tta", "").lower() in ("1", "true"):
+            name = tta_route
+        cost = ROUTE_COSTS.get(name, 1)
+        allowed, remaining, retry_after = await rate_limiter.check(current_user["id"], name, cost)
+        headers = {
+            "X-RateLimit-Limit": f"{rate_limiter.capacity:g}",
+            "X-RateLimit-Remaining": str(int(remaining)),
+            "X-RateLimit-Cost": f"{cost:g}",
+        }
+        if not allowed:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail=f"Rate limit exceeded. Try again in {math.ceil(retry_after)} seconds.",
+                headers={**headers, "Retry-After": str(math.ceil(retry_after))},
+            )
+        request.state.rate_limit_headers = headers
+
+    return dependency
+
+
+class RateLimitHeadersMiddleware:
+    """
+    Adds the X-RateLimit-* headers rate_limit() charged for to the response
+
+    The dependency cannot set them itself: routes that return a Response
+    (FastJSONResponse, 304s) bypass the sub-response FastAPI hands to
+    dependencies. Headers the route already set are left alone.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_headers(message):
+            # request.state is backed by scope["state"], filled in once the dependency has run
+            headers = scope.get("state", {}).get("rate_limit_headers")
+            if message["type"] == "http.response.start" and headers:
+                raw = list(message.get("headers", []))
+                present = {name.lower() for name, _ in raw}
+                for name, value in headers.items():
+                    key = name.lower().encode("latin-1")
+                    if key not in present:
+                        raw.append((key, value.encode("latin-1")))
+                message["headers"] = raw
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
+
+
+def create_store(backend: str):
+    if backend == "redis":
+        return RedisBucketStore(RATE_LIMIT_REDIS_URL)
+    return MemoryBucketStore()
+
+
+# Global instance
+rate_limiter = RateLimiter(
+    create_store(RATE_LIMIT_BACKEND), RATE_LIMIT_CAPACITY, RATE_LIMIT_REFILL_PER_SEC, RATE_LIMIT_ENABLED
+)
@@ -0,0 +1,130 @@
+import os
+import re
+import hashlib
+from typing import Optional
+from bson import ObjectId
+from fastapi import HTTPException, Request, status
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse, StreamingResponse
+import anyio
+import orjson
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Responses smaller than this are sent uncompressed
+COMPRESSION_MINIMUM_SIZE = int(os.getenv("COMPRESSION_MINIMUM_SIZE", "1000"))
+# Streamed binary answers: compressors buffer them, so a duplex client would never see a reply
+UNCOMPRESSED_PATH_PREFIXES = ("/api/binary/",)
+
+_FIELD_PATTERN = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*(\.[A-Za-z_][A-Za-z0-9_]*)*$")
+
+
+def _default(value):
+    if isinstance(value, ObjectId):
+        return str(value)
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+class FastJSONResponse(ORJSONResponse):
+    """
+    orjson-rendered response that also understands MongoDB ObjectIds
+
+    Endpoints returning raw documents can hand them over as-is: datetimes,
+    numpy scalars and ObjectIds are serialized by orjson in one pass instead
+    of going through jsonable_encoder first.
+    """
+
+    def render(self, content) -> bytes:
+        return orjson.dumps(
+            content, default=_default, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+        )
+
+
+class DuplexStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse whose body iterator may still be reading the request
+
+    Starlette's version consumes receive() concurrently to notice client
+    disconnects, which would swallow request body chunks not read yet.
+    Here the iterator is the only reader; Request.stream() raises
+    ClientDisconnect when the client goes away.
+    """
+
+    async def listen_for_disconnect(self, receive):
+        # Returning would cancel the response; stream_response ends it instead
+        await anyio.sleep_forever()
+
+
+def parse_fields(fields: Optional[str]) -> Optional[dict]:
+    """
+    Turn a `fields=` query value into a MongoDB projection
+
+    Args:
+        fields: Comma-separated field paths, e.g. "prediction.crop,created_at"
+
+    Returns:
+        dict: Projection including only those fields (plus _id), or None for all fields
+
+    Raises:
+        HTTPException: 400 if a field path is malformed
+    """
+    if not fields:
+        return None
+    names = [name.strip() for name in fields.split(",") if name.strip()]
+    invalid = [name for name in names if not _FIELD_PATTERN.match(name)]
+    if invalid:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid field name(s): {', '.join(invalid)}"
+        )
+    return {name: 1 for name in names}
+
+
+def make_etag(*parts) -> str:
+    """
+    Weak ETag for a response determined by parts (any orjson-serializable values)
+
+    Weak because the compression middleware changes the bytes on the wire
+    but not what they mean.
+    """
+    digest = hashlib.sha256(orjson.dumps(parts, default=_default, option=orjson.OPT_NON_STR_KEYS)).hexdigest()
+    return f'W/"{digest[:20]}"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Whether the request's If-None-Match already names etag (the client's copy is current)"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    candidates = [candidate.strip() for candidate in header.split(",")]
+    # Weak comparison: W/"x" and "x" name the same representation
+    return "*" in candidates or etag.removeprefix("W/") in [c.removeprefix("W/") for c in candidates]
+
+
+class SelectiveCompression:
+    """Pure ASGI wrapper that sends requests under skip_prefixes around a compression middleware"""
+
+    def __init__(self, app, middleware, skip_prefixes: tuple = UNCOMPRESSED_PATH_PREFIXES, **options):
+        self.app = app
+        self.compressed = middleware(app, **options)
+        self.skip_prefixes = tuple(skip_prefixes)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["path"].startswith(self.skip_prefixes):
+            await self.app(scope, receive, send)
+        else:
+            await self.compressed(scope, receive, send)
+
+
+def add_compression(app, minimum_size: int = COMPRESSION_MINIMUM_SIZE):
+    """Compress responses with Brotli when brotli-asgi is installed, else gzip; /api/binary/ is left alone"""
+    try:
+        from brotli_asgi import BrotliMiddleware
+    except ImportError:
+        app.add_middleware(SelectiveCompression, middleware=GZipMiddleware, minimum_size=minimum_size)
+        logger.info("Response compression: gzip (install brotli-asgi for Brotli)")
+        return
+    app.add_middleware(SelectiveCompression, middleware=BrotliMiddleware, minimum_size=minimum_size,
+                       gzip_fallback=True)
+    logger.info("Response compression: brotli with gzip fallback")
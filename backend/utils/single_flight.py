@@ -0,0 +1,83 @@
+import os
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Single-flight configurations
+# Threads running model calls per service; 1 keeps calls serialized as they
+# were on the event loop, but lets the loop keep accepting requests meanwhile
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", "1"))
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key into one execution
+
+    The first caller for a key (the leader) submits the work to a thread
+    pool; callers arriving with the same key while it is still running await
+    the leader's future instead of running the model again. The key is
+    forgotten as soon as the work finishes, so this is deduplication of
+    in-flight work, not a cache.
+
+    Every caller receives the same result object, which must therefore be
+    treated as read-only.
+    """
+
+    def __init__(self, name: str, max_workers: int = INFERENCE_WORKERS):
+        self.name = name
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"{name}-inference")
+        self.inflight = {}
+        self.calls = 0
+        self.executed = 0
+        self.coalesced = 0
+        self.max_waiters = 0
+        self._waiters = {}
+
+    async def run(self, key, fn, *args):
+        """
+        Run fn(*args) in the pool, or join the in-flight run for the same key
+
+        Args:
+            key: Hashable identity of the input (including the model version)
+            fn: Blocking function doing the work
+            *args: Arguments passed to fn
+
+        Returns:
+            Whatever fn returns; exceptions are raised to every caller
+        """
+        self.calls += 1
+        future = self.inflight.get(key)
+        if future is not None:
+            self.coalesced += 1
+            self._waiters[key] += 1
+            self.max_waiters = max(self.max_waiters, self._waiters[key])
+        else:
+            self.executed += 1
+            future = asyncio.get_running_loop().run_in_executor(self.executor, fn, *args)
+            self.inflight[key] = future
+            self._waiters[key] = 1
+            future.add_done_callback(lambda done: self._forget(key, done))
+        # A caller that disconnects must not cancel the work the others wait on
+        return await asyncio.shield(future)
+
+    def _forget(self, key, future):
+        self.inflight.pop(key, None)
+        self._waiters.pop(key, None)
+        # Mark the exception retrieved even if every caller went away
+        if not future.cancelled():
+            future.exception()
+
+    def metrics(self) -> dict:
+        return {
+            "calls": self.calls,
+            "executed": self.executed,
+            "coalesced": self.coalesced,
+            "coalesced_ratio": self.coalesced / self.calls if self.calls else 0.0,
+            "max_waiters": self.max_waiters,
+            "inflight": len(self.inflight),
+        }
@@ -2,8 +2,29 @@ import { useAuth } from '../context/AuthContext';
 import { useNavigate } from 'react-router-dom';
 import { useState, useEffect } from 'react';
 import DashboardLayout from '../components/DashboardLayout';
-import { getCropHistory, getFertilizerHistory } from '../services/predictionService';
-import { getDiseaseHistory } from '../services/diseaseService';
+import { getDashboard } from '../services/dashboardService';
+
+const DISTRIBUTION_COLORS = ['#10b981', '#f59e0b', '#3b82f6', '#8b5cf6'];
+const ACTIVITY_DAYS = 14;
+
+// Top three crops by count plus "Others", as whole percentages
+const buildCropDistribution = (crops = {}) => {
+  const entries = Object.entries(crops).sort((a, b) => b[1] - a[1]);
+  const total = entries.reduce((sum, [, count]) => sum + count, 0);
+  if (total === 0) {
+    return [{ name: 'No predictions yet', value: 100, color: '#e5e7eb' }];
+  }
+  const top = entries.slice(0, 3).map(([name, count], index) => ({
+    name,
+    value: Math.round((count / total) * 100),
+    color: DISTRIBUTION_COLORS[index],
+  }));
+  const others = 100 - top.reduce((sum, crop) => sum + crop.value, 0);
+  if (entries.length > 3 && others > 0) {
+    top.push({ name: 'Others', value: others, color: DISTRIBUTION_COLORS[3] });
+  }
+  return top;
+};
 
 const Dashboard = () => {
   const { user } = useAuth();
@@ -16,6 +37,8 @@ const Dashboard = () => {
   });
   const [loading, setLoading] = useState(true);
   const [recentActivities, setRecentActivities] = useState([]);
+  const [activityData, setActivityData] = useState([]);
+  const [cropDistribution, setCropDistribution] = useState(buildCropDistribution());
 
   useEffect(() => {
     fetchDashboardData();
@@ -24,66 +47,63 @@ const Dashboard = () => {
   const fetchDashboardData = async () => {
     setLoading(true);
     try {
-      // Fetch all history data
-      const [cropHistory, fertilizerHistory, diseaseHistory] = await Promise.all([
-        getCropHistory().catch(() => []),
-        getFertilizerHistory().catch(() => []),
-        getDiseaseHistory().catch(() => []),
-      ]);
+      // Counters, daily series and latest items in one request, revalidated by ETag
+      const { stats: counters, recent } = await getDashboard({ days: ACTIVITY_DAYS, limit: 3 });
+      const totals = counters.totals || {};
 
       // Calculate statistics
-      const totalPredictions = cropHistory.length + fertilizerHistory.length;
-      const uniqueCrops = new Set(cropHistory.map(item => item.prediction?.crop).filter(Boolean));
-      const diseasesDetected = diseaseHistory.length;
+      const totalPredictions = (totals.crop || 0) + (totals.fertilizer || 0);
+      const diseasesDetected = totals.disease || 0;
       
       // Calculate average yield increase (mock calculation based on predictions)
       const avgYieldIncrease = totalPredictions > 0 ? Math.min(15 + (totalPredictions * 0.5), 35) : 0;
 
       setStats({
         totalPredictions,
-        cropsAnalyzed: uniqueCrops.size,
+        cropsAnalyzed: Object.keys(counters.crops || {}).length,
         diseasesDetected,
         avgYieldIncrease: Math.round(avgYieldIncrease * 10) / 10,
       });
 
+      setActivityData((counters.daily || []).map(day => ({
+        date: day.date,
+        total: day.crop + day.fertilizer + day.disease,
+      })));
+      setCropDistribution(buildCropDistribution(counters.crops));
+
       // Build recent activities
-      const activities = [];
-      
-      // Add crop predictions
-      cropHistory.slice(0, 2).forEach(item => {
-        activities.push({
+      const activities = [
+        ...recent.crop.map(item => ({
           type: 'crop',
-          action: `Crop recommendation: ${item.prediction?.crop || 'N/A'}`,
-          time: formatTimeAgo(item.created_at),
+          action: `Crop recommendation: ${item.crop || 'N/A'}`,
+          createdAt: item.created_at,
           icon: '🌾',
           color: 'green',
-        });
-      });
-
-      // Add fertilizer predictions
-      fertilizerHistory.slice(0, 1).forEach(item => {
-        activities.push({
+        })),
+        ...recent.fertilizer.map(item => ({
           type: 'fertilizer',
-          action: `Fertilizer: ${item.prediction?.fertilizer || 'N/A'}`,
-          time: formatTimeAgo(item.created_at),
+          action: `Fertilizer: ${item.fertilizer || 'N/A'}`,
+          createdAt: item.created_at,
           icon: '🧪',
           color: 'blue',
-        });
-      });
-
-      // Add disease detections
-      diseaseHistory.slice(0, 1).forEach(item => {
-        activities.push({
+        })),
+        ...recent.disease.map(item => ({
           type: 'disease',
-          action: `Disease detected: ${item.prediction?.disease_name || 'Unknown'}`,
-          time: formatTimeAgo(item.created_at),
+          action: item.is_healthy
+            ? `Healthy ${item.plant || 'plant'}`
+            : `Disease detected: ${item.disease || 'Unknown'}`,
+          createdAt: item.created_at,
           icon: '🦠',
           color: 'purple',
-        });
-      });
+        })),
+      ];
 
       // Sort by time and take top 3
-      setRecentActivities(activities.slice(0, 3));
+      activities.sort((a, b) => new Date(b.createdAt) - new Date(a.createdAt));
+      setRecentActivities(activities.slice(0, 3).map(activity => ({
+        ...activity,
+        time: formatTimeAgo(activity.createdAt),
+      })));
     } catch (error) {
       console.error('Failed to fetch dashboard data:', error);
     } finally {
@@ -104,21 +124,7 @@ const Dashboard = () => {
     return `${diffInDays} days ago`;
   };
 
-  const yieldTrendData = [
-    { month: 'Jan', yield: 2.8, rainfall: 45 },
-    { month: 'Feb', yield: 3.2, rainfall: 52 },
-    { month: 'Mar', yield: 3.5, rainfall: 48 },
-    { month: 'Apr', yield: 4.1, rainfall: 65 },
-    { month: 'May', yield: 4.5, rainfall: 78 },
-    { month: 'Jun', yield: 4.2, rainfall: 92 },
-  ];
-
-  const cropDistribution = [
-    { name: 'Rice', value: 35, color: '#10b981' },
-    { name: 'Wheat', value: 25, color: '#f59e0b' },
-    { name: 'Maize', value: 20, color: '#3b82f6' },
-    { name: 'Others', value: 20, color: '#8b5cf6' },
-  ];
+  const maxDailyPredictions = Math.max(1, ...activityData.map(day => day.total));
 
   const weatherData = {
     temperature: 28,
@@ -266,29 +272,29 @@ const Dashboard = () => {
 
       {/* Charts Section */}
       <div className="grid grid-cols-1 lg:grid-cols-2 gap-8 mb-8">
-        {/* Yield Trend Chart */}
+        {/* Prediction Activity Chart */}
         <div className="bg-white rounded-2xl shadow-lg p-6">
           <div className="flex items-center justify-between mb-6">
-            <h3 className="text-xl font-bold text-gray-800">Yield Trends</h3>
-            <span className="text-sm text-gray-500 bg-gray-100 px-3 py-1 rounded-full">Last 6 months</span>
+            <h3 className="text-xl font-bold text-gray-800">Prediction Activity</h3>
+            <span className="text-sm text-gray-500 bg-gray-100 px-3 py-1 rounded-full">Last {ACTIVITY_DAYS} days</span>
           </div>
           <div className="h-64 flex items-end justify-between gap-2">
-            {yieldTrendData.map((data, index) => (
-              <div key={index} className="flex-1 flex flex-col items-center group">
+            {activityData.map((data) => (
+              <div key={data.date} className="flex-1 h-full flex flex-col justify-end items-center group">
                 <div className="w-full bg-gradient-to-t from-green-500 to-emerald-400 rounded-t-lg hover:from-green-600 hover:to-emerald-500 transition-all relative group-hover:shadow-lg"
-                     style={{ height: `${data.yield * 20}%` }}>
+                     style={{ height: `${(data.total / maxDailyPredictions) * 90}%` }}>
                   <div className="absolute -top-8 left-1/2 transform -translate-x-1/2 bg-gray-800 text-white text-xs px-2 py-1 rounded opacity-0 group-hover:opacity-100 transition-opacity whitespace-nowrap">
-                    {data.yield} tons/ha
+                    {data.total} prediction{data.total === 1 ? '' : 's'}
                   </div>
                 </div>
-                <p className="text-xs text-gray-600 mt-2 font-medium">{data.month}</p>
+                <p className="text-xs text-gray-600 mt-2 font-medium">{data.date.slice(8)}</p>
               </div>
             ))}
           </div>
           <div className="mt-6 flex items-center justify-center gap-4 text-sm">
             <div className="flex items-center gap-2">
               <div className="w-3 h-3 bg-green-500 rounded-full"></div>
-              <span className="text-gray-600">Yield (tons/ha)</span>
+              <span className="text-gray-600">Predictions per day</span>
             </div>
           </div>
         </div>
@@ -8,6 +8,7 @@ const DiseaseDetection = () => {
   const [loading, setLoading] = useState(false);
   const [result, setResult] = useState(null);
   const [error, setError] = useState('');
+  const [plant, setPlant] = useState(null);
 
   const handleImageSelect = (e) => {
     const file = e.target.files[0];
@@ -42,7 +43,7 @@ const DiseaseDetection = () => {
     setError('');
 
     try {
-      const response = await detectDisease(selectedImage);
+      const response = await detectDisease(selectedImage, plant);
       setResult(response);
     } catch (err) {
       setError(err.response?.data?.detail || 'Failed to detect disease. Please try again.');
@@ -154,11 +155,21 @@ const DiseaseDetection = () => {
             {/* Supported Plants */}
             <div className="mt-8 p-4 bg-purple-50 rounded-xl">
               <h3 className="font-semibold text-gray-800 mb-2">Supported Plants:</h3>
+              <p className="text-xs text-gray-500 mb-2">Know the plant? Select it to only check for its diseases.</p>
               <div className="flex flex-wrap gap-2">
-                {['Apple', 'Blueberry', 'Cherry', 'Corn', 'Grape', 'Orange', 'Peach', 'Pepper', 'Potato', 'Raspberry', 'Soybean', 'Squash', 'Strawberry', 'Tomato'].map((plant) => (
-                  <span key={plant} className="px-3 py-1 bg-white text-sm text-gray-700 rounded-full border border-purple-200">
-                    {plant}
-                  </span>
+                {['Apple', 'Blueberry', 'Cherry', 'Corn', 'Grape', 'Orange', 'Peach', 'Pepper', 'Potato', 'Raspberry', 'Soybean', 'Squash', 'Strawberry', 'Tomato'].map((name) => (
+                  <button
+                    key={name}
+                    type="button"
+                    onClick={() => setPlant(plant === name ? null : name)}
+                    className={`px-3 py-1 text-sm rounded-full border transition-colors ${
+                      plant === name
+                        ? 'bg-purple-600 text-white border-purple-600'
+                        : 'bg-white text-gray-700 border-purple-200 hover:bg-purple-100'
+                    }`}
+                  >
+                    {name}
+                  </button>
                 ))}
               </div>
             </div>
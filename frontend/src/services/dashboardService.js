@@ -0,0 +1,32 @@
+import axios from 'axios';
+
+const API_URL = 'http://localhost:8000/api/dashboard';
+
+const getAuthHeader = () => {
+  const token = localStorage.getItem('token');
+  return token ? { Authorization: `Bearer ${token}` } : {};
+};
+
+// Last response per query and token, revalidated with its ETag instead of downloaded again
+const cache = new Map();
+
+// Pass a list's next_before ({ before, before_id }) as `page` for its older entries
+export const getDashboard = async ({ days = 30, limit = 5, page } = {}) => {
+  const headers = getAuthHeader();
+  const key = `${headers.Authorization || ''}|${days}|${limit}|${page ? `${page.before}|${page.before_id}` : ''}`;
+  const cached = cache.get(key);
+
+  const response = await axios.get(API_URL, {
+    params: page ? { days, limit, before: page.before, before_id: page.before_id } : { days, limit },
+    headers: cached ? { ...headers, 'If-None-Match': cached.etag } : headers,
+    validateStatus: (status) => (status >= 200 && status < 300) || status === 304,
+  });
+
+  if (response.status === 304 && cached) {
+    return cached.data;
+  }
+  if (response.headers.etag) {
+    cache.set(key, { etag: response.headers.etag, data: response.data });
+  }
+  return response.data;
+};
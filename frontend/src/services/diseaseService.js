@@ -7,11 +7,12 @@ const getAuthHeader = () => {
   return token ? { Authorization: `Bearer ${token}` } : {};
 };
 
-export const detectDisease = async (imageFile) => {
+export const detectDisease = async (imageFile, plant = null) => {
   const formData = new FormData();
   formData.append('file', imageFile);
 
   const response = await axios.post(`${API_URL}/detect`, formData, {
+    params: plant ? { plant } : {},
     headers: {
       ...getAuthHeader(),
       'Content-Type': 'multipart/form-data',
@@ -25,9 +26,10 @@ export const checkDiseaseModelHealth = async () => {
   return response.data;
 };
 
-export const getDiseaseHistory = async () => {
+export const getDiseaseHistory = async (limit = 10) => {
   const response = await axios.get(`${API_URL}/history`, {
+    params: { limit },
     headers: getAuthHeader(),
   });
-  return response.data;
+  return response.data.detections || [];
 };
@@ -49,15 +49,17 @@ export const checkModelHealth = async () => {
   return response.data;
 };
 
-export const getCropHistory = async () => {
+export const getCropHistory = async (limit = 10) => {
   const response = await axios.get(`${API_URL}/crop/history`, {
+    params: { limit },
     headers: getAuthHeader(),
   });
   return response.data.predictions || [];
 };
 
-export const getFertilizerHistory = async () => {
+export const getFertilizerHistory = async (limit = 10) => {
   const response = await axios.get(`${API_URL}/fertilizer/history`, {
+    params: { limit },
     headers: getAuthHeader(),
   });
   return response.data.predictions || [];